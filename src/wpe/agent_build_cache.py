@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import os
+import os.path as osp
+import shutil
+import subprocess
+import threading
+from typing import Optional
+
+import kkpyutil as util
+
+# project
+import wpe.util as wpe_util
+
+# bump when the cache layout or key composition changes
+_CACHE_FORMAT = 1
+
+
+class AgentBuildCache:
+    """
+    Size-bounded LRU cache of remote build results on the build agent.
+    A build is keyed by the commit checked out in the project root, the platform, the configuration, the plugin name
+    and the agent WWISESDK. Entries hold the command result and the artifacts the build left under WWISESDK.
+    The toolchain (compiler, Xcode) is not part of the key, hence opt-in.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cacheDir = cache_dir
+        self.maxBytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def commit(root: str) -> Optional[str]:
+        """
+        Return the commit checked out in root, None when the build is not cacheable: not a git checkout, or tracked
+        files modified.
+        """
+        def _git(*args):
+            proc = subprocess.run(['git', '-C', root, *args], capture_output=True, text=True)
+            return proc.stdout.strip() if proc.returncode == 0 else None
+
+        commit = _git('rev-parse', 'HEAD')
+        if not commit or _git('status', '--porcelain', '--untracked-files=no') != '':
+            return None
+        return commit
+
+    @staticmethod
+    def key(commit: str, platform: str, configuration: str, plugin_name: str, sdk_root: str) -> str:
+        hasher = hashlib.sha256()
+        for part in (str(_CACHE_FORMAT), commit, platform, configuration, plugin_name, osp.realpath(sdk_root)):
+            hasher.update(part.encode('utf-8'))
+            hasher.update(b'\0')
+        return hasher.hexdigest()
+
+    def restore(self, key: str, sdk_root: str) -> Optional[dict]:
+        """
+        Bring the cached artifacts under WWISESDK up to date and return the cached entry, None on a miss.
+        """
+        with self._lock:
+            entry_dir = osp.join(self.cacheDir, key)
+            manifest_path = osp.join(entry_dir, 'manifest.json')
+            if not osp.isfile(manifest_path):
+                return None
+            manifest = util.load_json(manifest_path)
+            for rel, meta in manifest['files'].items():
+                dst = osp.join(sdk_root, rel)
+                if osp.isfile(dst) and osp.getsize(dst) == meta['size'] and wpe_util.hash_file(dst) == meta['sha256']:
+                    continue
+                os.makedirs(osp.dirname(dst), exist_ok=True)
+                shutil.copy2(osp.join(entry_dir, 'files', rel), dst)
+            # most recently used entries are evicted last
+            os.utime(manifest_path)
+        logging.info(f'Agent build cache hit: {manifest["platform"]} {manifest["configuration"]} @ {manifest["commit"]}')
+        return manifest
+
+    def store(self, key: str, info: dict, result: dict, artifacts: dict[str, str]):
+        """
+        info: commit, platform, configuration of the build.
+        artifacts: {path relative to WWISESDK: absolute path}
+        """
+        with self._lock:
+            entry_dir = osp.join(self.cacheDir, key)
+            tmp_dir = f'{entry_dir}.tmp'
+            wpe_util.remove_path(tmp_dir)
+            manifest = dict(info, result=result, files={})
+            for rel, path in artifacts.items():
+                dst = osp.join(tmp_dir, 'files', rel)
+                os.makedirs(osp.dirname(dst), exist_ok=True)
+                shutil.copy2(path, dst)
+                manifest['files'][rel] = {'size': osp.getsize(dst), 'sha256': wpe_util.hash_file(dst)}
+            util.save_json(osp.join(tmp_dir, 'manifest.json'), manifest)
+            wpe_util.remove_path(entry_dir)
+            os.rename(tmp_dir, entry_dir)
+            self._evict()
+        logging.info(f'Agent build cache stored: {info["platform"]} {info["configuration"]} @ {info["commit"]}, '
+                     f'{len(artifacts)} artifacts')
+
+    def usage(self) -> tuple[int, int]:
+        """
+        Return the number of entries and their artifact bytes.
+        """
+        with self._lock:
+            entries = self._list_entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def _list_entries(self) -> list[tuple[float, int, str]]:
+        """
+        Return (last use, artifact bytes, entry dir) of complete entries.
+        """
+        if not osp.isdir(self.cacheDir):
+            return []
+        entries = []
+        for name in os.listdir(self.cacheDir):
+            manifest_path = osp.join(self.cacheDir, name, 'manifest.json')
+            if name.endswith('.tmp') or not osp.isfile(manifest_path):
+                continue
+            size = sum(meta['size'] for meta in util.load_json(manifest_path)['files'].values())
+            entries.append((osp.getmtime(manifest_path), size, osp.join(self.cacheDir, name)))
+        return entries
+
+    def _evict(self):
+        entries = self._list_entries()
+        entries.sort(reverse=True)
+        total = 0
+        for _, size, entry_dir in entries:
+            total += size
+            if total > self.maxBytes:
+                logging.info(f'Agent build cache evicted: {osp.basename(entry_dir)}')
+                wpe_util.remove_path(entry_dir)
@@ -0,0 +1,207 @@
+import codecs
+import gzip
+import json
+import logging
+import os.path as osp
+import tarfile
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# project
+import wpe.util as wpe_util
+
+
+class AgentError(RuntimeError):
+    """
+    The agent is unreachable or lost the job, the work can be retried on another agent.
+    """
+
+
+class AgentJobFailed(RuntimeError):
+    """
+    The job ran on the agent and failed.
+    """
+
+
+class AgentClient:
+    """
+    HTTP client of one build agent, shared by threads.
+    Connections are pooled, and reused with servers keeping them alive, e.g. behind a reverse proxy. Requests failing
+    to connect, and reads answered by a gateway error, are retried with exponential backoff; other failures raise
+    AgentError. With compress, JSON request bodies are gzipped.
+    Large JSON responses are gzipped by the agent.
+    """
+    FINISHED_STATES = ('succeeded', 'failed', 'cancelled')
+    # (connect, read) seconds. Log streams have no read timeout: a build step can stay silent for minutes
+    TIMEOUT = (10, 60)
+    STATUS_TIMEOUT = (5, 5)
+    STREAM_TIMEOUT = (10, None)
+
+    def __init__(self, url: str, retries: int = 3, backoff_seconds: float = 0.5, compress: bool = False,
+                 poll_seconds: float = 5, max_connections: int = 16):
+        """
+        url: `host:port` or URL of the agent
+        """
+        self.url = url if '://' in url else f'http://{url}'
+        self.compress = compress
+        self.pollSeconds = poll_seconds
+        # POST submits a job: only retried when the request was not sent
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries, other=0,
+                      backoff_factor=backoff_seconds, status_forcelist=(502, 504),
+                      allowed_methods=Retry.DEFAULT_ALLOWED_METHODS, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections, max_retries=retry)
+        self._session = requests.Session()
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._activeJobs: set[str] = set()
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def status(self) -> Optional[dict]:
+        """
+        Return the agent `/status`, None if the agent is unavailable.
+        """
+        try:
+            return self.request('get', '/status', accepted=(200,), timeout=self.STATUS_TIMEOUT).json()
+        except (AgentError, ValueError) as e:
+            logging.warning(f'Build agent {self.url} unavailable: {e}')
+            return None
+
+    def submit(self, method: str, args: dict) -> str:
+        """
+        Queue a job and return its id.
+        """
+        logging.info(f'RPC call: {method} on {self.url} with args: {args}')
+        return self.request('post', f'/{method}', json=args).json()['id']
+
+    def call(self, method: str, args: dict, label: str = '') -> dict:
+        """
+        Queue a job, print its log live, and return its result. Raise AgentJobFailed if the job failed.
+        """
+        job_id = self.submit(method, args)
+        with self._lock:
+            self._activeJobs.add(job_id)
+        try:
+            self._stream_log(job_id, label or method)
+            response = self.request('get', f'/jobs/{job_id}/result', accepted=(200, 500))
+        finally:
+            with self._lock:
+                self._activeJobs.discard(job_id)
+        result = response.json()
+        if response.status_code != 200 or not result['succeeded']:
+            raise AgentJobFailed(f'{method} failed on {self.url}: {result.get("state")}')
+        return result
+
+    def cancel(self, job_id: str):
+        try:
+            self.request('post', f'/jobs/{job_id}/cancel', accepted=(200, 409))
+        except AgentError as e:
+            logging.warning(f'Failed to cancel job {job_id}: {e}')
+
+    def cancel_all(self):
+        """
+        Cancel the jobs of the calls in progress.
+        """
+        with self._lock:
+            jobs = list(self._activeJobs)
+        for job_id in jobs:
+            self.cancel(job_id)
+
+    def download_artifacts(self, plugin_name: str, sdk_root: str, platform_name: str, configuration: str):
+        """
+        Download the artifacts of one platform and configuration whose hash differs from those under sdk_root.
+        """
+        query = {'plugin': plugin_name, 'platform': platform_name, 'configuration': configuration}
+        manifest = self.request('get', '/artifacts/manifest', params=query).json()['files']
+        changed = [rel for rel, meta in manifest.items()
+                   if not _is_same_file(osp.join(sdk_root, rel), meta['size'], meta['sha256'])]
+        if not changed:
+            logging.info(f'{platform_name} {configuration} binaries from {self.url} are up to date')
+            return
+        logging.info(f'Downloading {len(changed)} {platform_name} {configuration} binaries from {self.url}')
+        try:
+            with self.request('post', '/artifacts', json=dict(query, files=changed), stream=True,
+                              timeout=self.STREAM_TIMEOUT) as response:
+                with tarfile.open(fileobj=response.raw, mode='r|gz') as tar:
+                    for member in tar:
+                        logging.info(f'Received {member.name}')
+                        _extract_safely(tar, member, sdk_root)
+        # a partially received artifact is rewritten by the retry
+        except (requests.RequestException, tarfile.TarError, EOFError, OSError) as e:
+            raise AgentError(f'Artifact download from {self.url} interrupted: {e}') from e
+
+    def request(self, method: str, path: str, accepted=(200, 202), **kwargs) -> requests.Response:
+        """
+        Send a request to the agent, raise AgentError when it fails or its status is not accepted.
+        """
+        kwargs.setdefault('timeout', self.TIMEOUT)
+        if self.compress and 'json' in kwargs:
+            kwargs['data'] = gzip.compress(json.dumps(kwargs.pop('json')).encode('utf-8'), compresslevel=6)
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **{'Content-Type': 'application/json',
+                                                                     'Content-Encoding': 'gzip'})
+        url = f'{self.url}{path}'
+        try:
+            response = self._session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            raise AgentError(f'{method.upper()} {url}: {e}') from e
+        if response.status_code not in accepted:
+            text = response.text[:200]
+            response.close()
+            raise AgentError(f'{method.upper()} {url}: HTTP {response.status_code} {text}')
+        return response
+
+    def _stream_log(self, job_id: str, label: str):
+        """
+        Print the job log, each line prefixed with the label, until the job finishes.
+        Resume from the last received byte if the connection drops.
+        """
+        offset = 0
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        pending_line = ''
+        while True:
+            try:
+                with self.request('get', f'/jobs/{job_id}/log', accepted=(200,), params={'offset': offset},
+                                  stream=True, timeout=self.STREAM_TIMEOUT) as response:
+                    for chunk in response.iter_content(chunk_size=None):
+                        offset += len(chunk)
+                        *lines, pending_line = (pending_line + decoder.decode(chunk)).split('\n')
+                        for line in lines:
+                            print(f'[{label}] {line}', flush=True)
+            except (AgentError, requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                logging.warning(f'Log stream from {self.url} interrupted, retrying: {e}')
+            state = self.request('get', f'/jobs/{job_id}').json()['state']
+            if state in self.FINISHED_STATES:
+                if pending_line:
+                    print(f'[{label}] {pending_line}', flush=True)
+                return
+            time.sleep(self.pollSeconds)
+
+
+def _extract_safely(tar: tarfile.TarFile, member: tarfile.TarInfo, dst_dir: str):
+    """
+    Extract with the `data` filter, or, before Python 3.11.4, accept regular files and folders under dst_dir only.
+    """
+    if hasattr(tarfile, 'data_filter'):
+        tar.extract(member, dst_dir, filter='data')
+        return
+    root = osp.realpath(dst_dir)
+    if not (member.isfile() or member.isdir()) or osp.commonpath([root, osp.realpath(osp.join(root, member.name))]) != root:
+        raise AgentError(f'Refusing to extract artifact: {member.name}')
+    tar.extract(member, dst_dir)
+
+
+def _is_same_file(path: str, size: int, sha256: str) -> bool:
+    return osp.isfile(path) and osp.getsize(path) == size and wpe_util.hash_file(path) == sha256
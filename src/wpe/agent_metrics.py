@@ -0,0 +1,76 @@
+import collections
+import threading
+
+# seconds, from a quick premake to a full Xcode build
+_DURATION_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+
+    def _escape(_value):
+        return str(_value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return '{' + ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items()) + '}'
+
+
+class AgentMetrics:
+    """
+    Counters and histograms of a build agent since it started, rendered in the Prometheus text exposition format.
+    Gauges reflecting the current state are passed to `render`.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobsTotal = collections.Counter()
+        self._cacheLookups = collections.Counter()
+        # (kind, step) -> [bucket counts..., sum, count]
+        self._durations: dict[tuple[str, str], list[float]] = {}
+
+    def record_job(self, job):
+        """
+        job: finished `_AgentJob`
+        """
+        with self._lock:
+            self._jobsTotal[(job.kind, job.state)] += 1
+            for cache, hit in job.cacheLookups:
+                self._cacheLookups[(cache, 'hit' if hit else 'miss')] += 1
+            for step, seconds in job.commandSeconds:
+                histogram = self._durations.setdefault((job.kind, step), [0] * (len(_DURATION_BUCKETS) + 2))
+                for i, bound in enumerate(_DURATION_BUCKETS):
+                    if seconds <= bound:
+                        histogram[i] += 1
+                histogram[-2] += seconds
+                histogram[-1] += 1
+
+    def render(self, gauges: list[tuple[str, str, list[tuple[dict, float]]]]) -> str:
+        """
+        gauges: (name, help, [(labels, value)])
+        """
+        lines = []
+
+        def _add(_name, _type, _help, _samples):
+            lines.append(f'# HELP {_name} {_help}')
+            lines.append(f'# TYPE {_name} {_type}')
+            lines.extend(f'{_sample_name}{_format_labels(_labels)} {_value}' for _sample_name, _labels, _value in _samples)
+
+        for name, help_text, samples in gauges:
+            _add(name, 'gauge', help_text, [(name, labels, value) for labels, value in samples])
+        with self._lock:
+            _add('wpe_agent_jobs_total', 'counter', 'Finished jobs by kind and final state.',
+                 [('wpe_agent_jobs_total', {'kind': kind, 'state': state}, count)
+                  for (kind, state), count in sorted(self._jobsTotal.items())])
+            _add('wpe_agent_cache_lookups_total', 'counter',
+                 'Cache lookups by cache and result: build results by commit, commits already fetched.',
+                 [('wpe_agent_cache_lookups_total', {'cache': cache, 'result': result}, count)
+                  for (cache, result), count in sorted(self._cacheLookups.items())])
+            samples = []
+            for (kind, step), histogram in sorted(self._durations.items()):
+                labels = {'kind': kind, 'step': step}
+                samples.extend(('wpe_agent_command_duration_seconds_bucket', dict(labels, le=str(bound)), histogram[i])
+                               for i, bound in enumerate(_DURATION_BUCKETS))
+                samples.append(('wpe_agent_command_duration_seconds_bucket', dict(labels, le='+Inf'), histogram[-1]))
+                samples.append(('wpe_agent_command_duration_seconds_sum', labels, histogram[-2]))
+                samples.append(('wpe_agent_command_duration_seconds_count', labels, histogram[-1]))
+            _add('wpe_agent_command_duration_seconds', 'histogram', 'Duration of the commands run by jobs.', samples)
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,94 @@
+import logging
+import threading
+from typing import Callable, Optional, TypeVar
+
+# project
+from wpe.agent_client import AgentClient, AgentError, AgentJobFailed
+from wpe.global_config import GlobalConfig, ConfigKey
+
+T = TypeVar('T')
+
+
+class AgentPool:
+    """
+    Dispatch remote work over several build agents.
+    Each unit of work goes to the least loaded agent: jobs queued and running per worker, as reported by `/status`,
+    plus the work this client already sent there, then the system load per core. Work failing because of its agent
+    is retried on the other agents.
+    """
+    def __init__(self, agents: list[str], poll_seconds: float = 5, compress: bool = False):
+        """
+        agents: `host:port` or URLs
+        """
+        clients = [AgentClient(agent, compress=compress, poll_seconds=poll_seconds) for agent in agents]
+        self._clients = {client.url: client for client in clients}
+        self.agents = list(self._clients)
+        self._inFlight = {agent: 0 for agent in self.agents}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_config(fallback_agents: Optional[list[str]] = None) -> 'AgentPool':
+        """
+        Agents from the `build-agents` config, a comma-separated `host:port` list, else the fallback agents.
+        """
+        configured = [a.strip() for a in str(GlobalConfig().get(ConfigKey.BUILD_AGENTS)).split(',') if a.strip()]
+        return AgentPool(configured or fallback_agents or [])
+
+    def status(self, agent: str) -> Optional[dict]:
+        return self._clients[agent].status()
+
+    def run(self, work: Callable[[str], T], label: str = '') -> T:
+        """
+        Run work(agent) on the least loaded agent, then on the next ones while it raises AgentError.
+        """
+        tried = set()
+        while True:
+            agent = self._acquire(tried)
+            logging.info(f'{label} dispatched to {agent}')
+            try:
+                return work(agent)
+            except AgentError as e:
+                logging.warning(f'{label} failed on {agent}, retrying on another agent: {e}')
+                tried.add(agent)
+            finally:
+                self._release(agent)
+
+    def _acquire(self, excluded: set[str]) -> str:
+        # draining agents finish their jobs but refuse new ones
+        statuses = {agent: status for agent in self.agents
+                    if agent not in excluded and (status := self.status(agent)) is not None
+                    and not status.get('draining')}
+        if not statuses:
+            raise AgentError(f'No build agent available, tried: {", ".join(self.agents)}')
+
+        def _score(_agent):
+            _status = statuses[_agent]
+            pending = _status['queued'] + _status['running'] + self._inFlight[_agent]
+            load = (_status.get('loadAverage') or 0) / _status.get('cpuCount', 1)
+            return pending / max(1, _status['workers']), load
+
+        # score and count in one go, so that concurrent dispatches see each other
+        with self._lock:
+            agent = min(statuses, key=_score)
+            self._inFlight[agent] += 1
+        return agent
+
+    def _release(self, agent: str):
+        with self._lock:
+            self._inFlight[agent] -= 1
+
+    def call(self, agent: str, method: str, args: dict, label: str = '') -> dict:
+        """
+        Queue a job on the agent, print its log live, and return its result. Raise AgentJobFailed if the job failed.
+        """
+        return self._clients[agent].call(method, args, label)
+
+    def cancel_all(self):
+        for client in self._clients.values():
+            client.cancel_all()
+
+    def download_artifacts(self, agent: str, plugin_name: str, sdk_root: str, platform_name: str, configuration: str):
+        """
+        Download the artifacts of one platform and configuration whose hash differs from those under sdk_root.
+        """
+        self._clients[agent].download_artifacts(plugin_name, sdk_root, platform_name, configuration)
@@ -0,0 +1,262 @@
+import collections
+import io
+import os
+import os.path as osp
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+# project
+import wpe.util as wpe_util
+
+# LZMA2 dictionary size of each xz preset level
+_PRESET_DICT_SIZES = {
+    0: 256 << 10,
+    1: 1 << 20,
+    2: 2 << 20,
+    3: 4 << 20,
+    4: 4 << 20,
+    5: 8 << 20,
+    6: 8 << 20,
+    7: 16 << 20,
+    8: 32 << 20,
+    9: 64 << 20,
+}
+
+
+def _import_lzma():
+    """
+    lzma is missing from some python builds. Raise like `tarfile.open(mode='w:xz')` then, so that callers fall back
+    to the xz executable.
+    """
+    try:
+        import lzma
+    except ImportError:
+        raise tarfile.CompressionError('lzma module is not available') from None
+    return lzma
+
+
+class ParallelXzWriter:
+    """
+    Write-only file object compressing to .xz with several threads.
+    Input is split into fixed size blocks, like `xz -T`, and each block is compressed as an independent xz stream.
+    Concatenated streams are a standard .xz file, readable by `xz`, liblzma and python `lzma`.
+    """
+    def __init__(self, path: str, preset: int = 6, threads: int = 0):
+        self._lzma = _import_lzma()
+        self.preset = preset
+        self.threads = threads or os.cpu_count() or 1
+        self.blockSize = self.block_size(preset)
+        self._file = open(path, 'wb')
+        self._executor = ThreadPoolExecutor(max_workers=self.threads)
+        self._pending = collections.deque()
+        self._buffer = bytearray()
+        self._hasBlocks = False
+
+    @staticmethod
+    def block_size(preset: int) -> int:
+        # same block size as `xz -T`: 3 times the dictionary size
+        return 3 * _PRESET_DICT_SIZES[preset & ~_import_lzma().PRESET_EXTREME]
+
+    def write(self, data) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.blockSize:
+            self._submit(bytes(self._buffer[:self.blockSize]))
+            del self._buffer[:self.blockSize]
+        return len(data)
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            if self._buffer or not self._hasBlocks:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown()
+            self._file.close()
+
+    def _submit(self, block: bytes):
+        self._hasBlocks = True
+        self._pending.append(self._executor.submit(self._lzma.compress, block, format=self._lzma.FORMAT_XZ, preset=self.preset))
+        # bound memory: keep at most two blocks in flight per thread
+        while len(self._pending) > self.threads * 2:
+            self._file.write(self._pending.popleft().result())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ArchiveEntry:
+    """
+    A file system entry scanned once, shared by all archives it goes to.
+    """
+    def __init__(self, path: str, tarinfo: tarfile.TarInfo):
+        self.path = path
+        self.tarinfo = tarinfo
+        self._digest: Optional[str] = None
+
+    @property
+    def arcname(self) -> str:
+        return self.tarinfo.name
+
+    def digest(self) -> str:
+        if self._digest is None:
+            self._digest = wpe_util.hash_file(self.path)
+        return self._digest
+
+
+class PackageWriter:
+    """
+    Write several tar.xz packages, each made of a subset of the same artifact list, in one pass.
+    Artifact trees are walked and stat'ed once, every file is read once and streamed to each archive selecting it.
+    Member order matches `TarFile.add(recursive=True)` on each selected artifact.
+    """
+    # files shared by several archives are read into memory up to this size, larger ones are re-opened per archive
+    _MAX_SHARED_READ = 64 << 20
+
+    def __init__(self, preset: int = 6, threads: int = 1, package_cache=None):
+        self.preset = preset
+        self.threads = threads
+        self.packageCache = package_cache
+        self._scanner = tarfile.TarFile(fileobj=io.BytesIO(), mode='w', format=tarfile.GNU_FORMAT)
+
+    def settings(self) -> str:
+        """
+        Everything but the artifacts that shapes the archive bytes: tar format, xz preset, and block size when
+        compressed with several threads. The thread count itself does not change the output.
+        """
+        blocks = f'blocks={ParallelXzWriter.block_size(self.preset)}' if self.threads != 1 else 'single-stream'
+        return f'tar={tarfile.GNU_FORMAT};xz-preset={self.preset};{blocks}'
+
+    def write(self, artifacts_dst_pair: list[tuple[str, str]], archives: dict[str, Callable[[str], bool]],
+              cache_labels: Optional[dict[str, str]] = None) -> list[str]:
+        """
+        archives: output path -> predicate selecting the artifacts of the archive.
+        cache_labels: output path -> package cache label, required to use the package cache.
+        Return the written or restored archives, archives without any artifact are not created.
+        """
+        scanned = []
+        for artifact, dest in artifacts_dst_pair:
+            entries = []
+            self._scan_tree(artifact, dest, entries)
+            scanned.append((artifact, entries))
+        selections = {output: [i for i, (artifact, _) in enumerate(scanned) if need_add(artifact)]
+                      for output, need_add in archives.items()}
+        selections = {output: indices for output, indices in selections.items() if indices}
+        outputs = list(selections)
+
+        fingerprints = {}
+        if self.packageCache and cache_labels:
+            for output in list(selections):
+                members = [e for i in selections[output] for e in scanned[i][1]]
+                fingerprints[output] = self.packageCache.fingerprint(members, self.settings())
+                if self.packageCache.restore(cache_labels[output], fingerprints[output], output):
+                    print("Reused cached {}".format(cache_labels[output]))
+                    del selections[output]
+
+        if selections:
+            self._write_archives(scanned, selections)
+            for output in selections:
+                if output in fingerprints:
+                    self.packageCache.store(cache_labels[output], fingerprints[output], output)
+        return outputs
+
+    def _scan_tree(self, path: str, arcname: str, entries: list[ArchiveEntry]):
+        tarinfo = self._scanner.gettarinfo(path, arcname)
+        # hard links are resolved per archive by tarfile, store them as regular files since archives differ
+        self._scanner.inodes.clear()
+        if tarinfo is None:
+            return
+        entries.append(ArchiveEntry(path, tarinfo))
+        if tarinfo.isdir():
+            for f in sorted(os.listdir(path)):
+                self._scan_tree(osp.join(path, f), osp.join(arcname, f), entries)
+
+    def _open_tar(self, output: str, to_close: list):
+        if self.threads != 1:
+            xz = ParallelXzWriter(output, self.preset, self.threads)
+            to_close.append(xz)
+            tar = tarfile.open(fileobj=xz, mode='w|', format=tarfile.GNU_FORMAT)
+        else:
+            tar = tarfile.open(output, 'w:xz', format=tarfile.GNU_FORMAT, preset=self.preset)
+        to_close.append(tar)
+        return tar
+
+    def _write_archives(self, scanned: list[tuple[str, list[ArchiveEntry]]], selections: dict[str, list[int]]):
+        # archives are written under a temporary name, so that a finished package appears atomically
+        to_close = []
+        succeeded = False
+        try:
+            tars_by_artifact = [[] for _ in scanned]
+            for output, indices in selections.items():
+                tar = self._open_tar(f'{output}.part', to_close)
+                for i in indices:
+                    tars_by_artifact[i].append(tar)
+            for (_, entries), tars in zip(scanned, tars_by_artifact):
+                if not tars:
+                    continue
+                for entry in entries:
+                    self._add_entry(entry, tars)
+            succeeded = True
+        finally:
+            # close each tar before its compressor
+            for obj in reversed(to_close):
+                obj.close()
+            for output in selections:
+                if succeeded:
+                    os.replace(f'{output}.part', output)
+                else:
+                    wpe_util.remove_path(f'{output}.part')
+
+    def _add_entry(self, entry: ArchiveEntry, tars: list):
+        if not entry.tarinfo.isreg():
+            for tar in tars:
+                tar.addfile(entry.tarinfo)
+            return
+        if len(tars) > 1 and entry.tarinfo.size <= self._MAX_SHARED_READ:
+            with open(entry.path, 'rb') as f:
+                content = f.read()
+            for tar in tars:
+                tar.addfile(entry.tarinfo, io.BytesIO(content))
+            return
+        for tar in tars:
+            with open(entry.path, 'rb') as f:
+                tar.addfile(entry.tarinfo, f)
+
+
+class BundleWriter:
+    """
+    Stream packages into the bundle zip as soon as they are written.
+    Members are laid out like `kkpyutil.zip_dir` on `dist/<bundle_name>`; already compressed .tar.xz are stored as is.
+    """
+    def __init__(self, zip_path: str, bundle_name: str):
+        self.zipPath = zip_path
+        self.bundleName = bundle_name
+        self.added: set[str] = set()
+        os.makedirs(osp.dirname(zip_path), exist_ok=True)
+        self._zip = zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED)
+        dir_info = zipfile.ZipInfo(f'{bundle_name}/', time.localtime()[:6])
+        dir_info.external_attr = 0o40775 << 16 | 0x10
+        self._zip.writestr(dir_info, b'')
+
+    def add(self, path: str):
+        if path in self.added:
+            return
+        compress_type = zipfile.ZIP_STORED if path.endswith('.xz') else zipfile.ZIP_DEFLATED
+        self._zip.write(path, f'{self.bundleName}/{osp.basename(path)}', compress_type=compress_type)
+        self.added.add(path)
+
+    def close(self):
+        self._zip.close()
+
+    def discard(self):
+        self._zip.close()
+        wpe_util.remove_path(self.zipPath)
@@ -1,7 +1,37 @@
+import collections
+import gzip
+import hashlib
+import io
+import os
+import os.path as osp
+import platform
+import queue
+import re
+import signal
 import subprocess
 import logging
+import shlex
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from typing import Optional
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+# project
+import wpe.util as wpe_util
+from wpe.agent_build_cache import AgentBuildCache
+from wpe.agent_metrics import AgentMetrics
+from wpe.pathman import PathMan
+
+# shared by the agents of this host, which may work on the same project roots
+_ROOT_LOCK_DIR = osp.join(tempfile.gettempdir(), 'wpe_build_agent', 'locks')
 
 
 class _CommandResult:
@@ -10,6 +40,7 @@ class _CommandResult:
         self.command = []
         self.stdout = ''
         self.stderr = ''
+        self.seconds = 0.0
 
     @staticmethod
     def from_completed_process(completed_process: subprocess.CompletedProcess):
@@ -33,24 +64,146 @@ class _CommandResult:
         return {'succeeded': self.succeeded,
                 'args': self.command,
                 'stdout': self.stdout,
-                'stderr': self.stderr}
+                'stderr': self.stderr,
+                'seconds': round(self.seconds, 3)}
 
-class BuildAgent:
-    def __init__(self):
-        self._app = Flask('BuildAgent', static_folder=None)
 
-    def start(self, port: int):
-        self._app.add_url_rule('/git_sync', 'git_sync', self.git_sync, methods=['POST'])
-        self._app.add_url_rule('/premake', 'premake', self.premake, methods=['POST'])
-        self._app.add_url_rule('/build', 'build', self.build, methods=['POST'])
-        self._app.run(host='0.0.0.0', port=port)
+class _AgentJob:
+    """
+    Commands queued by one agent request, run in order by the agent worker.
+    steps: (label, command arguments) list, a single step job reports the command result as is. Commands run without
+    a shell, so request fields are passed as plain arguments.
+    Command output goes to the job log file as it is produced, results only keep its tail.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+    _MAX_RESULT_OUTPUT = 64 << 10
+    _ROOT_LOCK_POLL_SECONDS = 1.0
 
-    @staticmethod
-    def run_command(command) -> _CommandResult:
+    def __init__(self, kind: str, params: dict, steps: list[tuple[str, list[str]]], log_dir: str):
+        self.id = uuid.uuid4().hex
+        # jobs on the same project root never run concurrently
+        self.root = osp.normcase(osp.abspath(params['root'])) if params.get('root') else ''
+        self.logPath = osp.join(log_dir, f'{self.id}.log')
+        self.kind = kind
+        self.params = params
+        self.steps = steps
+        self.state = self.QUEUED
+        self.results: dict[str, _CommandResult] = {}
+        self.cached = False
+        # metrics: (step label, seconds) of the commands run, (cache name, hit) of the cache lookups
+        self.commandSeconds: list[tuple[str, float]] = []
+        self.cacheLookups: list[tuple[str, bool]] = []
+        self.createdAt = time.time()
+        self.startedAt: Optional[float] = None
+        self.finishedAt: Optional[float] = None
+        self._proc: Optional[subprocess.Popen] = None
+        self._cancelRequested = False
+        self._lock = threading.Lock()
+
+    def is_finished(self) -> bool:
+        return self.state in self.FINISHED_STATES
+
+    def run(self):
+        with self._lock:
+            if self._cancelRequested:
+                return
+            self.state = self.RUNNING
+            self.startedAt = time.time()
+        root_lock = self._lock_root()
+        try:
+            if not self._cancelRequested:
+                self._execute()
+        finally:
+            if root_lock:
+                root_lock.release()
+        with self._lock:
+            if self._cancelRequested:
+                self.state = self.CANCELLED
+            else:
+                self.state = self.SUCCEEDED if all(r.succeeded for r in self.results.values()) else self.FAILED
+            self.finishedAt = time.time()
+
+    def _lock_root(self) -> Optional[wpe_util.InterProcessLock]:
+        """
+        Wait until no other process of this host, e.g. another agent, works on the root. Return None if the job has no
+        root or is cancelled meanwhile.
+        """
+        if not self.root:
+            return None
+        root_lock = wpe_util.InterProcessLock(osp.join(_ROOT_LOCK_DIR, f'{hashlib.sha1(self.root.encode("utf-8")).hexdigest()}.lock'))
+        waiting = False
+        while not root_lock.try_acquire():
+            if self._cancelRequested:
+                return None
+            if not waiting:
+                self._append_log(f'Waiting for another process working on {self.root}\n')
+                waiting = True
+            time.sleep(self._ROOT_LOCK_POLL_SECONDS)
+        return root_lock
+
+    def _execute(self):
+        for label, command in self.steps:
+            self._run_step(label, command)
+            if self._cancelRequested:
+                break
+
+    def _run_step(self, label: str, command: list[str]):
+        self.results[label] = self._run_command(command)
+        self.commandSeconds.append((label, self.results[label].seconds))
+
+    def _append_log(self, text: str):
+        with open(self.logPath, 'ab') as log:
+            log.write(text.encode('utf-8'))
+
+    def cancel(self) -> bool:
+        """
+        Return False if the job already finished.
+        """
+        with self._lock:
+            if self.is_finished():
+                return False
+            self._cancelRequested = True
+            if self.state == self.QUEUED:
+                self.state = self.CANCELLED
+                self.finishedAt = time.time()
+            elif self._proc is not None and self._proc.poll() is None:
+                self._terminate_process_tree()
+        return True
+
+    def _run_command(self, command) -> _CommandResult:
+        start_time = time.time()
+        result = self._run_command_untimed(command)
+        result.seconds = time.time() - start_time
+        return result
+
+    def _run_command_untimed(self, command) -> _CommandResult:
         try:
-            logging.info(f'Running command: {command}')
-            proc = subprocess.run(command, shell=True, capture_output=True, text=True)
-            result = _CommandResult.from_completed_process(proc)
+            logging.info(f'[{self.id}] Running command: {command}')
+            with self._lock:
+                if self._cancelRequested:
+                    raise RuntimeError('Job cancelled.')
+                # own process group, so that cancelling also stops the toolchain processes spawned by the command
+                group_kwargs = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP} \
+                    if platform.system() == 'Windows' else {'start_new_session': True}
+                command_line = shlex.join(command)
+                log = open(self.logPath, 'ab')
+                log.write(f'$ {command_line}\n'.encode('utf-8'))
+                log.flush()
+                start = log.tell()
+                try:
+                    self._proc = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, **group_kwargs)
+                finally:
+                    log.close()
+            returncode = self._proc.wait()
+            result = _CommandResult()
+            result.command = command
+            result.succeeded = returncode == 0
+            result.stdout = self._read_log_tail(start)
             logging.info(result)
             return result
         except Exception as e:
@@ -61,31 +214,684 @@ class BuildAgent:
             result.stderr = str(e)
             return result
 
+    def _read_log_tail(self, start: int) -> str:
+        with open(self.logPath, 'rb') as f:
+            end = f.seek(0, os.SEEK_END)
+            f.seek(max(start, end - self._MAX_RESULT_OUTPUT))
+            tail = f.read().decode('utf-8', errors='replace').strip()
+        return tail if end - start <= self._MAX_RESULT_OUTPUT else f'...\n{tail}'
+
+    def _terminate_process_tree(self):
+        if platform.system() == 'Windows':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(self._proc.pid)], capture_output=True)
+            return
+        try:
+            os.killpg(self._proc.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def status_json(self):
+        return {'id': self.id,
+                'kind': self.kind,
+                'params': self.params,
+                'state': self.state,
+                'cached': self.cached,
+                'createdAt': self.createdAt,
+                'startedAt': self.startedAt,
+                'finishedAt': self.finishedAt,
+                'steps': [{'label': label,
+                           'succeeded': self.results[label].succeeded if label in self.results else None,
+                           'seconds': round(self.results[label].seconds, 3) if label in self.results else None}
+                          for label, _ in self.steps]}
+
+    def result_json(self):
+        if len(self.steps) == 1 and self.steps[0][0] in self.results:
+            result = self.results[self.steps[0][0]].to_json()
+        else:
+            result = {label: res.to_json() for label, res in self.results.items()}
+        result['succeeded'] = self.state == self.SUCCEEDED
+        result['id'] = self.id
+        result['state'] = self.state
+        result['cached'] = self.cached
+        return result
+
+
+class _GitSyncJob(_AgentJob):
+    """
+    Fetch only the requested branch, optionally shallow, and skip the fetch when the requested commit is already
+    present. Then reset the tree to the commit, or to the fetched branch head.
+    """
+    def __init__(self, params: dict, log_dir: str):
+        root, branch = params.get('root'), params.get('branch')
+        commit, depth = params.get('commit'), int(params.get('depth') or 0)
+        depth_args = ['--depth', str(depth)] if depth > 0 else []
+        steps = [('git fetch', ['git', '-C', root, 'fetch', *depth_args, 'origin', f'+refs/heads/{branch}:refs/remotes/origin/{branch}']),
+                 ('git reset', ['git', '-C', root, 'reset', '--hard', commit or f'origin/{branch}'])]
+        super().__init__('git_sync', params, steps, log_dir)
+
+    def _execute(self):
+        (fetch_label, fetch_command), (reset_label, reset_command) = self.steps
+        commit = self.params.get('commit')
+        if commit:
+            self.cacheLookups.append(('git_commit', self._has_commit(commit)))
+        if commit and self.cacheLookups[-1][1]:
+            skipped = _CommandResult()
+            skipped.command = fetch_command
+            skipped.stdout = f'Skipped: {commit} is already present.'
+            self._append_log(f'{skipped.stdout}\n')
+            self.results[fetch_label] = skipped
+        else:
+            self._run_step(fetch_label, fetch_command)
+        if not self._cancelRequested and self.results[fetch_label].succeeded:
+            self._run_step(reset_label, reset_command)
+        timings = ', '.join(f'{label} {res.seconds:.1f}s' for label, res in self.results.items())
+        self._append_log(f'git sync phases: {timings}\n')
+        logging.info(f'[{self.id}] git sync phases: {timings}')
+
+    def _has_commit(self, commit: str) -> bool:
+        proc = subprocess.run(['git', '-C', self.params.get('root'), 'cat-file', '-e', f'{commit}^{{commit}}'],
+                              capture_output=True)
+        return proc.returncode == 0
+
+
+class _RemoteBuildJob(_AgentJob):
+    """
+    Build job answered from the agent build cache when the same commit was already built, stored back on success.
+    """
+    def __init__(self, params: dict, steps: list[tuple[str, list[str]]], log_dir: str, cache: AgentBuildCache,
+                 artifacts: '_ArtifactIndex'):
+        super().__init__('build', params, steps, log_dir)
+        self.cache = cache
+        self.artifacts = artifacts
+
+    def _execute(self):
+        root, platform_name, configuration = self.params.get('root'), self.params.get('platform'), self.params.get('configuration')
+        try:
+            plugin_name = PathMan.read_plugin_name(osp.join(root, 'PremakePlugin.lua'))
+            sdk_root = self.artifacts.sdk_root()
+            commit = self.cache.commit(root)
+        except Exception as e:
+            logging.warning(f'[{self.id}] Build not cacheable: {e}')
+            commit = None
+        if not commit:
+            super()._execute()
+            return
+
+        key = self.cache.key(commit, platform_name, configuration, plugin_name, sdk_root)
+        entry = self.cache.restore(key, sdk_root)
+        self.cacheLookups.append(('build', entry is not None))
+        if entry:
+            self._append_log(f'Build cache hit: {platform_name} {configuration} @ {commit}, '
+                             f'{len(entry["files"])} artifacts restored\n')
+            result = _CommandResult()
+            result.command = entry['result']['args']
+            result.stdout = entry['result']['stdout']
+            self.results[self.steps[0][0]] = result
+            self.cached = True
+            return
+
+        super()._execute()
+        if self._cancelRequested or not all(r.succeeded for r in self.results.values()):
+            return
+        try:
+            artifacts = self.artifacts.find(plugin_name, platform_name, configuration)
+            self.cache.store(key, {'commit': commit, 'platform': platform_name, 'configuration': configuration},
+                             self.results[self.steps[0][0]].to_json(), artifacts)
+        except Exception as e:
+            logging.warning(f'[{self.id}] Failed to store build in cache: {e}')
+
+
+class _StreamPipe:
+    """
+    Write-only file object handing written bytes over to a reader thread, at most `max_chunks` chunks in flight.
+    Writes fail once the reader is gone, e.g. when the client disconnected.
+    """
+    def __init__(self, max_chunks: int = 16):
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._abandoned = False
+
+    def write(self, data) -> int:
+        if data:
+            self._put(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._put(None)
+
+    def fail(self, error: Exception):
+        self._put(error)
+
+    def _put(self, item):
+        while True:
+            if self._abandoned:
+                raise BrokenPipeError('Stream reader went away.')
+            try:
+                self._chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                pass
+
+    def __iter__(self):
+        try:
+            while (chunk := self._chunks.get()) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            self._abandoned = True
+
+
+class _ArtifactIndex:
+    """
+    Plugin build artifacts under the agent WWISESDK: files named after the plugin, debug symbol bundles excluded.
+    Hashes are cached by (size, mtime), so repeated manifest requests only hash rebuilt binaries.
+    """
+    def __init__(self):
+        self._hashes: dict[str, tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def sdk_root() -> str:
+        sdk_root = os.environ.get('WWISESDK', '')
+        if not osp.isdir(sdk_root):
+            raise FileNotFoundError(f'WWISESDK is not set to a valid directory on the build agent: {sdk_root}')
+        return sdk_root
+
+    def find(self, plugin_name: str, platform_name: Optional[str] = None,
+             configuration: Optional[str] = None) -> dict[str, str]:
+        """
+        Return {path relative to WWISESDK, with forward slashes: absolute path}, optionally only the artifacts of one
+        platform and configuration.
+        """
+        sdk_root = self.sdk_root()
+        artifacts = {}
+        for parent, dirs, filenames in os.walk(sdk_root):
+            dirs[:] = sorted(d for d in dirs if 'dSYM' not in d)
+            for f in filenames:
+                if plugin_name in f and 'dSYM' not in f:
+                    path = osp.join(parent, f)
+                    rel = osp.relpath(path, sdk_root).replace(os.sep, '/')
+                    if not platform_name or self.is_build_artifact(rel, platform_name, configuration):
+                        artifacts[rel] = path
+        return dict(sorted(artifacts.items()))
+
+    @staticmethod
+    def is_build_artifact(rel: str, platform_name: str, configuration: Optional[str]) -> bool:
+        """
+        e.g. iOS/Release-iphoneos/lib/libFooFX.a: platform folder first, then a folder named after the configuration,
+        with an optional sdk suffix.
+        """
+        parts = rel.split('/')
+        return parts[0].startswith(platform_name) and (not configuration or any(
+            p == configuration or p.startswith(f'{configuration}-') for p in parts[1:-1]))
+
+    def manifest(self, plugin_name: str, platform_name: Optional[str] = None,
+                 configuration: Optional[str] = None) -> dict[str, dict]:
+        return {rel: {'size': osp.getsize(path), 'sha256': self.hash(path)}
+                for rel, path in self.find(plugin_name, platform_name, configuration).items()}
+
+    def hash(self, path: str) -> str:
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._hashes.get(path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        digest = wpe_util.hash_file(path)
+        with self._lock:
+            self._hashes[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    @staticmethod
+    def write_tar(artifacts: dict[str, str], pipe: _StreamPipe):
+        try:
+            with gzip.GzipFile(fileobj=pipe, mode='wb', compresslevel=6) as gz:
+                with tarfile.open(fileobj=gz, mode='w|', format=tarfile.GNU_FORMAT) as tar:
+                    for rel, path in artifacts.items():
+                        tar.add(path, arcname=rel)
+            pipe.close()
+        except BrokenPipeError:
+            logging.warning('Artifact download aborted by the client')
+        except Exception as e:
+            logging.error(f'Failed to stream artifacts: {e}')
+            try:
+                pipe.fail(e)
+            except BrokenPipeError:
+                pass
+
+
+class _AgentRequestHandler(WSGIRequestHandler):
+    # socket timeout: drop clients stalled on a read or a write
+    timeout = 60
+
+
+class _AgentServer(ThreadedWSGIServer):
+    """
+    Thread per connection, at most max_connections at once: further clients wait in the listen backlog.
+    Werkzeug closes the connection after each response, so a connection is one request, or one log stream.
+    """
+    _SLOT_WAIT_SECONDS = 0.5
+
+    def __init__(self, host: str, port: int, app, max_connections: int):
+        super().__init__(host, port, app, handler=_AgentRequestHandler)
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._stopping = False
+
+    def shutdown(self):
+        # checked by process_request, which would otherwise keep serve_forever waiting for a slot
+        self._stopping = True
+        super().shutdown()
+
+    def process_request(self, request, client_address):
+        while not self._slots.acquire(timeout=self._SLOT_WAIT_SECONDS):
+            if self._stopping:
+                self.shutdown_request(request)
+                return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+class _GzipRequestMiddleware:
+    """
+    Decode gzip request bodies before Flask reads them, the decoded body bounded like any other.
+    """
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.maxBytes = max_bytes
+
+    def __call__(self, environ, start_response):
+        if environ.get('HTTP_CONTENT_ENCODING', '').lower() != 'gzip':
+            return self.app(environ, start_response)
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        if length > self.maxBytes:
+            return RequestEntityTooLarge()(environ, start_response)
+        try:
+            data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(environ['wsgi.input'].read(length), self.maxBytes + 1)
+        except zlib.error:
+            return BadRequest('Invalid gzip body.')(environ, start_response)
+        if len(data) > self.maxBytes:
+            return RequestEntityTooLarge()(environ, start_response)
+        environ = dict(environ, **{'wsgi.input': io.BytesIO(data), 'CONTENT_LENGTH': str(len(data))})
+        del environ['HTTP_CONTENT_ENCODING']
+        return self.app(environ, start_response)
+
+
+class BuildAgent:
+    """
+    Queue build commands sent over HTTP and run them on a bounded pool of workers.
+    Jobs run in submission order, except that a job waits while another one runs on the same project root, in this
+    agent or in another process of the host. Logs and build cache are per port, so several agents can share a host.
+    Requests return a job id at once, clients poll `/jobs/<id>` or tail `/jobs/<id>/log`, then fetch `/jobs/<id>/result`.
+    """
+    _MAX_FINISHED_JOBS = 100
+    _LOG_CHUNK_SIZE = 64 << 10
+    _LOG_POLL_SECONDS = 0.5
+    # job requests are small JSON bodies
+    _MAX_REQUEST_BYTES = 1 << 20
+    # job lists and metrics grow with the jobs kept, small responses are not worth compressing
+    _MIN_COMPRESSED_RESPONSE_BYTES = 1 << 10
+
+    def __init__(self, port: int, max_workers: int = 1, cache_size_gb: float = 0):
+        self._app = Flask('BuildAgent', static_folder=None)
+        self._app.config['MAX_CONTENT_LENGTH'] = self._MAX_REQUEST_BYTES
+        self._app.wsgi_app = _GzipRequestMiddleware(self._app.wsgi_app, self._MAX_REQUEST_BYTES)
+        self._app.after_request(self._compress_response)
+        self.port = port
+        self.maxWorkers = max(1, max_workers)
+        self.cacheDir = osp.join(osp.expanduser('~'), '.wpe', 'build_agent', str(port), 'cache')
+        self._buildCache = AgentBuildCache(self.cacheDir, int(cache_size_gb * (1 << 30))) if cache_size_gb > 0 else None
+        self.logDir = osp.join(tempfile.gettempdir(), 'wpe_build_agent', str(port), 'logs')
+        self._jobs: dict[str, _AgentJob] = {}
+        self._jobsLock = threading.Lock()
+        # queued jobs and busy roots, guarded by the condition
+        self._pending: list[_AgentJob] = []
+        self._busyRoots: set[str] = set()
+        self._schedule = threading.Condition()
+        self._artifacts = _ArtifactIndex()
+        self._metrics = AgentMetrics()
+        self._workers: list[threading.Thread] = []
+        self._roots: set[str] = set()
+        self._startedAt = time.time()
+        self._draining = False
+        self._server: Optional[_AgentServer] = None
+
+    def start(self, dev_server: bool = False, max_connections: int = 64, drain_timeout: float = 3600):
+        """
+        Serve with a threaded server limited to max_connections, or with the Flask development server.
+        On SIGINT or SIGTERM, stop taking jobs, let accepted jobs finish for up to drain_timeout seconds, cancel the rest,
+        then stop. A second signal cancels the remaining jobs at once.
+        """
+        self._init_app()
+        if dev_server:
+            self._app.run(host='0.0.0.0', port=self.port, threaded=True)
+            return
+        self._server = _AgentServer('0.0.0.0', self.port, self._app, max_connections)
+
+        def _on_signal(_signum, _frame):
+            if self._draining:
+                logging.warning('Cancelling remaining jobs')
+                self._cancel_all()
+                return
+            self._draining = True
+            threading.Thread(target=self._drain_and_stop, args=(drain_timeout,), name='BuildAgentDrain', daemon=True).start()
+
+        signal.signal(signal.SIGINT, _on_signal)
+        signal.signal(signal.SIGTERM, _on_signal)
+        logging.info(f'Serving on port {self.port}, at most {max_connections} connections')
+        self._server.serve_forever()
+        logging.info('Build agent stopped')
+
+    def _drain_and_stop(self, timeout: float):
+        logging.info(f'Shutting down: draining accepted jobs, up to {timeout}s')
+        deadline = time.time() + timeout
+        while (remaining := self._count_unfinished_jobs()) and time.time() < deadline:
+            logging.info(f'Waiting for {remaining} jobs to finish')
+            time.sleep(min(5.0, max(0.0, deadline - time.time())))
+        if self._count_unfinished_jobs():
+            logging.warning('Drain timeout, cancelling remaining jobs')
+            self._cancel_all()
+            while self._count_unfinished_jobs():
+                time.sleep(0.5)
+        self._server.shutdown()
+
+    def _count_unfinished_jobs(self) -> int:
+        with self._jobsLock:
+            return len([job for job in self._jobs.values() if not job.is_finished()])
+
+    def _cancel_all(self):
+        with self._jobsLock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+
+    def _init_app(self):
+        self._app.add_url_rule('/git_sync', 'git_sync', self.git_sync, methods=['POST'])
+        self._app.add_url_rule('/premake', 'premake', self.premake, methods=['POST'])
+        self._app.add_url_rule('/build', 'build', self.build, methods=['POST'])
+        self._app.add_url_rule('/artifacts', 'download_artifacts', self.download_artifacts, methods=['POST'])
+        self._app.add_url_rule('/artifacts/manifest', 'artifact_manifest', self.artifact_manifest, methods=['GET'])
+        self._app.add_url_rule('/status', 'status', self.status, methods=['GET'])
+        self._app.add_url_rule('/health', 'health', self.health, methods=['GET'])
+        self._app.add_url_rule('/metrics', 'metrics', self.metrics, methods=['GET'])
+        self._app.add_url_rule('/jobs', 'list_jobs', self.list_jobs, methods=['GET'])
+        self._app.add_url_rule('/jobs/<job_id>', 'job_status', self.job_status, methods=['GET'])
+        self._app.add_url_rule('/jobs/<job_id>/result', 'job_result', self.job_result, methods=['GET'])
+        self._app.add_url_rule('/jobs/<job_id>/log', 'job_log', self.job_log, methods=['GET'])
+        self._app.add_url_rule('/jobs/<job_id>/cancel', 'cancel_job', self.cancel_job, methods=['POST'])
+        # jobs do not survive a restart, neither do their logs
+        shutil.rmtree(self.logDir, ignore_errors=True)
+        os.makedirs(self.logDir, exist_ok=True)
+        for i in range(self.maxWorkers):
+            self._workers.append(threading.Thread(target=self._worker, name=f'BuildAgentWorker-{i}', daemon=True))
+            self._workers[-1].start()
+        logging.info(f'Build agent started with {self.maxWorkers} workers, build cache: '
+                     f'{self.cacheDir if self._buildCache else "disabled"}')
+
+    def _compress_response(self, response: Response) -> Response:
+        """
+        Gzip buffered JSON and text responses for clients accepting it. Log and artifact streams are left as is.
+        """
+        if (response.is_streamed or response.mimetype not in ('application/json', 'text/plain')
+                or 'Content-Encoding' in response.headers or 'gzip' not in request.headers.get('Accept-Encoding', '')):
+            return response
+        data = response.get_data()
+        if len(data) < self._MIN_COMPRESSED_RESPONSE_BYTES:
+            return response
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def submit(self, job: _AgentJob):
+        if self._draining:
+            return jsonify({'error': 'Build agent is shutting down.'}), 503
+        with self._jobsLock:
+            self._jobs[job.id] = job
+            self._prune_jobs()
+            if job.root:
+                self._roots.add(job.root)
+        with self._schedule:
+            self._pending.append(job)
+            self._schedule.notify_all()
+        logging.info(f'Queued {job.kind} job {job.id}: {job.params}')
+        return jsonify(job.status_json()), 202
+
+    def _worker(self):
+        while True:
+            with self._schedule:
+                while (job := self._next_runnable_job()) is None:
+                    self._schedule.wait()
+                self._busyRoots.add(job.root)
+            try:
+                job.run()
+            except Exception as e:
+                logging.error(f'Job {job.id} crashed: {e}')
+            finally:
+                self._metrics.record_job(job)
+                with self._schedule:
+                    self._busyRoots.discard(job.root)
+                    self._schedule.notify_all()
+
+    def _next_runnable_job(self) -> Optional[_AgentJob]:
+        """
+        Pop the oldest queued job whose root is idle, dropping jobs cancelled while queued. Call with the condition held.
+        """
+        for job in self._pending:
+            if job.is_finished():
+                self._metrics.record_job(job)
+        self._pending = [job for job in self._pending if not job.is_finished()]
+        for i, job in enumerate(self._pending):
+            if job.root not in self._busyRoots:
+                return self._pending.pop(i)
+        return None
+
+    def _queue_position(self, job: _AgentJob) -> Optional[int]:
+        with self._schedule:
+            return next((i for i, queued in enumerate(self._pending) if queued is job), None)
+
+    def _prune_jobs(self):
+        finished = [job for job in self._jobs.values() if job.is_finished()]
+        finished.sort(key=lambda j: j.finishedAt)
+        for job in finished[:max(0, len(finished) - self._MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+            try:
+                os.remove(job.logPath)
+            # not written yet, or still tailed by a client on Windows
+            except OSError:
+                pass
+
+    def _find_job(self, job_id) -> Optional[_AgentJob]:
+        with self._jobsLock:
+            return self._jobs.get(job_id)
+
     def git_sync(self):
         data = request.get_json()
-        root = data.get('root')
-        branch = data.get('branch')
-        fetch_result = self.run_command(f'git -C {root} fetch origin')
-        reset_result = self.run_command(f'git -C {root} reset --hard origin/{branch}')
-        succeeded = fetch_result.succeeded and reset_result.succeeded
-        retcode = 200 if succeeded else 500
-        return jsonify({'succeeded': succeeded,
-                        'git fetch': fetch_result.to_json(),
-                        'git reset': reset_result.to_json()}), retcode
+        if data.get('commit') and not re.fullmatch(r'[0-9a-fA-F]{7,40}', data['commit']):
+            return jsonify({'error': f'Invalid commit: {data["commit"]}'}), 400
+        return self.submit(_GitSyncJob(data, self.logDir))
 
     def premake(self):
         data = request.get_json()
         root = data.get('root')
         platform = data.get('platform')
-        result = self.run_command(f'wpe p -r {root} -plt {platform}')
-        retcode = 200 if result.succeeded else 500
-        return jsonify(result.to_json()), retcode
+        return self.submit(_AgentJob('premake', data, [('premake', ['wpe', 'p', '-r', root, '-plt', platform])], self.logDir))
 
     def build(self):
         data = request.get_json()
         root = data.get('root')
         configuration = data.get('configuration')
         platform = data.get('platform')
-        result = self.run_command(f'wpe b -r {root} -c {configuration} -plt {platform}')
-        retcode = 200 if result.succeeded else 500
-        return jsonify(result.to_json()), retcode
+        steps = [('build', ['wpe', 'b', '-r', root, '-c', configuration, '-plt', platform])]
+        if self._buildCache:
+            return self.submit(_RemoteBuildJob(data, steps, self.logDir, self._buildCache, self._artifacts))
+        return self.submit(_AgentJob('build', data, steps, self.logDir))
+
+    def artifact_manifest(self):
+        plugin_name = request.args.get('plugin', '')
+        if not plugin_name:
+            return jsonify({'error': 'Missing plugin name.'}), 400
+        try:
+            return jsonify({'files': self._artifacts.manifest(plugin_name, request.args.get('platform'),
+                                                              request.args.get('configuration'))}), 200
+        except FileNotFoundError as e:
+            return jsonify({'error': str(e)}), 500
+
+    def download_artifacts(self):
+        """
+        Stream the plugin artifacts as one tar.gz, paths relative to WWISESDK.
+        Body: `plugin`, optionally `platform` and `configuration` to send the artifacts of one build only, and `files`,
+        the artifact paths to send, e.g. those whose hash differs from the manifest.
+        """
+        data = request.get_json()
+        plugin_name = data.get('plugin', '')
+        if not plugin_name:
+            return jsonify({'error': 'Missing plugin name.'}), 400
+        try:
+            artifacts = self._artifacts.find(plugin_name, data.get('platform'), data.get('configuration'))
+        except FileNotFoundError as e:
+            return jsonify({'error': str(e)}), 500
+        if (wanted := data.get('files')) is not None:
+            if unknown := sorted(set(wanted) - set(artifacts)):
+                return jsonify({'error': f'Not artifacts of {plugin_name}: {unknown}'}), 400
+            artifacts = {rel: artifacts[rel] for rel in wanted}
+        logging.info(f'Sending {len(artifacts)} artifacts of {plugin_name}')
+        pipe = _StreamPipe()
+        threading.Thread(target=self._artifacts.write_tar, args=(artifacts, pipe), daemon=True).start()
+        return Response(iter(pipe), mimetype='application/gzip')
+
+    def status(self):
+        """
+        Load of the agent, for clients dispatching jobs over several agents.
+        """
+        with self._schedule:
+            queued = len([job for job in self._pending if not job.is_finished()])
+        with self._jobsLock:
+            running = len([job for job in self._jobs.values() if job.state == _AgentJob.RUNNING])
+        return jsonify({'draining': self._draining,
+                        'workers': self.maxWorkers,
+                        'queued': queued,
+                        'running': running,
+                        'cpuCount': os.cpu_count() or 1,
+                        'loadAverage': os.getloadavg()[0] if hasattr(os, 'getloadavg') else None}), 200
+
+    def health(self):
+        """
+        200 when the agent can take jobs, 503 otherwise, with the result of each check.
+        """
+        checks = {'accepting': not self._draining,
+                  'workers': all(worker.is_alive() for worker in self._workers),
+                  'logDir': os.access(self.logDir, os.W_OK)}
+        try:
+            self._artifacts.sdk_root()
+            checks['wwiseSdk'] = True
+        except FileNotFoundError:
+            checks['wwiseSdk'] = False
+        healthy = all(checks.values())
+        return jsonify({'status': 'ok' if healthy else 'unhealthy',
+                        'checks': checks,
+                        'uptimeSeconds': round(time.time() - self._startedAt)}), 200 if healthy else 503
+
+    def metrics(self):
+        """
+        Prometheus text format.
+        """
+        with self._jobsLock:
+            states = collections.Counter(job.state for job in self._jobs.values())
+            roots = sorted(self._roots)
+        with self._schedule:
+            queued = len([job for job in self._pending if not job.is_finished()])
+        disk_free, disk_total = [], []
+        for kind, path in [('root', root) for root in roots] + [('cache', self.cacheDir), ('logs', self.logDir)]:
+            if not osp.isdir(path):
+                continue
+            usage = shutil.disk_usage(path)
+            disk_free.append(({'kind': kind, 'path': path}, usage.free))
+            disk_total.append(({'kind': kind, 'path': path}, usage.total))
+        gauges = [
+            ('wpe_agent_uptime_seconds', 'Seconds since the agent started.', [({}, round(time.time() - self._startedAt))]),
+            ('wpe_agent_workers', 'Worker threads.', [({}, self.maxWorkers)]),
+            ('wpe_agent_workers_busy', 'Workers running a job.', [({}, states.get(_AgentJob.RUNNING, 0))]),
+            ('wpe_agent_queue_depth', 'Jobs waiting for a worker.', [({}, queued)]),
+            ('wpe_agent_jobs', 'Jobs kept by the agent, by state.',
+             [({'state': state}, states.get(state, 0)) for state in (_AgentJob.QUEUED, _AgentJob.RUNNING) + _AgentJob.FINISHED_STATES]),
+            ('wpe_agent_disk_free_bytes', 'Free space on the file system of project roots, build cache and logs.', disk_free),
+            ('wpe_agent_disk_total_bytes', 'Size of the file system of project roots, build cache and logs.', disk_total),
+        ]
+        if self._buildCache:
+            entries, size = self._buildCache.usage()
+            gauges.append(('wpe_agent_build_cache_entries', 'Builds in the build cache.', [({}, entries)]))
+            gauges.append(('wpe_agent_build_cache_bytes', 'Artifact bytes in the build cache.', [({}, size)]))
+            gauges.append(('wpe_agent_build_cache_limit_bytes', 'Build cache size limit.', [({}, self._buildCache.maxBytes)]))
+        return Response(self._metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+    def list_jobs(self):
+        with self._jobsLock:
+            jobs = [job.status_json() for job in self._jobs.values()]
+        return jsonify({'jobs': jobs}), 200
+
+    def job_status(self, job_id):
+        job = self._find_job(job_id)
+        if job is None:
+            return jsonify({'error': f'No such job: {job_id}'}), 404
+        status = job.status_json()
+        if job.state == _AgentJob.QUEUED:
+            status['queuePosition'] = self._queue_position(job)
+        return jsonify(status), 200
+
+    def job_result(self, job_id):
+        job = self._find_job(job_id)
+        if job is None:
+            return jsonify({'error': f'No such job: {job_id}'}), 404
+        if not job.is_finished():
+            return jsonify(job.status_json()), 202
+        return jsonify(job.result_json()), 200 if job.state == _AgentJob.SUCCEEDED else 500
+
+    def job_log(self, job_id):
+        """
+        Stream the job log as chunked plain text, from byte `offset`, until the job finishes.
+        Memory use is bounded by the chunk size, whatever the log size.
+        """
+        job = self._find_job(job_id)
+        if job is None:
+            return jsonify({'error': f'No such job: {job_id}'}), 404
+        offset = request.args.get('offset', 0, type=int)
+
+        def _tail():
+            while not osp.isfile(job.logPath):
+                if job.is_finished():
+                    return
+                time.sleep(self._LOG_POLL_SECONDS)
+            with open(job.logPath, 'rb') as f:
+                f.seek(offset)
+                while True:
+                    # check before reading, so that output written right before the job finished is not lost
+                    finished = job.is_finished()
+                    chunk = f.read(self._LOG_CHUNK_SIZE)
+                    if chunk:
+                        yield chunk
+                    elif finished:
+                        return
+                    else:
+                        time.sleep(self._LOG_POLL_SECONDS)
+
+        return Response(_tail(), mimetype='text/plain')
+
+    def cancel_job(self, job_id):
+        job = self._find_job(job_id)
+        if job is None:
+            return jsonify({'error': f'No such job: {job_id}'}), 404
+        if not job.cancel():
+            return jsonify(job.status_json()), 409
+        logging.info(f'Cancel requested for job {job_id}')
+        return jsonify(job.status_json()), 200
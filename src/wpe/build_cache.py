@@ -0,0 +1,165 @@
+import glob
+import hashlib
+import logging
+import os
+import os.path as osp
+import platform
+import shutil
+from typing import Optional
+
+import kkpyutil as util
+
+# project
+import wpe.util as wpe_util
+from wpe.pathman import PathMan
+
+# bump when the cache layout or key composition changes
+_CACHE_FORMAT = 2
+
+_INPUT_DIRS = ('SoundEnginePlugin', 'WwisePlugin', 'external')
+
+# sources, resources and generated project files; build intermediates are not part of the key
+_INPUT_EXTENSIONS = {
+    '.h', '.hpp', '.hxx', '.inl', '.c', '.cc', '.cpp', '.cxx', '.m', '.mm',
+    '.def', '.rc', '.xml', '.lua', '.json', '.md', '.html', '.bmp', '.ico', '.png',
+    '.sln', '.vcxproj', '.props', '.targets', '.mk', '.pbxproj', '.plist', '.xcconfig', '.cmake',
+}
+
+_AUTHORING_PACKAGE_PLATFORMS = {
+    'Windows': 'Authoring_Windows',
+    'Darwin': 'Authoring_Mac',
+    'Linux': 'Authoring_Linux',
+}
+
+
+class BuildCache:
+    """
+    Content-addressed cache of build artifacts.
+    A build job is keyed by its (platform, configuration, arch, toolset), the Wwise version and root and the hash of the
+    plugin sources and generated project files. Compiler versions, flags and environment are not part of the key, hence
+    opt-in. Artifacts are located with the package globs of wp.py, relative to WWISEROOT.
+    """
+    _MAX_ENTRIES_PER_JOB = 2
+
+    def __init__(self, path_man: PathMan, wwise_root: str, wwise_version: str):
+        self.pathMan = path_man
+        self.wwiseRoot = wwise_root
+        self.wwiseVersion = wwise_version
+        self.cacheDir = osp.join(path_man.cacheDir, 'build')
+        self._inputDigest: Optional[str] = None
+
+    def input_digest(self) -> str:
+        if self._inputDigest is None:
+            self._inputDigest = self._hash_inputs()
+        return self._inputDigest
+
+    def key(self, job) -> str:
+        hasher = hashlib.sha256()
+        for part in (str(_CACHE_FORMAT), job.name(), self.wwiseVersion, osp.realpath(self.wwiseRoot), self.input_digest()):
+            hasher.update(part.encode('utf-8'))
+            hasher.update(b'\0')
+        return hasher.hexdigest()
+
+    def restore(self, job) -> bool:
+        """
+        Return True on a cache hit, after bringing artifacts under WWISEROOT up to date.
+        """
+        entry_dir = self._entry_dir(job)
+        manifest_path = osp.join(entry_dir, 'manifest.json')
+        if not osp.isfile(manifest_path):
+            return False
+        manifest = util.load_json(manifest_path)
+        if not all(osp.isfile(osp.join(entry_dir, 'files', rel)) for rel in manifest['files']):
+            logging.warning(f'Incomplete build cache entry, ignored: {entry_dir}')
+            return False
+
+        restored = 0
+        for rel, meta in manifest['files'].items():
+            dst = osp.join(self.wwiseRoot, rel)
+            if osp.isfile(dst) and osp.getsize(dst) == meta['size'] and wpe_util.hash_file(dst) == meta['sha256']:
+                continue
+            os.makedirs(osp.dirname(dst), exist_ok=True)
+            shutil.copy2(osp.join(entry_dir, 'files', rel), dst)
+            restored += 1
+        logging.info(f'Build cache hit: {job.name()}, {restored}/{len(manifest["files"])} artifacts restored')
+        return True
+
+    def store(self, job):
+        artifacts = self._find_artifacts(job)
+        if not artifacts:
+            logging.warning(f'No artifacts found for {job.name()}, not cached')
+            return
+        entry_dir = self._entry_dir(job)
+        tmp_dir = f'{entry_dir}.tmp'
+        wpe_util.remove_path(tmp_dir)
+        manifest = {'job': job.name(), 'wwiseVersion': self.wwiseVersion, 'files': {}}
+        for artifact in artifacts:
+            rel = osp.relpath(artifact, self.wwiseRoot)
+            dst = osp.join(tmp_dir, 'files', rel)
+            os.makedirs(osp.dirname(dst), exist_ok=True)
+            shutil.copy2(artifact, dst)
+            manifest['files'][rel] = {'size': osp.getsize(dst), 'sha256': wpe_util.hash_file(dst)}
+        util.save_json(osp.join(tmp_dir, 'manifest.json'), manifest)
+        wpe_util.remove_path(entry_dir)
+        os.rename(tmp_dir, entry_dir)
+        self._prune(osp.dirname(entry_dir))
+        logging.info(f'Build cache stored: {job.name()}, {len(artifacts)} artifacts')
+
+    def _entry_dir(self, job) -> str:
+        return osp.join(self.cacheDir, job.name(), self.key(job))
+
+    def _prune(self, job_dir: str):
+        entries = [osp.join(job_dir, d) for d in os.listdir(job_dir) if not d.endswith('.tmp')]
+        entries.sort(key=osp.getmtime, reverse=True)
+        for stale in entries[self._MAX_ENTRIES_PER_JOB:]:
+            wpe_util.remove_path(stale)
+
+    def _hash_inputs(self) -> str:
+        def _is_input(_path):
+            name = osp.basename(_path)
+            return name == 'Makefile' or osp.splitext(name)[1].lower() in _INPUT_EXTENSIONS
+
+        root = self.pathMan.root
+        files = [self.pathMan.premakePluginLua]
+        files.extend(p for p in glob.glob(osp.join(root, '*')) if osp.isfile(p) and _is_input(p))
+        for input_dir in _INPUT_DIRS:
+            for parent, dirs, filenames in os.walk(osp.join(root, input_dir)):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                files.extend(osp.join(parent, f) for f in filenames if _is_input(f))
+
+        hasher = hashlib.sha256()
+        for path in sorted(set(files)):
+            hasher.update(osp.relpath(path, root).replace('\\', '/').encode('utf-8'))
+            hasher.update(wpe_util.hash_file(path).encode('utf-8'))
+        return hasher.hexdigest()
+
+    def _find_artifacts(self, job) -> list[str]:
+        """
+        Glob the package artifacts of the job platform, then keep those under the job configuration and arch folders.
+        Windows SDK folders are named `<arch>_<toolset>`, only the one of the job toolset is kept there, so that the
+        outputs of other toolsets are left out. Authoring outputs go to a plain `<arch>` folder whatever the toolset.
+        """
+        import wpe.wp_patch.resolver as wp_patch
+        package = wp_patch.patch_module('package')
+        platform_name = _AUTHORING_PACKAGE_PLATFORMS.get(platform.system(), '') if job.platform == 'Authoring' else job.platform
+        platform_info = package.platform_registry.get(platform_name)
+        if platform_info is None:
+            return []
+
+        def _match_job(_rel):
+            parts = _rel.replace('\\', '/').split('/')
+            if job.configuration not in parts:
+                return False
+            if job.toolset and job.platform.startswith('Windows'):
+                return f'{job.arch}_{job.toolset}' in parts
+            return any(p == job.arch or p.startswith(f'{job.arch}_') or p.endswith(f'_{job.arch}') for p in parts)
+
+        artifacts = set()
+        for artifact_glob in platform_info.package.artifacts:
+            for path in glob.glob(osp.join(self.wwiseRoot, artifact_glob.format(plugin_name=self.pathMan.pluginName))):
+                if osp.isdir(path):
+                    files = [osp.join(parent, f) for parent, _, filenames in os.walk(path) for f in filenames]
+                else:
+                    files = [path]
+                artifacts.update(f for f in files if _match_job(osp.relpath(f, self.wwiseRoot)))
+        return sorted(artifacts)
@@ -0,0 +1,228 @@
+import contextlib
+import logging
+import os
+import os.path as osp
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Optional
+
+from wpe.build_cache import BuildCache
+from wpe.project_config import PlatformTarget
+from wpe.wp_wrapper import WpWrapper
+
+
+class BuildJob:
+    """
+    One cell of the (platform x configuration x arch) build matrix.
+    """
+    def __init__(self, platform: str, configuration: str, arch: str, toolset: Optional[str] = None):
+        self.platform = platform
+        self.configuration = configuration
+        self.arch = arch
+        self.toolset = toolset
+
+    @staticmethod
+    def expand(target: PlatformTarget, configurations) -> list['BuildJob']:
+        toolset = target.toolset() if target.need_toolset() else None
+        return [BuildJob(target.platform, config, arch, toolset)
+                for config in configurations
+                for arch in target.architectures]
+
+    def name(self) -> str:
+        parts = [self.platform, self.configuration, self.arch]
+        if self.toolset:
+            parts.append(self.toolset)
+        return '.'.join(parts)
+
+    def build_args(self) -> list[str]:
+        args = [self.platform, '-c', self.configuration, '-x', self.arch]
+        if self.toolset:
+            args.extend(['-t', self.toolset])
+        return args
+
+    def run(self):
+        WpWrapper().build(*self.build_args())
+
+
+class PackageJob:
+    """
+    Package one platform with wp.py package.
+    """
+    def __init__(self, platform: str, package_args: list[str]):
+        self.platform = platform
+        self.packageArgs = package_args
+
+    def name(self) -> str:
+        return self.platform
+
+    def run(self):
+        res = WpWrapper().package(self.platform, *self.packageArgs)
+        if res != 0:
+            raise RuntimeError(f'Package failed. Exit code: {res}')
+
+
+class _JobResult:
+    def __init__(self, job, log_path: Optional[str]):
+        self.job = job
+        self.logPath = log_path
+        self.succeeded = True
+        self.cached = False
+        self.skipped = False
+        self.seconds = 0.0
+        self.error = ''
+
+    @staticmethod
+    def from_cache(job) -> '_JobResult':
+        result = _JobResult(job, None)
+        result.cached = True
+        return result
+
+    @staticmethod
+    def from_skipped(job) -> '_JobResult':
+        result = _JobResult(job, None)
+        result.succeeded = False
+        result.skipped = True
+        return result
+
+    def status(self) -> str:
+        if self.skipped:
+            return 'skipped'
+        if not self.succeeded:
+            return 'FAILED'
+        return 'cached' if self.cached else 'passed'
+
+
+@contextlib.contextmanager
+def _redirect_output(log_path: Optional[str]):
+    """
+    Redirect stdout/stderr at fd level, so that toolchain subprocesses spawned by wp.py are captured as well.
+    """
+    if not log_path:
+        yield
+        return
+    os.makedirs(osp.dirname(log_path), exist_ok=True)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = (os.dup(1), os.dup(2))
+    saved_streams = (sys.stdout, sys.stderr)
+    with open(log_path, 'w', encoding='utf-8', errors='replace') as log:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        sys.stdout = sys.stderr = log
+        try:
+            yield
+        finally:
+            log.flush()
+            sys.stdout, sys.stderr = saved_streams
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            os.close(saved_fds[0])
+            os.close(saved_fds[1])
+
+
+def _run_job(job, log_path: Optional[str]) -> _JobResult:
+    result = _JobResult(job, log_path)
+    start = time.time()
+    try:
+        with _redirect_output(log_path):
+            job.run()
+    # wp.py reports some failures through sys.exit()
+    except (Exception, SystemExit) as e:
+        result.succeeded = False
+        result.error = f'{type(e).__name__}: {e}'
+    result.seconds = time.time() - start
+    return result
+
+
+class BuildScheduler:
+    """
+    Run build or package jobs sequentially, stopping at the first failure, or concurrently in a process pool when
+    max_jobs > 1, where every job runs. In concurrent mode, the output of each job is written to its own log file
+    under log_dir.
+    Jobs hitting the build cache are restored instead of built, successful builds are stored back.
+    """
+    def __init__(self, log_dir: str, max_jobs: int = 1, cache: Optional[BuildCache] = None):
+        self.logDir = log_dir
+        self.maxJobs = max(1, max_jobs)
+        self.cache = cache
+        self.onFinished: Optional[Callable[[_JobResult], None]] = None
+        self.results: list[_JobResult] = []
+
+    def run(self, jobs: list, on_finished: Optional[Callable[[_JobResult], None]] = None) -> list[_JobResult]:
+        """
+        on_finished: called in this process with the result of each job, as soon as it finishes.
+        """
+        self.onFinished = on_finished
+        results = {}
+        pending = []
+        for job in jobs:
+            if self.cache and self.cache.restore(job):
+                results[job] = _JobResult.from_cache(job)
+                self._notify(results[job])
+            else:
+                pending.append(job)
+
+        if self.maxJobs == 1 or len(pending) <= 1:
+            built = self._run_sequentially(pending)
+        else:
+            built = self._run_in_pool(pending)
+        for res in built:
+            results[res.job] = res
+            if self.cache and res.succeeded:
+                self.cache.store(res.job)
+
+        self.results = [results[job] for job in jobs]
+        self._report()
+        if failed := [res.job.name() for res in self.results if res.status() == 'FAILED']:
+            raise RuntimeError(f'Jobs failed: {", ".join(failed)}')
+        return self.results
+
+    def _notify(self, result: _JobResult):
+        if self.onFinished:
+            self.onFinished(result)
+
+    def _run_sequentially(self, jobs: list) -> list[_JobResult]:
+        results = []
+        for i, job in enumerate(jobs):
+            logging.info(f'Run {job.name()}')
+            results.append(_run_job(job, None))
+            self._notify(results[-1])
+            if not results[-1].succeeded:
+                results.extend(_JobResult.from_skipped(skipped) for skipped in jobs[i + 1:])
+                break
+        return results
+
+    def _run_in_pool(self, jobs: list) -> list[_JobResult]:
+        workers = min(self.maxJobs, len(jobs))
+        logging.info(f'Run {len(jobs)} jobs with {workers} workers, logs: {self.logDir}')
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_run_job, job, osp.join(self.logDir, f'{job.name()}.log')): job for job in jobs}
+            for future in as_completed(futures):
+                res = future.result()
+                # the result comes back with a pickled copy of the job
+                res.job = futures[future]
+                results[res.job] = res
+                self._notify(res)
+                logging.info(f'[{len(results)}/{len(jobs)}] {res.job.name()}: {res.status()}')
+        # keep matrix order in the report
+        return [results[job] for job in jobs]
+
+    def _report(self):
+        header = ('Job', 'Result', 'Time', 'Log')
+        rows = [(res.job.name(),
+                 res.status(),
+                 time.strftime('%H:%M:%S', time.gmtime(res.seconds)),
+                 res.logPath or '-') for res in self.results]
+        widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header) - 1)]
+
+        def _format_row(_row):
+            return '  '.join([cell.ljust(width) for cell, width in zip(_row, widths)] + [_row[-1]])
+
+        lines = [_format_row(header), _format_row(['-' * w for w in widths] + ['---'])]
+        lines.extend(_format_row(row) for row in rows)
+        for res in self.results:
+            if res.status() == 'FAILED':
+                lines.append(f'{res.job.name()}: {res.error}')
+        print('\n'.join(lines))
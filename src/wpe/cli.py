@@ -21,6 +21,42 @@ def add_platform_arg(parser):
     )
 
 
+def add_jobs_arg(parser):
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        dest='jobs',
+        default=None,
+        required=False,
+        help='Max number of build jobs (platform x configuration x arch) or package jobs (platform) to run concurrently. '
+             'Each concurrent job writes its own log under `Output/wpe/build_logs` or `Output/wpe/package_logs`. '
+             'Default value is the `build-jobs` / `package-jobs` config setting (1).'
+    )
+
+
+def add_no_cache_arg(parser):
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        dest='noCache',
+        default=False,
+        required=False,
+        help='Always build, ignore the build cache under `Output/wpe/cache`.'
+    )
+
+
+def add_dist_dir_arg(parser):
+    parser.add_argument(
+        '--dist-dir',
+        action='store_true',
+        dest='distDir',
+        default=False,
+        required=False,
+        help='Also keep packages and bundle.json in `dist/<bundle name>`, next to the bundle zip.'
+    )
+
+
 def add_deploy_parser(subparsers):
     subparser = subparsers.add_parser(
         'deploy',
@@ -45,6 +81,16 @@ def add_deploy_parser(subparsers):
         default='',
         help='Destination project root path. current supported: Authoring, Unreal'
     )
+    subparser.add_argument(
+        '-i',
+        '--incremental',
+        action='store_true',
+        dest='incremental',
+        required=False,
+        default=False,
+        help='Only write files whose size or content differ from the deployed ones, and remove files of the previous deploy that are no longer packaged. '
+             'Deployed files are tracked in `.wpe_deploy/<plugin>.json` under the deploy dir.'
+    )
     subparser.set_defaults(func=core.deploy)
 
 
@@ -52,7 +98,8 @@ def add_clean_parser(subparsers):
     subparser = subparsers.add_parser(
         'clean',
         aliases=['c'],
-        description='Clean deployed plugin in game project. !!Simply delete by filename, not recommended for production use!!'
+        description='Clean deployed plugin in game project. Deletes the files recorded by the last `wpe deploy`, '
+                    'falls back to deleting by filename when the plugin was deployed without a manifest.'
     )
     subparser.add_argument(
         '-n',
@@ -90,6 +137,51 @@ def add_build_agent_parser(subparsers):
         default=5000,
         help='Port to run the build agent on.'
     )
+    subparser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        dest='workers',
+        required=False,
+        default=1,
+        help='Maximum number of jobs to run concurrently. Jobs on the same project root always run one at a time.'
+    )
+    subparser.add_argument(
+        '--cache-size',
+        type=float,
+        dest='cacheSize',
+        required=False,
+        default=0,
+        help='Size limit in GB of the build result cache, keyed by commit, platform and configuration. '
+             'Least recently used builds are evicted first. 0 (default) disables the cache: the toolchain is not part '
+             'of the key, clear the cache after upgrading the compiler or Xcode.'
+    )
+    subparser.add_argument(
+        '--max-connections',
+        type=int,
+        dest='maxConnections',
+        required=False,
+        default=64,
+        help='Maximum number of client connections served at once, including live log streams. '
+             'Further clients wait until a connection closes.'
+    )
+    subparser.add_argument(
+        '--drain-timeout',
+        type=float,
+        dest='drainTimeout',
+        required=False,
+        default=3600,
+        help='On SIGINT or SIGTERM, seconds to wait for accepted jobs to finish before cancelling them. '
+             'New jobs are refused meanwhile. A second signal cancels them at once.'
+    )
+    subparser.add_argument(
+        '--dev-server',
+        action='store_true',
+        dest='devServer',
+        required=False,
+        default=False,
+        help='Serve with the Flask development server instead, for debugging the agent.'
+    )
     subparser.set_defaults(func=core.start_build_agent)
 
 
@@ -184,7 +276,7 @@ def add_generate_parameters_parser(subparsers):
         dest='force',
         required=False,
         default=False,
-        help='Force overwrite existing source files.'
+        help='Force overwrite existing source files, and regenerate even if nothing changed since the last run.'
     )
     subparser.add_argument(
         '-g',
@@ -215,6 +307,8 @@ def add_build_parser(subparsers):
         required=False,
         help='Configuration to build (Debug, Release, Profile). Default value is Debug.'
     )
+    add_jobs_arg(subparser)
+    add_no_cache_arg(subparser)
     subparser.set_defaults(func=core.build)
 
 
@@ -233,6 +327,8 @@ def add_pack_parser(subparsers):
         aliases=['P'],
         description='Package plugin.'
     )
+    add_jobs_arg(subparser)
+    add_dist_dir_arg(subparser)
     subparser.set_defaults(func=core.pack)
 
 
@@ -242,6 +338,9 @@ def add_full_pack_parser(subparsers):
         aliases=['FP'],
         description='Build for all platform and pack.'
     )
+    add_jobs_arg(subparser)
+    add_no_cache_arg(subparser)
+    add_dist_dir_arg(subparser)
     subparser.set_defaults(func=core.full_pack)
 
 
@@ -1,4 +1,5 @@
 import logging
+import os
 import os.path as osp
 import glob
 from typing import Optional
@@ -19,7 +20,10 @@ from wpe.jb_run_manager import JbRunManager
 from wpe.deployment import Deployment
 from wpe import constants
 from wpe.build_agent import BuildAgent
-from wpe.global_config import GlobalConfig
+from wpe.global_config import GlobalConfig, ConfigKey
+from wpe.build_scheduler import BuildJob, BuildScheduler, PackageJob
+from wpe.build_cache import BuildCache
+from wpe.archive import BundleWriter
 
 
 class Session:
@@ -93,6 +97,20 @@ def _build_documentation():
         )
 
 
+def _max_build_jobs(args) -> int:
+    return getattr(args, 'jobs', None) or GlobalConfig().get(ConfigKey.BUILD_JOBS)
+
+
+def _max_package_jobs(args) -> int:
+    return getattr(args, 'jobs', None) or GlobalConfig().get(ConfigKey.PACKAGE_JOBS)
+
+
+def _build_cache(session) -> Optional[BuildCache]:
+    if getattr(session.args, 'noCache', False) or not GlobalConfig().get(ConfigKey.BUILD_CACHE):
+        return None
+    return BuildCache(session.pathMan, WpWrapper().wwiseRoot, WpWrapper().wwiseVersion)
+
+
 def wp(args):
     logging.info('Run wp.py')
     WpWrapper().wp(args.wpArgs)
@@ -136,28 +154,30 @@ def premake(args):
 
 @HookProcessor().register('generate_parameters')
 def generate_parameters(args):
-    def clear_existing_doc():
-        util.remove_tree(session.pathMan.docsDir)
-        util.remove_tree(session.pathMan.htmlDocsDir)
-
     session = Session.get(args)
-    clear_existing_doc()
     parameter_manager = ParameterGenerator(session.pathMan,
                                            is_forced=session.args.force,
                                            generate_gui_resource=session.args.gui)
+    if parameter_manager.is_up_to_date():
+        logging.info('Parameters are up to date, nothing to generate. Use -f to force regeneration.')
+        return
     parameter_manager.main()
-    _build_documentation()
+    if parameter_manager.docsChanged:
+        util.remove_tree(session.pathMan.htmlDocsDir)
+        _build_documentation()
+    else:
+        logging.info('Parameter docs unchanged, skip Documentation build.')
+    parameter_manager.save_manifest()
 
 
 @HookProcessor().register('build')
 def build(args):
     session = Session.get(args)
     logging.info('Build plugin')
+    jobs = []
     for plt in _filter_supported_targets(session.targetPlatforms, 'build'):
-        build_args = [plt.platform, '-c', session.args.configuration, '-x'] + plt.architectures
-        if plt.need_toolset():
-            build_args.extend(['-t', plt.toolset()])
-        WpWrapper().build(*build_args)
+        jobs.extend(BuildJob.expand(plt, [session.args.configuration]))
+    BuildScheduler(session.pathMan.buildLogsDir, _max_build_jobs(args), _build_cache(session)).run(jobs)
     _build_documentation()
 
 
@@ -169,35 +189,67 @@ def test(args):
 
 @HookProcessor().register('pack')
 def pack(args):
+    def _list_packages():
+        return sorted(glob.glob(osp.join(session.pathMan.root, f'{session.pathMan.pluginName}*.tar.xz')))
+
     def _collect_packages(_output_dir):
         util.remove_tree(_output_dir)
-        for pkg in glob.iglob(osp.join(session.pathMan.root, f'{session.pathMan.pluginName}*.tar.xz')):
+        for pkg in _list_packages():
             util.move_file(pkg, _output_dir, isdstdir=True)
-        util.move_file(osp.join(session.pathMan.root, 'bundle.json'), _output_dir, isdstdir=True)
+        util.move_file(bundle_json, _output_dir, isdstdir=True)
 
-    def _zip_bundle(_output_dir):
-        util.zip_dir(_output_dir)
+    def _stream_finished_packages(_result):
+        if _result.succeeded:
+            for _pkg in _list_packages():
+                bundle_writer.add(_pkg)
 
     session = Session.get(args)
     logging.info('Package plugin and generate bundle')
     for stale_pkg in glob.iglob(osp.join(session.pathMan.root, f'{session.pathMan.pluginName}*.tar.xz')):
         util.remove_file(stale_pkg)
-    stale_bundle = osp.join(session.pathMan.root, 'bundle.json')
-    if osp.isfile(stale_bundle):
-        util.remove_file(stale_bundle)
+    bundle_json = osp.join(session.pathMan.root, 'bundle.json')
+    if osp.isfile(bundle_json):
+        util.remove_file(bundle_json)
     version_code, build_number = WpWrapper().wwiseVersion.rsplit('.', 1)
     build_number = session.projConfig.version()
 
     plugin_version = f'{version_code}.{build_number}'
     output_dir = osp.join(session.pathMan.distDir, f'{session.pathMan.pluginName}_v{version_code}_Build{build_number}')
-    WpWrapper().package('Common', '-v', plugin_version)
-    WpWrapper().package('Documentation', '-v', plugin_version)
-    for plt in _filter_supported_platforms(session.projConfig.all_platform_names(), 'package'):
-        WpWrapper().package(plt, '-v', plugin_version)
-    WpWrapper().generate_bundle('-v', plugin_version)
-    _collect_packages(output_dir)
-    _zip_bundle(output_dir)
-    logging.info(f'Saved to {output_dir}')
+    platforms = ['Common', 'Documentation'] + _filter_supported_platforms(session.projConfig.all_platform_names(), 'package')
+    max_jobs = min(_max_package_jobs(args), len(platforms))
+    xz_threads = GlobalConfig().get(ConfigKey.XZ_THREADS)
+    if xz_threads == 0 and max_jobs > 1:
+        # share the cores between concurrent packages
+        xz_threads = max(1, (os.cpu_count() or 1) // max_jobs)
+    package_args = ['-v', plugin_version,
+                    '--xz-preset', str(GlobalConfig().get(ConfigKey.XZ_PRESET)),
+                    '--xz-threads', str(xz_threads)]
+    if GlobalConfig().get(ConfigKey.PACKAGE_CACHE):
+        package_args.extend(['--package-cache-dir', session.pathMan.packageCacheDir])
+
+    # packages are streamed into the zip as soon as each platform is packaged
+    bundle_writer = BundleWriter(f'{output_dir}.zip', osp.basename(output_dir))
+    try:
+        BuildScheduler(session.pathMan.packageLogsDir, max_jobs).run([PackageJob(plt, package_args) for plt in platforms],
+                                                                     on_finished=_stream_finished_packages)
+        WpWrapper().generate_bundle('-v', plugin_version)
+        for pkg in _list_packages():
+            bundle_writer.add(pkg)
+        bundle_writer.add(bundle_json)
+    except Exception:
+        bundle_writer.discard()
+        raise
+    bundle_writer.close()
+
+    if getattr(args, 'distDir', False):
+        _collect_packages(output_dir)
+        logging.info(f'Saved to {output_dir} and {bundle_writer.zipPath}')
+        return
+    util.remove_tree(output_dir)
+    for pkg in _list_packages():
+        util.remove_file(pkg)
+    util.remove_file(bundle_json)
+    logging.info(f'Saved to {bundle_writer.zipPath}')
 
 
 @HookProcessor().register('full_pack')
@@ -207,16 +259,11 @@ def full_pack(args):
     args.configuration = 'Release'
     args.platforms = session.projConfig.all_platform_names()
     hook_processor.process_pre_hook('build')
+    jobs = []
     for plt in _filter_supported_targets(session.targetPlatforms, 'build'):
-        build_args = [plt.platform, '-c', 'Release', '-x'] + plt.architectures
-        if plt.need_toolset():
-            build_args.extend(['-t', plt.toolset()])
-        WpWrapper().build(*build_args)
-        if plt.is_authoring():
-            continue
-        for build_config in ('Profile', 'Debug'):
-            build_args[2] = build_config
-            WpWrapper().build(*build_args)
+        configurations = ['Release'] if plt.is_authoring() else ['Release', 'Profile', 'Debug']
+        jobs.extend(BuildJob.expand(plt, configurations))
+    BuildScheduler(session.pathMan.buildLogsDir, _max_build_jobs(args), _build_cache(session)).run(jobs)
     hook_processor.process_post_hook('build')
     pack(args)
 
@@ -261,8 +308,8 @@ def config(args):
 
 
 def start_build_agent(args):
-    build_agent = BuildAgent()
-    build_agent.start(args.port)
+    build_agent = BuildAgent(args.port, args.workers, args.cacheSize)
+    build_agent.start(args.devServer, args.maxConnections, args.drainTimeout)
 
 
 def run_hook(args):
@@ -1,10 +1,18 @@
 import glob
+import hashlib
 import json
 import os
 import os.path as osp
+import re
+import shutil
+import tempfile
 import zipfile
 import tarfile
 import lzma
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import kkpyutil as util
 
 from wpe.pathman import PathMan
 import wpe.util as wpe_util
@@ -35,6 +43,29 @@ class _Package:
                 return group['groupValueId']
 
 
+class _DeployManifest:
+    """
+    Files placed by the last deploy of a plugin, relative to the deploy dir: {path: {size, mtime, sha256}}.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.files: dict[str, dict] = {}
+        if osp.isfile(path):
+            self.files = util.load_json(path).get('files', {})
+
+    def save(self):
+        os.makedirs(osp.dirname(self.path), exist_ok=True)
+        util.save_json(self.path, {'files': dict(sorted(self.files.items()))})
+
+
+class _PackageResult:
+    def __init__(self, lines: Optional[list[str]] = None):
+        self.lines = lines or []
+        self.files: dict[str, dict] = {}
+        self.written = 0
+        self.skipped = 0
+
+
 class Deployment:
     """
     Deploy or delete a plugin to a game project.
@@ -43,6 +74,8 @@ class Deployment:
         self.args = args
         self.projectRoot = args.destProject
         self.pluginDeployDir = ''
+        self.incremental = getattr(args, 'incremental', False)
+        self._manifest: Optional[_DeployManifest] = None
 
     @staticmethod
     def create(args):
@@ -57,30 +90,155 @@ class Deployment:
     def deploy(self):
         archive = self._lazy_find_archive()
         with zipfile.ZipFile(archive, 'r') as zip_ref:
-            try:
-                bundle_file = next(f for f in zip_ref.filelist if f.filename.endswith('bundle.json'))
-            except StopIteration:
+            # index members by basename once, packages are looked up by their source name
+            members = {osp.basename(info.filename): info.filename for info in zip_ref.infolist() if not info.is_dir()}
+            if 'bundle.json' not in members:
                 raise FileNotFoundError('No bundle.json found in archive. Invalid archive?')
-            with zip_ref.open(bundle_file) as f:
-                content = f.read().decode('utf-8')
-                bundle = json.loads(content)
-                print(f'Deploying {bundle["name"]} (id: {bundle["id"]})...')
-                for file in bundle['files']:
-                    pkg = _Package(file)
-                    self._deploy_package(zip_ref, pkg)
-
-    def _deploy_package(self, zip_ref: zipfile.ZipFile, pkg: _Package):
+            with zip_ref.open(members['bundle.json']) as f:
+                bundle = json.loads(f.read().decode('utf-8'))
+        print(f'Deploying {bundle["name"]} (id: {bundle["id"]}){" incrementally" if self.incremental else ""}...')
+        # keyed by plugin name, as `clean` looks it up
+        self._manifest = _DeployManifest(self._manifest_path(self._get_plugin_name_from_archive(archive)))
+        packages = [pkg for pkg in map(_Package, bundle['files']) if self._need_deploy(pkg)]
+        for pkg in packages:
+            if osp.basename(pkg.source_name()) not in members:
+                raise FileNotFoundError(f'Package {pkg.source_name()} listed in bundle.json not found in archive.')
+
+        # xz decoding dominates and releases the GIL, decode packages concurrently, one zip handle per package
+        with ThreadPoolExecutor(max_workers=min(len(packages), os.cpu_count() or 1) or 1) as executor:
+            futures = [executor.submit(self._deploy_package, archive, members[osp.basename(pkg.source_name())], pkg)
+                       for pkg in packages]
+            results = []
+            for future in futures:
+                results.append(future.result())
+                if results[-1].lines:
+                    print('\n'.join(results[-1].lines))
+
+        deployed = {rel: entry for res in results for rel, entry in res.files.items()}
+        removed = 0
+        if self.incremental:
+            # files of the previous deploy that are not part of this one
+            for rel in sorted(set(self._manifest.files) - set(deployed)):
+                path = osp.join(self.pluginDeployDir, rel)
+                if osp.isfile(path):
+                    print(f'Removing {osp.normpath(path)}')
+                    os.remove(path)
+                    removed += 1
+            self._manifest.files = deployed
+        else:
+            self._manifest.files.update(deployed)
+        self._manifest.save()
+        print(f'{sum(res.written for res in results)} written, {sum(res.skipped for res in results)} skipped, '
+              f'{removed} removed.')
+
+    def _manifest_path(self, plugin_name: str) -> str:
+        return osp.join(self.pluginDeployDir, '.wpe_deploy', f'{plugin_name}.json')
+
+    def _deploy_package(self, archive: str, member: str, pkg: _Package) -> _PackageResult:
+        with zipfile.ZipFile(archive, 'r') as zip_ref:
+            with zip_ref.open(member) as f:
+                with lzma.open(f) as xz:
+                    with tarfile.open(fileobj=xz) as tar:
+                        return self._extract_package(tar, pkg)
+
+    def _need_deploy(self, pkg: _Package) -> bool:
+        raise NotImplementedError('subclass it')
+
+    def _extract_package(self, tar: tarfile.TarFile, pkg: _Package) -> _PackageResult:
         raise NotImplementedError('subclass it')
 
+    def _extract_all(self, tar: tarfile.TarFile, members: list[tarfile.TarInfo]) -> _PackageResult:
+        result = _PackageResult()
+        # packages are extracted concurrently: create shared parent folders up front
+        for member in members:
+            parent = member.name if member.isdir() else osp.dirname(member.name)
+            os.makedirs(osp.join(self.pluginDeployDir, parent), exist_ok=True)
+        for member in members:
+            if member.isdir():
+                continue
+            if not member.isreg():
+                tar.extract(member, self.pluginDeployDir)
+                continue
+            dst = osp.normpath(osp.join(self.pluginDeployDir, member.name))
+            entry, written = self._extract_file(tar, member, dst)
+            result.files[member.name] = entry
+            if written:
+                result.written += 1
+                result.lines.append(dst)
+            else:
+                result.skipped += 1
+        return result
+
+    def _extract_file(self, tar: tarfile.TarFile, member: tarfile.TarInfo, dst: str) -> tuple[dict, bool]:
+        """
+        Hash the member while reading it, in incremental mode only write it when the file on disk differs.
+        """
+        hasher = hashlib.sha256()
+        src = tar.extractfile(member)
+        # members are buffered until their hash is known, small ones in memory
+        with tempfile.SpooledTemporaryFile(max_size=64 << 20) if self.incremental else open(dst, 'wb') as buf:
+            while chunk := src.read(1 << 20):
+                hasher.update(chunk)
+                buf.write(chunk)
+            entry = {'size': member.size, 'sha256': hasher.hexdigest()}
+            if self.incremental:
+                if self._is_up_to_date(member.name, dst, entry):
+                    entry['mtime'] = osp.getmtime(dst)
+                    return entry, False
+                buf.seek(0)
+                with open(dst, 'wb') as f:
+                    shutil.copyfileobj(buf, f)
+        os.utime(dst, (member.mtime, member.mtime))
+        try:
+            os.chmod(dst, member.mode)
+        except OSError:
+            pass
+        entry['mtime'] = osp.getmtime(dst)
+        return entry, True
+
+    def _is_up_to_date(self, rel: str, dst: str, entry: dict) -> bool:
+        if not osp.isfile(dst) or osp.getsize(dst) != entry['size']:
+            return False
+        # trust the recorded hash while the file is untouched since the last deploy
+        known = self._manifest.files.get(rel)
+        if known and known['size'] == entry['size'] and known.get('mtime') == osp.getmtime(dst):
+            return known['sha256'] == entry['sha256']
+        return wpe_util.hash_file(dst) == entry['sha256']
+
     def clean(self):
         name = self.args.name or PathMan().pluginName
         print(f"Cleaning {name}...")
+        manifest_path = self._manifest_path(name)
+        if osp.isfile(manifest_path):
+            self._clean_from_manifest(name, _DeployManifest(manifest_path))
+            return
+        print(f'No deploy manifest found for {name}, fall back to searching by filename.')
         paths = glob.glob(rf'{self.pluginDeployDir}\**\*{name}*',
                        recursive=True)
         for p in paths:
             print(f'Removing {p}')
             wpe_util.remove_path(p)
 
+    def _clean_from_manifest(self, name: str, manifest: _DeployManifest):
+        """
+        Delete exactly the files placed by the last deploy, then the folders left empty that are named after the plugin.
+        """
+        parents = set()
+        for rel in sorted(manifest.files):
+            path = osp.normpath(osp.join(self.pluginDeployDir, rel))
+            if osp.isfile(path) or osp.islink(path):
+                print(f'Removing {path}')
+                os.remove(path)
+            parents.add(osp.dirname(path))
+        deploy_dir = osp.normpath(self.pluginDeployDir)
+        # deepest first, so that nested plugin folders are emptied before their parents
+        for parent in sorted(parents, key=len, reverse=True):
+            while parent != deploy_dir and name in osp.basename(parent) and osp.isdir(parent) and not os.listdir(parent):
+                print(f'Removing {parent}')
+                os.rmdir(parent)
+                parent = osp.dirname(parent)
+        os.remove(manifest.path)
+
     def _lazy_find_archive(self):
         if osp.isfile(self.args.archive):
             return self.args.archive
@@ -94,7 +252,10 @@ class Deployment:
 
     @staticmethod
     def _get_plugin_name_from_archive(archive):
-        return osp.basename(archive).split('_')[0]
+        # `<plugin name>_v<wwise version>_Build<build>.zip`, as written by `wpe pack`
+        if match := re.match(r'(.+)_v[\d.]+_Build', osp.basename(archive)):
+            return match.group(1)
+        return osp.splitext(osp.basename(archive))[0].split('_')[0]
 
 
 class UEDeployment(Deployment):
@@ -102,29 +263,22 @@ class UEDeployment(Deployment):
         super().__init__(args)
         self.pluginDeployDir = osp.join(self.projectRoot, 'Plugins', 'Wwise', 'ThirdParty')
 
-    def _deploy_package(self, zip_ref: zipfile.ZipFile, pkg: _Package):
-        if not pkg.is_sdk_package():
-            return
+    def _need_deploy(self, pkg: _Package) -> bool:
+        return pkg.is_sdk_package()
 
-        zip_info = next(f for f in zip_ref.filelist if f.filename.endswith(pkg.source_name()))
-        with zip_ref.open(zip_info) as f:
-            with lzma.open(f) as xz:
-                with tarfile.open(fileobj=xz) as tar:
-                    is_android = pkg.deployment_platforms() == 'Android'
-                    for member in tar.getmembers():
-                        new_name = member.name.removeprefix('SDK/')
-                        if is_android:
-                            for arch in ('arm64-v8a', 'armeabi-v7a', 'x86', 'x86_64'):
-                                new_name = new_name.replace(f'Android_{arch}', f'Android/{arch}')
-                        member.name = new_name
-                    members = tar.getmembers()
-                    parents = {m.name.split('/')[0] for m in members if m.name}
-                    if any(osp.isdir(osp.join(self.pluginDeployDir, p)) for p in parents):
-                        tar.extractall(self.pluginDeployDir)
-                        print('\n'.join([extracted for member in members if osp.isfile(
-                            extracted := osp.normpath(osp.join(self.pluginDeployDir, member.name)))]))
-                    else:
-                        print(f'Parent directory does not exist, skip: {", ".join(sorted(parents))}')
+    def _extract_package(self, tar: tarfile.TarFile, pkg: _Package) -> _PackageResult:
+        is_android = pkg.deployment_platforms() == 'Android'
+        for member in tar.getmembers():
+            new_name = member.name.removeprefix('SDK/')
+            if is_android:
+                for arch in ('arm64-v8a', 'armeabi-v7a', 'x86', 'x86_64'):
+                    new_name = new_name.replace(f'Android_{arch}', f'Android/{arch}')
+            member.name = new_name
+        members = tar.getmembers()
+        parents = {m.name.split('/')[0] for m in members if m.name}
+        if any(osp.isdir(osp.join(self.pluginDeployDir, p)) for p in parents):
+            return self._extract_all(tar, members)
+        return _PackageResult([f'Parent directory does not exist, skip: {", ".join(sorted(parents))}'])
 
 
 class AuthoringDeployment(Deployment):
@@ -132,14 +286,8 @@ class AuthoringDeployment(Deployment):
         super().__init__(args)
         self.pluginDeployDir = self.projectRoot
 
-    def _deploy_package(self, zip_ref: zipfile.ZipFile, pkg: _Package):
-        if not pkg.is_authoring_package():
-            return
+    def _need_deploy(self, pkg: _Package) -> bool:
+        return pkg.is_authoring_package()
 
-        zip_info = next(f for f in zip_ref.filelist if f.filename.endswith(pkg.source_name()))
-        with zip_ref.open(zip_info) as f:
-            with lzma.open(f) as xz:
-                with tarfile.open(fileobj=xz) as tar:
-                    tar.extractall(self.pluginDeployDir)
-                    print('\n'.join([extracted for member in tar.getmembers() if osp.isfile(
-                        extracted := osp.normpath(osp.join(self.pluginDeployDir, member.name)))]))
+    def _extract_package(self, tar: tarfile.TarFile, pkg: _Package) -> _PackageResult:
+        return self._extract_all(tar, tar.getmembers())
@@ -8,12 +8,29 @@ import wpe.util as wpe_util
 
 class ConfigKey:
     USE_WSL_FOR_LINUX = 'use-wsl-for-linux'
+    BUILD_JOBS = 'build-jobs'
+    BUILD_CACHE = 'build-cache'
+    XZ_PRESET = 'xz-preset'
+    XZ_THREADS = 'xz-threads'
+    PACKAGE_JOBS = 'package-jobs'
+    PACKAGE_CACHE = 'package-cache'
+    BUILD_AGENTS = 'build-agents'
 
 
 @util.SingletonDecorator
 class GlobalConfig:
     _DEFAULT_CONFIG = {
         ConfigKey.USE_WSL_FOR_LINUX: False,
+        ConfigKey.BUILD_JOBS: 1,
+        # opt-in: compiler versions and flags are not part of the cache key
+        ConfigKey.BUILD_CACHE: False,
+        ConfigKey.XZ_PRESET: 6,
+        # 1: single-stream like wp.py, 0: use all cores, multi-stream output
+        ConfigKey.XZ_THREADS: 1,
+        ConfigKey.PACKAGE_JOBS: 1,
+        ConfigKey.PACKAGE_CACHE: True,
+        # comma-separated `host:port` list of build agents for remote builds
+        ConfigKey.BUILD_AGENTS: '',
     }
 
     def __init__(self):
@@ -0,0 +1,65 @@
+import hashlib
+import logging
+import os
+import os.path as osp
+import shutil
+
+# project
+import wpe.util as wpe_util
+
+# bump when the archive layout or fingerprint composition changes
+_CACHE_FORMAT = 3
+
+
+class PackageCache:
+    """
+    Cache of compressed packages, keyed by the package label (archive name without version) and a fingerprint of the
+    archive format, the compression settings and the artifact set: archive paths, sizes and content hashes.
+    Archives do not embed the version, so a cached payload can be reused as is under a new version.
+    """
+    _MAX_ENTRIES_PER_LABEL = 2
+
+    def __init__(self, cache_dir: str):
+        self.cacheDir = cache_dir
+
+    @staticmethod
+    def fingerprint(entries, settings: str) -> str:
+        """
+        entries: `wpe.archive.ArchiveEntry` list of the package
+        settings: archive format and compression settings, see `wpe.archive.PackageWriter.settings()`
+        """
+        hasher = hashlib.sha256()
+        hasher.update(f'{_CACHE_FORMAT}\0{settings}'.encode('utf-8'))
+        for entry in sorted((e for e in entries if e.tarinfo.isreg()), key=lambda e: e.arcname):
+            hasher.update(f'\0{entry.arcname}\0{entry.tarinfo.size}\0'.encode('utf-8'))
+            hasher.update(entry.digest().encode('utf-8'))
+        return hasher.hexdigest()
+
+    def restore(self, label: str, fingerprint: str, output_path: str) -> bool:
+        cached = self._entry_path(label, fingerprint)
+        if not osp.isfile(cached):
+            return False
+        tmp = f'{output_path}.part'
+        shutil.copyfile(cached, tmp)
+        os.replace(tmp, output_path)
+        # refresh the entry so that pruning keeps it
+        os.utime(cached)
+        logging.info(f'Package cache hit: {label}')
+        return True
+
+    def store(self, label: str, fingerprint: str, archive_path: str):
+        cached = self._entry_path(label, fingerprint)
+        os.makedirs(osp.dirname(cached), exist_ok=True)
+        tmp = f'{cached}.tmp'
+        shutil.copyfile(archive_path, tmp)
+        os.replace(tmp, cached)
+        self._prune(osp.dirname(cached))
+
+    def _entry_path(self, label: str, fingerprint: str) -> str:
+        return osp.join(self.cacheDir, label, f'{fingerprint}.tar.xz')
+
+    def _prune(self, label_dir: str):
+        entries = [osp.join(label_dir, f) for f in os.listdir(label_dir) if f.endswith('.tar.xz')]
+        entries.sort(key=osp.getmtime, reverse=True)
+        for stale in entries[self._MAX_ENTRIES_PER_LABEL:]:
+            wpe_util.remove_path(stale)
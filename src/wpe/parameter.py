@@ -1,14 +1,19 @@
 import copy
+import functools
+import glob
+import hashlib
+import logging
+import os
 import os.path as osp
-from typing import Any, Optional
+from typing import Any, Callable, Optional, TypeVar
 from dataclasses import dataclass, field
 import xml.etree.ElementTree as ET
-from collections import OrderedDict
 
 import kkpyutil as util
 
 # project
 import wpe.util as wpe_util
+import wpe.project_config as project_config
 from wpe.project_config import ProjectConfig, PluginInfo
 
 _type_prefix_map = {
@@ -34,15 +39,70 @@ _xml_type_name_map = {
 
 _supported_rtpc_types = {'Additive', 'Multiplicative', 'Exclusive', 'Boolean'}
 
+# size of the generated member types, also their alignment, on every platform Wwise supports
+_type_size_map = {
+    'float': 4,
+    'int': 4,
+    'uint': 4,
+    'bool': 1,
+}
+
+# instances of templates and inner types repeat the same names and type names
+_convert_compound_cases = functools.cache(util.convert_compound_cases)
+
+T = TypeVar('T')
+
+# bump when the generation manifest layout or fingerprint composition changes
+_MANIFEST_FORMAT = 1
+
+
+class StructLayout:
+    """
+    Size, alignment and padding of a generated struct, from the size and alignment of its members in declaration order.
+    """
+    def __init__(self, name: str, members: list[tuple[int, int]]):
+        self.name = name
+        self.members = members
+        self.alignment = max((alignment for _, alignment in members), default=1)
+        offset = 0
+        for size, alignment in members:
+            offset = _align_up(offset, alignment) + size
+        # an empty struct still takes one byte
+        self.size = max(1, _align_up(offset, self.alignment))
+        self.padding = self.size - sum(size for size, _ in members) if members else 0
+
+    @staticmethod
+    def order_members(members: list[T], size_alignment: Callable[[T], tuple[int, int]]) -> list[T]:
+        """
+        Order members by decreasing alignment then size, which leaves no padding between them. Members of the same size
+        keep their definition order.
+        """
+        def _key(_member):
+            size, alignment = size_alignment(_member)
+            return -alignment, -size
+
+        return sorted(members, key=_key)
+
+    def optimized(self) -> 'StructLayout':
+        return StructLayout(self.name, StructLayout.order_members(self.members, lambda _member: _member))
+
+    def generate_static_assert(self) -> str:
+        return f'static_assert(sizeof({self.name}) == {self.size}, "Unexpected {self.name} layout, regenerate parameters");'
+
+
+def _align_up(offset: int, alignment: int) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
 
 @dataclass
 class InnerType:
     name: str
     fields: list['Parameter']
+    optimizeLayout: bool = False
 
     def __post_init__(self):
-        self.structName = util.convert_compound_cases(self.name)
-        self.instance_name = util.convert_compound_cases(self.name, 'camel')
+        self.structName = _convert_compound_cases(self.name)
+        self.instance_name = _convert_compound_cases(self.name, 'camel')
 
     @staticmethod
     def create(name, dict_define: dict[str, Any]):
@@ -52,6 +112,12 @@ class InnerType:
         )
         return instance
 
+    def ordered_fields(self) -> list['Parameter']:
+        return StructLayout.order_members(self.fields, Parameter.size_and_alignment) if self.optimizeLayout else self.fields
+
+    def layout(self) -> StructLayout:
+        return StructLayout(self.structName, [type_field.size_and_alignment() for type_field in self.ordered_fields()])
+
     def generate_struct_defines(self):
         return f'''struct {self.structName}
 {{
@@ -60,14 +126,18 @@ class InnerType:
 
     def __generate_field_lines(self):
         lines = []
-        for type_field in self.fields:
+        for type_field in self.ordered_fields():
             type_field.generate_names()
             lines.append(type_field.generate_declaration())
         return '\n    '.join(lines)
 
 
-@dataclass
+@dataclass(slots=True)
 class Parameter:
+    """
+    Instances of a template or inner type share the definition lists (description, enumeration) with it, and own only
+    their dependency records, which are renamed and linked per instance. Treat the shared lists as read-only.
+    """
     name: str
     type_: str
     rtpc_type: str
@@ -84,6 +154,14 @@ class Parameter:
     parent: Optional[InnerType] = None
     basename: str = ''
     suffix: str = ''
+    # set by generate_names
+    propertyName: str = field(default='', init=False, repr=False)
+    cppVariableName: str = field(default='', init=False, repr=False)
+    paramIDName: str = field(default='', init=False, repr=False)
+    typeName: str = field(default='', init=False, repr=False)
+    xmlTypeName: str = field(default='', init=False, repr=False)
+    struct: str = field(default='', init=False, repr=False)
+    nameSpace: str = field(default='', init=False, repr=False)
 
     def __post_init__(self):
         if self.type_ not in _wwise_type_name_map:
@@ -97,18 +175,28 @@ class Parameter:
             self.defaultValue = str(self.defaultValue).lower()
             self.minValue = 'false'
             self.maxValue = 'true'
-        self.propertyName = util.convert_compound_cases(self.name)
-        self.cppVariableName = _type_prefix_map[self.type_] + util.convert_compound_cases(self.basename or self.propertyName)
+        self.propertyName = _convert_compound_cases(self.name)
+        self.cppVariableName = _type_prefix_map[self.type_] + _convert_compound_cases(self.basename or self.propertyName)
         self.paramIDName = f'PARAM_{self.name.upper()}_ID'
         self.typeName = _wwise_type_name_map[self.type_]
         self.xmlTypeName = _xml_type_name_map[self.type_]
         self.struct = 'InnerType' if self.parent else ('RTPC' if self.rtpc_type else 'NonRTPC')
-        self.displayName = self.displayName or util.convert_compound_cases(self.name, style='title')
+        self.displayName = self.displayName or _convert_compound_cases(self.name, style='title')
         self.nameSpace = f'{self.struct}.{self.parent.instance_name}{self.suffix}' if self.parent else self.struct
 
     def assign_id(self, _id: int):
         self.id = _id
 
+    def copy_with(self, **changes) -> 'Parameter':
+        """
+        Shallow copy with its own dependency records.
+        """
+        instance = copy.copy(self)
+        instance.dependencies = [dict(dep) for dep in self.dependencies]
+        for name, value in changes.items():
+            setattr(instance, name, value)
+        return instance
+
     @staticmethod
     def create(name, dict_define: dict[str, Any]):
         return Parameter(
@@ -120,7 +208,7 @@ class Parameter:
             maxValue=dict_define.get('max_value', None),
             data_meaning=dict_define.get('data_meaning', ''),
             description=dict_define.get('description', []),
-            dependencies=copy.deepcopy(dict_define.get('dependencies', [])),
+            dependencies=[dict(dep) for dep in dict_define.get('dependencies', [])],
             displayName=dict_define.get('display_name', ''),
             enumeration=dict_define.get('enumeration', []),
             userInterface=dict_define.get('user_interface', '')
@@ -132,6 +220,15 @@ class Parameter:
     def generate_param_id(self) -> str:
         return f'static constexpr AkPluginParamID {self.paramIDName} = {self.id};'
 
+    def size_and_alignment(self) -> tuple[int, int]:
+        """
+        Of the member declared by `generate_declaration`.
+        """
+        if self.parent:
+            layout = self.parent.layout()
+            return layout.size, layout.alignment
+        return _type_size_map[self.type_], _type_size_map[self.type_]
+
     def generate_declaration(self) -> str:
         if self.parent:
             return f'{self.parent.structName} {self.parent.instance_name}{self.suffix};'
@@ -174,8 +271,8 @@ class Parameter:
         return f'const char* const sz{self.propertyName} = "{self.propertyName}";'
 
     def generate_write_bank_data(self) -> str:
-        writer = 'Write' + util.convert_compound_cases(self.typeName.lstrip('Ak'))
-        getter = 'Get' + util.convert_compound_cases(self.typeName.lstrip('Ak'))
+        writer = 'Write' + _convert_compound_cases(self.typeName.lstrip('Ak'))
+        getter = 'Get' + _convert_compound_cases(self.typeName.lstrip('Ak'))
         return f'in_dataWriter.{writer}(m_propertySet.{getter}(in_guidPlatform, sz{self.propertyName}));'
 
     def generate_xml_property(self) -> list[str]:
@@ -263,15 +360,19 @@ class Parameter:
 
         raise NotImplementedError(f'Parameter type "{self.type_}" not supported.')
 
-    def dump_parameter_doc(self, docs_dir: str):
+    def generate_docs(self, docs_dir: str) -> dict[str, str]:
+        """
+        Return {doc path: markdown} for each language of the description.
+        """
+        docs = {}
         for lang in self.description:
             output_path = osp.join(docs_dir, f'{lang["language"]}', f'{self.propertyName}.md')
-            doc_str = f'''##{self.displayName}
+            docs[output_path] = f'''##{self.displayName}
 
 {lang['text']}
 
 Range: {self.minValue} - {self.maxValue} <br/>'''
-            util.save_text(output_path, doc_str)
+        return docs
 
     def generate_win32_controls(self) -> list[str]:
         row_height = 18
@@ -304,8 +405,18 @@ class ParameterGenerator:
         self.pluginInfo: Optional[PluginInfo] = None
         self.libSuffix = ''
         self.isMetadataPlugin = False
+        # {generated file: written}, unchanged files are not rewritten
+        self.outputs: dict[str, bool] = {}
+        # {struct: {declaration line: (size, alignment)}}
+        self.declarations: dict[str, dict[str, tuple[int, int]]] = {}
+        self.optimizeLayout = False
+        self.docsChanged = False
 
     def main(self):
+        # unknown state of the previous outputs if interrupted
+        had_manifest = osp.isfile(self._manifest_path())
+        wpe_util.remove_path(self._manifest_path())
+        self.docsChanged = self.isForced or not had_manifest
         self.load_parameter_config()
         self._generate()
 
@@ -323,6 +434,9 @@ class ParameterGenerator:
         for instance in proj_config.parameter_from_templates():
             self.__load_with_template(instance, proj_config.parameter_templates())
         self.innerTypes = {name: InnerType.create(name, dict_define) for name, dict_define in proj_config.parameter_inner_types().items()}
+        self.optimizeLayout = proj_config.parameter_optimize_layout()
+        for inner_type in self.innerTypes.values():
+            inner_type.optimizeLayout = self.optimizeLayout
         for instance in proj_config.parameter_from_inner_types():
             self.__load_with_inner_type(instance)
 
@@ -337,80 +451,105 @@ class ParameterGenerator:
 
     def _get_lib_suffix(self):
         if not self.libSuffix:
-            plugin_table = wpe_util.parse_premake_lua_table(self.pathMan.premakePluginLua)
-            self.libSuffix = plugin_table['sdk']['static']['libsuffix']
+            self.libSuffix = self.pathMan.premake_metadata().libSuffix
             self.isMetadataPlugin = self.libSuffix == 'Meta'
 
     def _generate(self):
         def _generate_params_h():
             target = 'SoundEnginePlugin/ProjectNameMeta.h' if self.isMetadataPlugin else 'SoundEnginePlugin/ProjectNameParams.h'
-            if dst := wpe_util.copy_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix, add_suffix_after_project_name=not self.isMetadataPlugin):
-                util.substitute_lines_in_file(self.__generate_ids(), dst, '// [ParameterID]', '// [/ParameterID]')
-                util.substitute_lines_in_file(self.__generate_inner_types(), dst, '// [InnerTypes]', '// [/InnerTypes]')
-                util.substitute_lines_in_file(self.__generate_declarations(struct='InnerType'), dst, '// [InnerTypeDeclaration]',
-                                              '// [/InnerTypeDeclaration]')
-                util.substitute_lines_in_file(self.__generate_declarations(struct='RTPC'), dst, '// [RTPCDeclaration]',
-                                              '// [/RTPCDeclaration]')
-                util.substitute_lines_in_file(self.__generate_declarations(struct='NonRTPC'), dst, '// [NonRTPCDeclaration]',
-                                              '// [/NonRTPCDeclaration]')
+            dst, lines = wpe_util.load_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix, add_suffix_after_project_name=not self.isMetadataPlugin)
+            if dst:
+                regions = wpe_util.RegionSubstituter()
+                regions.add(self.__generate_ids(), '// [ParameterID]', '// [/ParameterID]')
+                regions.add(self.__generate_inner_types(), '// [InnerTypes]', '// [/InnerTypes]')
+                regions.add(self.__generate_declarations(struct='InnerType'), '// [InnerTypeDeclaration]', '// [/InnerTypeDeclaration]')
+                regions.add(self.__generate_declarations(struct='RTPC'), '// [RTPCDeclaration]', '// [/RTPCDeclaration]')
+                regions.add(self.__generate_declarations(struct='NonRTPC'), '// [NonRTPCDeclaration]', '// [/NonRTPCDeclaration]')
+                regions.add(self.__generate_layout_assertions(), '// [LayoutAssertions]', '// [/LayoutAssertions]')
+                if self.optimizeLayout and not any(line.strip().startswith('// [LayoutAssertions]') for line in lines):
+                    logging.warning(f'No "// [LayoutAssertions]" region in {osp.basename(dst)}, struct size checks are not generated. '
+                                    f'Add the region after the NonRTPC struct, or regenerate with -f.')
+                self._save(dst, regions.substitute(lines, dst))
 
         def _generate_params_cpp():
             target = 'SoundEnginePlugin/ProjectNameMeta.cpp' if self.isMetadataPlugin else 'SoundEnginePlugin/ProjectNameParams.cpp'
-            if dst := wpe_util.copy_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix, add_suffix_after_project_name=not self.isMetadataPlugin):
-                util.substitute_lines_in_file(self.__generate_init(), dst, '// [ParameterInitialization]',
-                                              '// [/ParameterInitialization]')
-                util.substitute_lines_in_file(self.__generate_read_bank_data(), dst, '// [ReadBankData]',
-                                              '// [/ReadBankData]')
-                util.substitute_lines_in_file(self.__generate_set_parameters(), dst, '// [SetParameters]',
-                                              '// [/SetParameters]', withindent=False)
-                util.substitute_lines_in_file(self.__generate_validate_parameters(), dst, '// [ValidateParameters]',
-                                              '// [/ValidateParameters]', withindent=False)
-                util.substitute_lines_in_file(self.__generate_format_parameters(), dst, '// [FormatParameters]',
-                                              '// [/FormatParameters]', withindent=False)
+            dst, lines = wpe_util.load_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix, add_suffix_after_project_name=not self.isMetadataPlugin)
+            if dst:
+                regions = wpe_util.RegionSubstituter()
+                regions.add(self.__generate_init(), '// [ParameterInitialization]', '// [/ParameterInitialization]')
+                regions.add(self.__generate_read_bank_data(), '// [ReadBankData]', '// [/ReadBankData]')
+                regions.add(self.__generate_set_parameters(), '// [SetParameters]', '// [/SetParameters]', withindent=False)
+                regions.add(self.__generate_validate_parameters(), '// [ValidateParameters]', '// [/ValidateParameters]', withindent=False)
+                regions.add(self.__generate_format_parameters(), '// [FormatParameters]', '// [/FormatParameters]', withindent=False)
+                self._save(dst, regions.substitute(lines, dst))
 
         def _generate_wwise_plugin_h():
             target = 'WwisePlugin/ProjectNamePlugin.h'
-            if dst := wpe_util.copy_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix):
-                util.substitute_lines_in_file(self.__generate_property_name_declaration(), dst, '// [PropertyNames]',
-                                              '// [/PropertyNames]')
+            dst, lines = wpe_util.load_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix)
+            if dst:
+                regions = wpe_util.RegionSubstituter()
+                regions.add(self.__generate_property_name_declaration(), '// [PropertyNames]', '// [/PropertyNames]')
+                self._save(dst, regions.substitute(lines, dst))
 
         def _generate_wwise_plugin_cpp():
             target = 'WwisePlugin/ProjectNamePlugin.cpp'
-            if dst := wpe_util.copy_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix):
-                util.substitute_lines_in_file(self.__generate_property_name_definition(), dst, '// [PropertyNames]',
-                                              '// [/PropertyNames]')
-                util.substitute_lines_in_file(self.__generate_write_bank_data(), dst, '// [WriteBankData]',
-                                              '// [/WriteBankData]')
+            dst, lines = wpe_util.load_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix)
+            if dst:
+                regions = wpe_util.RegionSubstituter()
+                regions.add(self.__generate_property_name_definition(), '// [PropertyNames]', '// [/PropertyNames]')
+                regions.add(self.__generate_write_bank_data(), '// [WriteBankData]', '// [/WriteBankData]')
+                self._save(dst, regions.substitute(lines, dst))
 
         def _generate_wwise_xml():
             if dst := osp.join(self.pathMan.root, f'WwisePlugin/{self.pathMan.pluginName}.xml'):
-                util.substitute_lines_in_file(self.__generate_xml_properties(), dst, '<Properties>',
-                                              '</Properties>')
-                util.substitute_lines_in_file(self.__generate_xml_plugin_info(), dst, '<PluginInfo',
-                                              '</PluginInfo>', removecues=True)
+                regions = wpe_util.RegionSubstituter()
+                regions.add(self.__generate_xml_properties(), '<Properties>', '</Properties>')
+                regions.add(self.__generate_xml_plugin_info(), '<PluginInfo', '</PluginInfo>', removecues=True)
+                self._save(dst, regions.substitute(util.load_lines(dst), dst))
 
         def _generate_doc():
+            docs = {}
             for param in self.parameters.values():
-                param.dump_parameter_doc(self.pathMan.docsDir)
+                docs.update({osp.normpath(path): text for path, text in param.generate_docs(self.pathMan.docsDir).items()})
+            for path, text in docs.items():
+                self._save(path, [text])
+                self.docsChanged |= self.outputs[path]
+            # docs of removed parameters
+            for path in glob.glob(osp.join(self.pathMan.docsDir, '**', '*'), recursive=True):
+                if osp.isfile(path) and osp.normpath(path) not in docs:
+                    wpe_util.remove_path(path)
+                    self.docsChanged = True
 
         def _generate_win32_gui_resource():
             target = 'WwisePlugin/Win32/ProjectNamePluginGUI.h'
-            wpe_util.copy_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix)
+            dst, lines = wpe_util.load_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix)
+            if dst:
+                self._save(dst, lines)
             target = 'WwisePlugin/Win32/ProjectNamePluginGUI.cpp'
-            dst = wpe_util.copy_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix)
+            dst, lines = wpe_util.load_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix)
             if not self.generateGuiResource:
+                if dst:
+                    self._save(dst, lines)
                 return
 
             if dst:
-                util.substitute_lines_in_file(self.__generate_win32_property_table(), dst, '// [PropertyTable]', '// [/PropertyTable]')
+                regions = wpe_util.RegionSubstituter()
+                regions.add(self.__generate_win32_property_table(), '// [PropertyTable]', '// [/PropertyTable]')
+                self._save(dst, regions.substitute(lines, dst))
 
             target = 'WwisePlugin/ProjectName.rc'
-            if dst := wpe_util.copy_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix, lazy_create=True):
-                util.substitute_lines_in_file(self.__generate_win32_controls(), dst, '// [Controls]', '// [/Controls]')
+            dst, lines = wpe_util.load_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix, lazy_create=True)
+            if dst:
+                regions = wpe_util.RegionSubstituter()
+                regions.add(self.__generate_win32_controls(), '// [Controls]', '// [/Controls]')
+                self._save(dst, regions.substitute(lines, dst))
 
             target = 'WwisePlugin/resource.h'
-            if dst := wpe_util.copy_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix, lazy_create=True):
-                util.substitute_lines_in_file(self.__generate_win32_idc(), dst, '// [IDC]', '// [/IDC]')
+            dst, lines = wpe_util.load_template(target, self.pathMan, self.isForced, lib_suffix=self.libSuffix, lazy_create=True)
+            if dst:
+                regions = wpe_util.RegionSubstituter()
+                regions.add(self.__generate_win32_idc(), '// [IDC]', '// [/IDC]')
+                self._save(dst, regions.substitute(lines, dst))
 
         _generate_params_h()
         _generate_params_cpp()
@@ -419,6 +558,56 @@ class ParameterGenerator:
         _generate_wwise_xml()
         _generate_doc()
         _generate_win32_gui_resource()
+        self.__report_layouts()
+        written = [osp.relpath(path, self.pathMan.root) for path, is_written in self.outputs.items() if is_written]
+        logging.info(f'Generated {len(self.outputs)} files, {len(written)} changed: {", ".join(written) or "none"}')
+
+    def _save(self, path: str, lines: list[str]):
+        self.outputs[path] = wpe_util.save_text_if_changed(path, ''.join(lines))
+
+    def is_up_to_date(self) -> bool:
+        """
+        Return whether the inputs are those of the last generation and its outputs were not modified since.
+        """
+        if self.isForced or not osp.isfile(self._manifest_path()):
+            return False
+        manifest = util.load_json(self._manifest_path())
+        if manifest.get('fingerprint') != self._fingerprint():
+            return False
+        return all(self._stat(path) == stat for path, stat in manifest['outputs'].items())
+
+    def save_manifest(self):
+        """
+        Call once the outputs, docs included, are complete.
+        """
+        outputs = {osp.relpath(path, self.pathMan.root): self._stat(osp.relpath(path, self.pathMan.root)) for path in self.outputs}
+        os.makedirs(osp.dirname(self._manifest_path()), exist_ok=True)
+        util.save_json(self._manifest_path(), {'fingerprint': self._fingerprint(), 'outputs': dict(sorted(outputs.items()))})
+
+    def _manifest_path(self) -> str:
+        return osp.join(self.pathMan.cacheDir, 'generate_parameters.json')
+
+    def _stat(self, rel_path: str) -> Optional[list[int]]:
+        path = osp.join(self.pathMan.root, rel_path)
+        if not osp.isfile(path):
+            return None
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _fingerprint(self) -> str:
+        """
+        Hash of the generation inputs: project and parameter configs, PremakePlugin.lua, templates, generator code and
+        options.
+        """
+        hasher = hashlib.sha256()
+        hasher.update(f'{_MANIFEST_FORMAT}\0{self.pathMan.pluginName}\0{self.pathMan.pluginId}\0{self.generateGuiResource}\0'.encode('utf-8'))
+        inputs = [self.pathMan.projConfig, self.pathMan.parameterConfig, self.pathMan.premakePluginLua, __file__, project_config.__file__]
+        for template_dir in ('SoundEnginePlugin', 'WwisePlugin'):
+            inputs.extend(sorted(glob.glob(osp.join(self.pathMan.templatesDir, template_dir, '**', '*'), recursive=True)))
+        for path in inputs:
+            if osp.isfile(path):
+                hasher.update(f'{path}\0{wpe_util.hash_file(path)}\0'.encode('utf-8'))
+        return hasher.hexdigest()
 
     def __generate_ids(self):
         lines = []
@@ -434,14 +623,14 @@ class ParameterGenerator:
         return wpe_util.auto_add_line_end(lines)
 
     def __load_with_template(self, instance, templates):
-        template = copy.deepcopy(templates[instance['template']])
-        for key, value in instance.get('override', {}).items():
-            template[key] = value
-        for dep in template.get('dependencies', []):
-            dep['name'] = dep['name'] % {'suffix': instance['suffix']}
-
+        define = templates[instance['template']]
+        if overrides := instance.get('override'):
+            define = {**define, **overrides}
         name = f"{instance['template']}_{instance['suffix']}"
-        self.parameters[name] = Parameter.create(name, template)
+        param = Parameter.create(name, define)
+        for dep in param.dependencies:
+            dep['name'] = dep['name'] % {'suffix': instance['suffix']}
+        self.parameters[name] = param
 
     def __load_with_inner_type(self, define):
         inner_type = self.innerTypes[define['inner_type']]
@@ -449,26 +638,58 @@ class ParameterGenerator:
 
         for type_field in inner_type.fields:
             field_name = type_field.name
-            instance = copy.deepcopy(type_field)
+            instance = type_field.copy_with(
+                name=f"{inner_type.name}_{field_name}_{define['suffix']}",
+                basename=field_name,
+                parent=inner_type,
+                suffix=define['suffix'],
+            )
             if field_name in overrides:
                 instance.defaultValue = overrides[field_name]
             for dep in instance.dependencies:
                 dep['name'] = f"{inner_type.name}_{dep['name'] % {'suffix': define['suffix']}}"
-
-            instance.name = f"{inner_type.name}_{field_name}_{define['suffix']}"
-            instance.basename = field_name
-            instance.parent = inner_type
-            instance.suffix = define['suffix']
             self.parameters[instance.name] = instance
 
     def __generate_declarations(self, struct):
-        lines = []
-        for param in self.parameters.values():
-            if param.struct == struct:
-                lines.append(param.generate_declaration())
-        # remove duplicate lines(when inner type is used)
-        lines = list(OrderedDict.fromkeys(lines).keys())
-        return wpe_util.auto_add_line_end(lines)
+        return wpe_util.auto_add_line_end(list(self.__struct_members(struct)))
+
+    def __struct_members(self, struct) -> dict[str, tuple[int, int]]:
+        """
+        Return {declaration: (size, alignment)} of the members of the struct, in declaration order.
+        """
+        if not self.declarations:
+            # one pass for all structs; the fields of an inner type instance share one declaration, dicts keep the
+            # first of duplicate lines in order
+            for param in self.parameters.values():
+                members = self.declarations.setdefault(param.struct, {})
+                if (declaration := param.generate_declaration()) not in members:
+                    members[declaration] = param.size_and_alignment()
+            if self.optimizeLayout:
+                for name, members in self.declarations.items():
+                    ordered = StructLayout.order_members(list(members.items()), lambda _member: _member[1])
+                    self.declarations[name] = dict(ordered)
+        return self.declarations.get(struct, {})
+
+    def struct_layouts(self) -> list[StructLayout]:
+        """
+        Layouts of the generated structs: inner types, then the InnerType, RTPC and NonRTPC members of the params.
+        """
+        layouts = [inner_type.layout() for inner_type in self.innerTypes.values()]
+        for struct in ('InnerType', 'RTPC', 'NonRTPC'):
+            layouts.append(StructLayout(f'{self.pathMan.pluginName}{struct}Params', list(self.__struct_members(struct).values())))
+        return layouts
+
+    def __generate_layout_assertions(self):
+        if not self.optimizeLayout:
+            return []
+        return wpe_util.auto_add_line_end([layout.generate_static_assert() for layout in self.struct_layouts()])
+
+    def __report_layouts(self):
+        layouts = self.struct_layouts()
+        lines = [f'{layout.name}: {layout.size} bytes, {layout.padding} bytes of padding' for layout in layouts]
+        if not self.optimizeLayout and any(layout.optimized().size < layout.size for layout in layouts):
+            lines.append('Set `optimize_layout = true` under [parameters] to order members by size and reduce padding.')
+        logging.info(f'Parameter struct layouts{" (optimized)" if self.optimizeLayout else ""}:\n  ' + '\n  '.join(lines))
 
     def __generate_init(self):
         lines = [param.generate_init() for param in self.parameters.values()]
@@ -5,6 +5,7 @@ import re
 import kkpyutil as util
 
 
+from wpe.premake_metadata import PremakeMetadata
 from wpe.wp_wrapper import WpWrapper
 
 
@@ -27,6 +28,12 @@ class PathMan:
         self.distDir = osp.join(self.root, 'dist')
         self.testDir = osp.join(self.root, 'test')
         self.hooksDir = osp.join(self.configDir, 'hooks')
+        # wp.py already writes its logs under `Output`, which is git-ignored by `wpe i`
+        self.wpeOutputDir = osp.join(self.root, 'Output', 'wpe')
+        self.buildLogsDir = osp.join(self.wpeOutputDir, 'build_logs')
+        self.packageLogsDir = osp.join(self.wpeOutputDir, 'package_logs')
+        self.cacheDir = osp.join(self.wpeOutputDir, 'cache')
+        self.packageCacheDir = osp.join(self.cacheDir, 'package')
 
     @staticmethod
     def find_premake_plugin_lua_in_ancestor_and_update_root(cwd):
@@ -43,7 +50,14 @@ class PathMan:
                                 f'This command must be executed under a plugin directory. cwd: {os.getcwd()}')
 
     def parse_plugin_name(self):
-        lines = util.load_lines(self.premakePluginLua, rmlineend=True)
+        return self.read_plugin_name(self.premakePluginLua)
+
+    def premake_metadata(self) -> PremakeMetadata:
+        return PremakeMetadata.load(self.premakePluginLua)
+
+    @staticmethod
+    def read_plugin_name(premake_plugin_lua):
+        lines = util.load_lines(premake_plugin_lua, rmlineend=True)
         name_define_pattern = r'Plugin.name = ".*"'
         for line in lines:
             if matched := re.match(name_define_pattern, line):
@@ -6,7 +6,7 @@ import kkpyutil as util
 import requests
 
 from wpe.pathman import PathMan
-from wpe.util import overwrite_copy, remove_ansi_color, parse_premake_lua_table
+from wpe.util import overwrite_copy, remove_ansi_color
 
 
 class PluginTestRunner:
@@ -51,13 +51,8 @@ class PluginTestRunner:
                 'test_util': self.pathMan.testUtilDir.replace('\\', '/')
             })
 
-        def extract_includes_from_premake():
-            plugin_table = parse_premake_lua_table(self.pathMan.premakePluginLua)
-            includes = list(plugin_table['sdk']['static']['includedirs'].values())
-            return includes
-
         def sync_includes_from_premake():
-            includes = extract_includes_from_premake()
+            includes = self.pathMan.premake_metadata().includeDirs
             inserts = [f'include_directories({include})\n' for include in includes]
             cmakelists_file = osp.join(self.pathMan.testDir, 'CMakeLists.txt')
             util.substitute_lines_in_file(inserts, cmakelists_file,
@@ -0,0 +1,86 @@
+import hashlib
+import logging
+import os
+import os.path as osp
+import threading
+from dataclasses import dataclass, field, asdict
+
+import kkpyutil as util
+
+# bump when the cached fields change
+_CACHE_FORMAT = 1
+
+# {PremakePlugin.lua path: ((mtime, size), metadata)}, shared by the commands of one process
+_loaded: dict[str, tuple[list[int], 'PremakeMetadata']] = {}
+_loadedLock = threading.Lock()
+
+
+@dataclass
+class PremakeMetadata:
+    """
+    Fields of PremakePlugin.lua used by wpe.
+    Evaluating the Lua starts a Lua runtime, so the fields are cached in `Output/wpe/cache` next to the file, keyed by
+    its mtime and size, then by its content hash: the Lua only runs again when the file content changes.
+    """
+    name: str
+    libSuffix: str = ''
+    includeDirs: list[str] = field(default_factory=list)
+
+    @staticmethod
+    def load(premake_plugin_lua: str) -> 'PremakeMetadata':
+        path = osp.abspath(premake_plugin_lua)
+        stat = os.stat(path)
+        file_key = [stat.st_mtime_ns, stat.st_size]
+        with _loadedLock:
+            if (loaded := _loaded.get(path)) and loaded[0] == file_key:
+                return loaded[1]
+            metadata = PremakeMetadata._load_cached(path, file_key)
+            _loaded[path] = (file_key, metadata)
+            return metadata
+
+    @staticmethod
+    def cache_path(premake_plugin_lua: str) -> str:
+        # under `PathMan.cacheDir`
+        return osp.join(osp.dirname(premake_plugin_lua), 'Output', 'wpe', 'cache', 'premake_plugin.json')
+
+    @staticmethod
+    def _load_cached(path: str, file_key: list[int]) -> 'PremakeMetadata':
+        cache_path = PremakeMetadata.cache_path(path)
+        cached = None
+        if osp.isfile(cache_path):
+            try:
+                cached = util.load_json(cache_path)
+            except ValueError:
+                logging.warning(f'Ignoring corrupted cache: {cache_path}')
+        if cached and cached.get('format') == _CACHE_FORMAT and cached['fileKey'] == file_key:
+            return PremakeMetadata(**cached['metadata'])
+
+        with open(path, 'rb') as f:
+            content = f.read()
+        sha256 = hashlib.sha256(content).hexdigest()
+        if cached and cached.get('format') == _CACHE_FORMAT and cached['sha256'] == sha256:
+            metadata = PremakeMetadata(**cached['metadata'])
+        else:
+            logging.info(f'Evaluating {osp.basename(path)}')
+            metadata = PremakeMetadata._evaluate(content.decode(util.TXT_CODEC))
+        try:
+            os.makedirs(osp.dirname(cache_path), exist_ok=True)
+            util.save_json(cache_path, {'format': _CACHE_FORMAT, 'fileKey': file_key, 'sha256': sha256,
+                                        'metadata': asdict(metadata)})
+        except OSError as e:
+            logging.warning(f'Failed to cache {osp.basename(path)} metadata: {e}')
+        return metadata
+
+    @staticmethod
+    def _evaluate(lua_text: str) -> 'PremakeMetadata':
+        from lupa import LuaRuntime
+        lua = LuaRuntime(unpack_returned_tuples=True)
+        lua.globals()['_AK_PREMAKE'] = True
+        plugin_table = lua.execute(lua_text)
+        static = plugin_table['sdk']['static']
+        include_dirs = static['includedirs']
+        return PremakeMetadata(
+            name=plugin_table['name'],
+            libSuffix=static['libsuffix'] or '',
+            includeDirs=list(include_dirs.values()) if include_dirs else [],
+        )
@@ -116,5 +116,8 @@ class ProjectConfig:
     def parameter_from_inner_types(self) -> list:
         return self.config['parameters'].get('from_inner_types', [])
 
+    def parameter_optimize_layout(self) -> bool:
+        return self.config['parameters'].get('optimize_layout', False)
+
     def version(self) -> int:
         return self.config['project']['version']
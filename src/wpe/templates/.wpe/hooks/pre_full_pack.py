@@ -1,27 +1,18 @@
 import os
 import os.path as osp
-import logging
-import requests
-from pprint import pformat
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import kkpyutil as util
 
+from wpe.agent_pool import AgentPool
+
+# used when no agents are configured with `wpe config build-agents host1:5000,host2:5000`
 _build_agent_host = '' # YOUR_BUILD_AGENT_HOST_HERE
-_build_agent_account = '' # YOUR_BUILD_AGENT_ACCOUNT_HERE
+# same path on every agent
 _proj_root_on_build_agent = '' # YOUR_PROJECT_ROOT_ON_BUILD_AGENT_HERE
 
 
-def rpc_call(method: str, args: dict):
-    logging.info(f'RPC call: {method} with args: {args}')
-    response = requests.post(f'http://{_build_agent_host}:5000/{method}',
-                             json=args)
-    response_json = response.json()
-    if response.status_code != 200 or not response_json['succeeded']:
-        raise RuntimeError(pformat(response_json, width=160, sort_dicts=False))
-    logging.info(pformat(response_json, width=160, sort_dicts=False))
-    return response
-
-
 def get_local_branch_name():
     res = util.run_cmd(['git', 'branch', '--show-current'])
     return res.stdout.strip().decode('utf-8')
@@ -45,43 +36,50 @@ def check_worktree_clean():
             raise RuntimeError('Please push all commits before remote build.')
 
 
-def build_ios_plugin(plugin_name: str):
+def build_ios_plugin(plugin_name: str, pool: AgentPool):
+    """
+    Build and download each configuration on the least loaded agent, configurations in parallel.
+    Each agent is synced and premade once, before the first configuration it builds.
+    Ctrl+C cancels the remote jobs.
+    """
     local_branch_name = get_local_branch_name()
-    rpc_call('git_sync', {'root': _proj_root_on_build_agent, 'branch': local_branch_name})
-    rpc_call('premake', {'root': _proj_root_on_build_agent, 'platform': 'iOS'})
-    for configuration in ('Debug', 'Profile', 'Release'):
-        rpc_call('build', {'root': _proj_root_on_build_agent, 'platform': 'iOS', 'configuration': configuration})
-
-
-def copy_binaries_from_build_machine(plugin_name: str):
-    build_machine_sdk_root = util.run_cmd(
-        ['ssh', f'{_build_agent_account}@{_build_agent_host}', 'source ~/.bash_profile && echo $WWISESDK']
-    ).stdout.strip().decode('utf-8')
-    res = util.run_cmd([
-        'ssh',
-        f'{_build_agent_account}@{_build_agent_host}',
-        f'source ~/.bash_profile && find \"${{WWISESDK}}\" -type f -name *{plugin_name}* | grep -v dSYM'
-    ])
-    build_stuffs = res.stdout.strip().decode('utf-8').split('\n')
-    for item in build_stuffs:
-        relative_path = osp.relpath(item, start=build_machine_sdk_root)
-        target_path = osp.join(os.getenv('WWISESDK'), relative_path)
-        os.makedirs(osp.dirname(target_path), exist_ok=True)
-        util.run_cmd([
-            'scp',
-            # disable filename check: https://stackoverflow.com/a/54599326/19741036
-            '-T',
-            f'{_build_agent_account}@{_build_agent_host}:"{item}"',
-            target_path
-        ])
+    local_commit = util.run_cmd(['git', 'rev-parse', 'HEAD']).stdout.strip().decode('utf-8')
+    prepare_locks = {agent: threading.Lock() for agent in pool.agents}
+    prepared_agents = set()
+
+    def prepare(agent, label):
+        # configurations built on the same agent share its tree
+        with prepare_locks[agent]:
+            if agent in prepared_agents:
+                return
+            pool.call(agent, 'git_sync', {'root': _proj_root_on_build_agent, 'branch': local_branch_name, 'commit': local_commit}, label)
+            pool.call(agent, 'premake', {'root': _proj_root_on_build_agent, 'platform': 'iOS'}, label)
+            prepared_agents.add(agent)
+
+    def build_configuration(configuration):
+        def on_agent(agent):
+            label = f'iOS {configuration}'
+            prepare(agent, label)
+            pool.call(agent, 'build', {'root': _proj_root_on_build_agent, 'platform': 'iOS', 'configuration': configuration}, label)
+            pool.download_artifacts(agent, plugin_name, os.getenv('WWISESDK'), 'iOS', configuration)
+        pool.run(on_agent, f'iOS {configuration}')
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(build_configuration, configuration) for configuration in ('Debug', 'Profile', 'Release')]
+        try:
+            for future in futures:
+                future.result()
+        except KeyboardInterrupt:
+            pool.cancel_all()
+            raise
 
 
 def main(**kwargs):
-    if _build_agent_host and _build_agent_account and _proj_root_on_build_agent:
+    pool = AgentPool.from_config([f'{_build_agent_host}:5000'] if _build_agent_host else [])
+    if pool.agents and _proj_root_on_build_agent:
         if input('Remote build iOS plugin? [y/n]') == 'y':
             check_worktree_clean()
-            build_ios_plugin(kwargs['plugin_name'])
-            copy_binaries_from_build_machine(kwargs['plugin_name'])
+            build_ios_plugin(kwargs['plugin_name'], pool)
 
 
 if __name__ == '__main__':
@@ -61,6 +61,9 @@ struct %(name)sNonRTPCParams
     // [/NonRTPCDeclaration]
 };
 
+// [LayoutAssertions]
+// [/LayoutAssertions]
+
 struct %(name)s%(suffix)sParams
     : public AK::IAkPluginParam
 {
@@ -1,5 +1,8 @@
+import hashlib
+import io
 import logging
 import os
+import platform
 import re
 import shutil
 import subprocess
@@ -8,11 +11,14 @@ import os.path as osp
 from distutils.dir_util import copy_tree
 from distutils.file_util import copy_file
 from pathlib import Path
+from typing import Optional, TYPE_CHECKING
 
 import kkpyutil as util
 import toml
 
-from wpe.pathman import PathMan
+if TYPE_CHECKING:
+    # annotations only: wpe.pathman imports this module through wpe.wp_wrapper
+    from wpe.pathman import PathMan
 
 
 class ParserHelp:
@@ -103,6 +109,42 @@ def path_is_under_git_repo(path: str) -> bool:
         return False
 
 
+class InterProcessLock:
+    """
+    Exclusive lock on a file, shared by the processes of this host. The OS releases it when its holder exits.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def try_acquire(self) -> bool:
+        os.makedirs(osp.dirname(self.path), exist_ok=True)
+        file = open(self.path, 'a+b')
+        try:
+            if platform.system() == 'Windows':
+                import msvcrt
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return False
+        self._file = file
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        if platform.system() == 'Windows':
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+
 def remove_ansi_color(text):
     ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
     return ansi_escape.sub('', text)
@@ -119,35 +161,122 @@ def add_indent(lines: list[str], indent: int):
     return [f'{" " * indent}{line}' for line in lines]
 
 
-def copy_template(relative, pathman: PathMan, is_forced=False, lib_suffix='', add_suffix_after_project_name=False, lazy_create=False):
-    def _need_overwrite(_dst):
-        if is_forced or not osp.isfile(_dst):
-            return True
-        content = util.load_text(_dst)
-        return '[wp-enhanced template]' not in content
-
+class RegionSubstituter:
+    """
+    Fill several cue-delimited regions of a file with one read, one scan and one write.
+    Each region follows `util.substitute_lines_in_file`: its start cue is the first line starting with it, its end cue
+    the first line starting with it from there on. Cues are located in the original content, regions must not overlap.
+    """
+    def __init__(self):
+        # (inserts, startcue, endcue, removecues, withindent)
+        self._regions: list[tuple[list[str], str, str, bool, bool]] = []
+
+    def add(self, inserts, startcue: str, endcue: str, removecues=False, withindent=True):
+        """
+        inserts: lines with line ends
+        """
+        self._regions.append(([inserts] if isinstance(inserts, str) else inserts, startcue, endcue, removecues, withindent))
+
+    def substitute_in_file(self, file) -> bool:
+        """
+        Return whether the file content changed.
+        """
+        lines = util.load_lines(file)
+        return save_text_if_changed(file, ''.join(self.substitute(lines, file)))
+
+    def substitute(self, lines: list[str], source='lines') -> list[str]:
+        spans = sorted(self._find_spans(lines), key=lambda span: span[:2])
+        output = []
+        pos = 0
+        for start, end, region in spans:
+            inserts, startcue, _, removecues, withindent = region
+            if start < pos:
+                raise ValueError(f'Overlapping regions in {source}: "{startcue}" starts inside the previous region.')
+            if withindent:
+                cue_line = lines[start]
+                n_indent_spaces = sum(4 if c == '\t' else 1 for c in cue_line[:cue_line.find(startcue)])
+                inserts = [f'{" " * n_indent_spaces}{line}' for line in inserts]
+            output.extend(lines[pos:start])
+            if removecues and end - start > 1:
+                output.extend(inserts)
+            elif removecues:
+                # nothing between the cues: inserted before them, cues kept
+                output.extend(inserts)
+                output.extend(lines[start:end + 1])
+            else:
+                output.append(lines[start])
+                output.extend(inserts)
+                output.append(lines[end])
+            pos = end + 1
+        output.extend(lines[pos:])
+        return output
+
+    def _find_spans(self, lines: list[str]) -> list[tuple[int, int, tuple]]:
+        """
+        Return (start cue line, end cue line, region) of the regions whose cues are both found, in a single scan.
+        """
+        unseen = list(self._regions)
+        opened: list[tuple[int, tuple]] = []
+        spans = []
+        for ln, line in enumerate(lines):
+            stripped = line.strip()
+            for region in [r for r in unseen if stripped.startswith(r[1])]:
+                unseen.remove(region)
+                opened.append((ln, region))
+            for start, region in [o for o in opened if stripped.startswith(o[1][2])]:
+                opened.remove((start, region))
+                spans.append((start, ln, region))
+            if not unseen and not opened:
+                break
+        return spans
+
+
+def load_template(relative, pathman: 'PathMan', is_forced=False, lib_suffix='', add_suffix_after_project_name=False, lazy_create=False) -> tuple[Optional[str], list[str]]:
+    """
+    Return the destination of a template and the lines to generate from: the template with its keywords filled when
+    the destination is missing, forced or not generated from a template, else the destination content.
+    Return (None, []) when the destination does not exist and is not lazily created.
+    """
     src = osp.join(pathman.templatesDir, relative)
     assert osp.isfile(src)
     dst = replace_in_basename(osp.join(pathman.root, relative), 'ProjectName',
                               pathman.pluginName + lib_suffix if add_suffix_after_project_name else pathman.pluginName)
     if not osp.isfile(dst) and not lazy_create:
         logging.info(f'Destination file "{osp.basename(dst)}" does not exist. Skipping...')
-        return None
+        return None, []
 
-    if not _need_overwrite(dst):
+    content = util.load_text(dst) if osp.isfile(dst) else None
+    if not is_forced and content is not None and '[wp-enhanced template]' in content:
         logging.info(f'Skip copying template "{osp.basename(src)}". Use -f to force overwrite.')
-        return dst
-    overwrite_copy(src, dst)
-    util.substitute_keywords_in_file(dst,
-                                     {
-                                         'name': pathman.pluginName,
-                                         'display_name': pathman.pluginName,
-                                         'plugin_id': pathman.pluginId,
-                                         'suffix': lib_suffix,
-                                     })
+        return dst, io.StringIO(content).readlines()
+    content = util.substitute_keywords(util.load_text(src),
+                                       {
+                                           'name': pathman.pluginName,
+                                           'display_name': pathman.pluginName,
+                                           'plugin_id': pathman.pluginId,
+                                           'suffix': lib_suffix,
+                                       })
+    return dst, io.StringIO(content).readlines()
+
+
+def copy_template(relative, pathman: 'PathMan', is_forced=False, lib_suffix='', add_suffix_after_project_name=False, lazy_create=False):
+    dst, lines = load_template(relative, pathman, is_forced, lib_suffix, add_suffix_after_project_name, lazy_create)
+    if dst:
+        save_text_if_changed(dst, ''.join(lines))
     return dst
 
 
+def save_text_if_changed(path, text: str) -> bool:
+    """
+    Write only when the content differs, so that unchanged outputs keep their timestamp and do not trigger rebuilds.
+    Return whether the file was written.
+    """
+    if osp.isfile(path) and util.load_text(path) == text:
+        return False
+    util.save_text(path, text)
+    return True
+
+
 def parse_premake_lua_table(premake_plugin_lua_path):
     from lupa import LuaRuntime
     lua = LuaRuntime(unpack_returned_tuples=True)
@@ -161,3 +290,11 @@ def convert_to_wsl_path(path: str):
     driver, relpath = abs_path.split(':\\')
     relpath = relpath.replace("\\", "/")
     return f'/mnt/{driver.lower()}/{relpath}'
+
+
+def hash_file(path, algorithm='sha256', chunk_size=1024 * 1024):
+    hasher = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
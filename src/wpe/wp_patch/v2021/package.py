@@ -30,6 +30,10 @@ from common.platform import *
 from common.registry import platform_registry, get_supported_platforms, is_documentation, is_authoring_target
 from common.util import exit_with_error, strip_comments
 from common.version import VersionArgParser
+# [wp-enhanced] multi-threaded xz compression and package cache
+from wpe.archive import PackageWriter
+from wpe.package_cache import PackageCache
+# [/wp-enhanced]
 
 SUPPORTED_PLATFORMS = get_supported_platforms("package")
 DEFAULT_ADDITIONAL_ARTIFACT_FILE = "additional_artifacts.json"
@@ -93,6 +97,11 @@ def run(argv):
     parser.add_argument("-a", "--additional-artifacts", nargs="*", default=[], help="path to additional artifacts to package (must be relative to the root of your Wwise installation, supports glob patterns)")
     parser.add_argument("-f", "--additional-artifacts-file", default=DEFAULT_ADDITIONAL_ARTIFACT_FILE, help="path to a JSON file listing the paths to additional artifacts to package for each platform, defaults to {}".format(DEFAULT_ADDITIONAL_ARTIFACT_FILE))
     parser.add_argument("-c", "--copy-artifacts", action="store_true", help="copy artifacts instead of packaging them, this option only applies to additional artifact files with destination -> sources entries")
+    # [wp-enhanced] xz compression options
+    parser.add_argument("--xz-preset", type=int, default=6, choices=range(10), help="xz compression preset (0-9), defaults to 6")
+    parser.add_argument("--xz-threads", type=int, default=1, help="number of xz compression threads, 0 to use all cores, defaults to 1 (single-threaded)")
+    parser.add_argument("--package-cache-dir", default="", help="directory of compressed packages to reuse when the artifacts did not change, disabled if empty")
+    # [/wp-enhanced]
     args = parser.parse_args(argv)
 
     platform_info = platform_registry.get(args.platform)
@@ -167,8 +176,8 @@ def run(argv):
             artifact_re = re.compile(r"([/\\])Debug\1")
             return bool(artifact_re.search(artifact))
 
-        # [wp-enhanced] add artifacts recursively, avoid adding empty folders
-        def archive_artifacts(output_name, write_mode):
+        # [wp-enhanced] scan artifacts once and write all archives in a single pass, avoid adding empty folders
+        def need_add_to(output_name):
             def need_add(_artifact):
                 if is_authoring_debug_package(output_name):
                     if not is_debug_artifact(_artifact) or is_data_artifact(_artifact):
@@ -176,36 +185,43 @@ def run(argv):
                 elif is_authoring_release_package(output_name) and is_debug_artifact(_artifact):
                     return False
                 return True
+            return need_add
 
-            artifacts_dst_pair: list[tuple[str, str]] = []
-            for artifact in artifacts_found:
-                if need_add(artifact):
-                    print("Compressing {}...".format(artifact))
-                    artifacts_dst_pair.append((artifact, os.path.relpath(artifact, WWISE_ROOT)))
-            for (artifact, dest) in artifacts_found_in_project:
-                if need_add(artifact):
-                    print("Compressing {}...".format(artifact))
-                    artifacts_dst_pair.append((artifact, os.path.join(dest, os.path.basename(artifact))))
-
-            if not artifacts_dst_pair:
-                return
-            with tarfile.open(output_name, write_mode, format=tarfile.GNU_FORMAT) as tar:
-                for artifact, dest in artifacts_dst_pair:
-                    tar.add(artifact, dest, recursive=True)
-        # [/wp-enhanced]
+        artifacts_dst_pair: list[tuple[str, str]] = []
+        for artifact in artifacts_found:
+            artifacts_dst_pair.append((artifact, os.path.relpath(artifact, WWISE_ROOT)))
+        for (artifact, dest) in artifacts_found_in_project:
+            artifacts_dst_pair.append((artifact, os.path.join(dest, os.path.basename(artifact))))
+        for artifact, _ in artifacts_dst_pair:
+            print("Compressing {}...".format(artifact))
 
-        for compressed_archive_name in compressed_archive_names:
-            try:
-                archive_artifacts(compressed_archive_name, "w:xz")
-            except tarfile.CompressionError:
-                # xz compression isn't supported on older versions of tarfile
+        try:
+            package_cache = PackageCache(args.package_cache_dir) if args.package_cache_dir else None
+            writer = PackageWriter(args.xz_preset, args.xz_threads, package_cache)
+            # archives do not embed the version, the package cache is keyed by the archive name without it
+            writer.write(
+                artifacts_dst_pair,
+                {name: need_add_to(name) for name in compressed_archive_names},
+                {name: name.replace("_{}_".format(formatted_plugin_version), "_", 1) for name in compressed_archive_names}
+            )
+        except tarfile.CompressionError:
+            # xz compression isn't supported on older versions of tarfile
+            for compressed_archive_name in compressed_archive_names:
+                need_add = need_add_to(compressed_archive_name)
+                selected = [(artifact, dest) for artifact, dest in artifacts_dst_pair if need_add(artifact)]
+                if not selected:
+                    continue
                 archive_name = compressed_archive_name[:-3]
-                archive_artifacts(archive_name, "w")
+                with tarfile.open(archive_name, "w", format=tarfile.GNU_FORMAT) as tar:
+                    for artifact, dest in selected:
+                        tar.add(artifact, dest, recursive=True)
 
                 res = subprocess.Popen([XZ_UTILS, "-zf", archive_name]).wait()
                 if res != 0:
                     return res
+        # [/wp-enhanced]
 
+        for compressed_archive_name in compressed_archive_names:
             print("Wrote {}".format(compressed_archive_name))
 
     return 0
@@ -14,13 +14,20 @@ from wpe.wp_patch.resolver import patch_tag
 def create_sdk_symlink(wwise_sdk):
     temp_sdk_dir = 'C:\\temp\\wpe\\WWISESDK' if platform.system() == 'Windows' else osp.expanduser(
         '~/temp/wpe/WWISESDK')
+    if osp.islink(temp_sdk_dir) and os.readlink(temp_sdk_dir) == wwise_sdk:
+        # may be in use by a concurrent Android build job, keep it
+        return temp_sdk_dir
     if osp.exists(temp_sdk_dir):
         if osp.islink(temp_sdk_dir):
             os.remove(temp_sdk_dir)
         else:
             raise FileExistsError(f'{temp_sdk_dir} exists and is not a symlink to WWISESDK')
     os.makedirs(osp.dirname(temp_sdk_dir), exist_ok=True)
-    os.symlink(wwise_sdk, temp_sdk_dir)
+    try:
+        os.symlink(wwise_sdk, temp_sdk_dir)
+    except FileExistsError:
+        if not (osp.islink(temp_sdk_dir) and os.readlink(temp_sdk_dir) == wwise_sdk):
+            raise
     return temp_sdk_dir
 
 
@@ -0,0 +1,87 @@
+"""
+Time `ParameterGenerator` on a copy of the wpe_integrated test project expanded to many parameters.
+No Wwise install needed. Run from the repo root:
+
+    python tests/benchmark_generate_parameters.py [--count 10000]
+"""
+import argparse
+import os.path as osp
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, osp.join(osp.dirname(__file__), '..', 'src'))
+
+import toml
+
+from wpe.parameter import ParameterGenerator
+from wpe.pathman import PathMan
+
+test_dir = osp.dirname(__file__)
+org_dir = osp.join(test_dir, 'org')
+test_plugin_name = 'TestPlugin'
+
+
+def expand_parameters(config: dict, count: int):
+    """
+    Mix of plain defines, template instances and inner type instances, as in per-band and per-voice plugins.
+    """
+    params = config.setdefault('parameters', {})
+    params['templates'] = {
+        'voice_gain': {
+            'type': 'float', 'rtpc_type': 'Additive', 'default_value': 0, 'min_value': -96, 'max_value': 12,
+            'description': [{'language': 'en', 'text': 'Voice gain'}],
+            'dependencies': [{'name': 'voice_enabled_%(suffix)s', 'condition': 'Enumeration', 'values': [True]}],
+        },
+        'voice_enabled': {'type': 'bool', 'default_value': True},
+    }
+    params['inner_types'] = {
+        'band': {
+            'enabled': {'type': 'bool', 'default_value': True},
+            'frequency': {'type': 'float', 'rtpc_type': 'Exclusive', 'default_value': 1000, 'min_value': 20, 'max_value': 20000,
+                          'dependencies': [{'name': 'enabled_%(suffix)s', 'condition': 'Enumeration', 'values': [True]}]},
+            'gain': {'type': 'float', 'rtpc_type': 'Exclusive', 'default_value': 0, 'min_value': -24, 'max_value': 24},
+            'mode': {'type': 'int', 'default_value': 0, 'enumeration': [{'displayName': 'Peak', 'value': 0}, {'displayName': 'Shelf', 'value': 1}]},
+        },
+    }
+    n_voices = count // 4
+    n_bands = (count - 2 * n_voices) // 4
+    params['from_templates'] = [{'template': name, 'suffix': f'{i}'} for i in range(n_voices) for name in ('voice_enabled', 'voice_gain')]
+    params['from_inner_types'] = [{'inner_type': 'band', 'suffix': f'{i}', 'overrides': {'gain': i % 24}} for i in range(n_bands)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10000, help='Approximate number of generated parameters.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = osp.join(tmp_dir, test_plugin_name)
+        shutil.copytree(osp.join(org_dir, 'wpe_integrated', test_plugin_name), root)
+        pathman = PathMan(root)
+        config = toml.load(pathman.projConfig)
+        expand_parameters(config, args.count)
+        with open(pathman.projConfig, 'w', encoding='utf-8') as f:
+            toml.dump(config, f)
+
+        generator = ParameterGenerator(pathman, generate_gui_resource=True)
+        start = time.perf_counter()
+        generator.load_parameter_config()
+        loaded = time.perf_counter()
+        generator._generate()
+        generated = time.perf_counter()
+
+        # memory in a separate pass, tracing slows down allocations
+        tracemalloc.start()
+        ParameterGenerator(pathman, generate_gui_resource=True).load_parameter_config()
+        _, load_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(f'{len(generator.parameters)} parameters: load {loaded - start:.2f}s (peak {load_peak / (1 << 20):.1f} MiB), '
+          f'generate {generated - loaded:.2f}s, total {generated - start:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
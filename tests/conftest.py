@@ -0,0 +1,8 @@
+import os
+import os.path as osp
+
+
+def write_file(path, content: str):
+    os.makedirs(osp.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
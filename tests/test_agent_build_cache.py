@@ -0,0 +1,81 @@
+import os
+import os.path as osp
+import subprocess
+
+import pytest
+
+from wpe.agent_build_cache import AgentBuildCache
+from conftest import write_file
+
+
+def git(root, *args):
+    subprocess.run(['git', '-C', str(root), '-c', 'user.name=wpe', '-c', 'user.email=wpe@example.com', *args],
+                   check=True, capture_output=True)
+
+
+@pytest.fixture
+def sdk_root(tmp_path):
+    root = osp.join(tmp_path, 'SDK')
+    write_file(osp.join(root, 'iOS_Xcode1500', 'Release', 'lib', 'libTestPlugin.a'), 'release')
+    return root
+
+
+def artifacts(sdk_root) -> dict[str, str]:
+    rel = osp.join('iOS_Xcode1500', 'Release', 'lib', 'libTestPlugin.a')
+    return {rel: osp.join(sdk_root, rel)}
+
+
+def test_commit(tmp_path):
+    root = osp.join(tmp_path, 'project')
+    write_file(osp.join(root, 'PremakePlugin.lua'), 'return {}\n')
+    git(root, 'init', '-q')
+    git(root, 'add', '-A')
+    git(root, 'commit', '-q', '-m', 'init')
+    assert len(AgentBuildCache.commit(root)) == 40
+    # untracked files do not change the build
+    write_file(osp.join(root, 'Output', 'build.log'), 'log')
+    assert AgentBuildCache.commit(root) is not None
+    write_file(osp.join(root, 'PremakePlugin.lua'), 'return { name = "TestPlugin" }\n')
+    assert AgentBuildCache.commit(root) is None
+
+
+def test_key(sdk_root):
+    key = AgentBuildCache.key('a' * 40, 'iOS', 'Release', 'TestPlugin', sdk_root)
+    assert AgentBuildCache.key('a' * 40, 'iOS', 'Release', 'TestPlugin', sdk_root) == key
+    assert AgentBuildCache.key('b' * 40, 'iOS', 'Release', 'TestPlugin', sdk_root) != key
+    assert AgentBuildCache.key('a' * 40, 'iOS', 'Debug', 'TestPlugin', sdk_root) != key
+    assert AgentBuildCache.key('a' * 40, 'Mac', 'Release', 'TestPlugin', sdk_root) != key
+    assert AgentBuildCache.key('a' * 40, 'iOS', 'Release', 'TestPlugin', osp.dirname(sdk_root)) != key
+
+
+def test_store_and_restore(tmp_path, sdk_root):
+    cache = AgentBuildCache(osp.join(tmp_path, 'cache'), 1 << 20)
+    key = AgentBuildCache.key('a' * 40, 'iOS', 'Release', 'TestPlugin', sdk_root)
+    assert cache.restore(key, sdk_root) is None
+    cache.store(key, {'commit': 'a' * 40, 'platform': 'iOS', 'configuration': 'Release'},
+                {'succeeded': True, 'args': ['wpe', 'b'], 'stdout': 'built'}, artifacts(sdk_root))
+
+    artifact = next(iter(artifacts(sdk_root).values()))
+    write_file(artifact, 'modified')
+    entry = cache.restore(key, sdk_root)
+    assert entry['result']['stdout'] == 'built'
+    with open(artifact, encoding='utf-8') as f:
+        assert f.read() == 'release'
+    assert cache.usage() == (1, len('release'))
+
+
+def test_evict_least_recently_used(tmp_path, sdk_root):
+    cache = AgentBuildCache(osp.join(tmp_path, 'cache'), 2 * len('release'))
+    keys = [AgentBuildCache.key(c * 40, 'iOS', 'Release', 'TestPlugin', sdk_root) for c in 'abc']
+    for i, key in enumerate(keys[:2]):
+        cache.store(key, {'commit': 'abc'[i] * 40, 'platform': 'iOS', 'configuration': 'Release'}, {}, artifacts(sdk_root))
+        # mtime resolution of some file systems
+        manifest = osp.join(cache.cacheDir, key, 'manifest.json')
+        os.utime(manifest, (1000 + i, 1000 + i))
+    # the oldest entry is used again, the other one is evicted by the next store
+    cache.restore(keys[0], sdk_root)
+    cache.store(keys[2], {'commit': 'c' * 40, 'platform': 'iOS', 'configuration': 'Release'}, {}, artifacts(sdk_root))
+    assert cache.restore(keys[1], sdk_root) is None
+    assert cache.restore(keys[0], sdk_root) is not None
+    assert cache.restore(keys[2], sdk_root) is not None
+    assert cache.usage() == (2, 2 * len('release'))
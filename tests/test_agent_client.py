@@ -0,0 +1,109 @@
+import io
+import os.path as osp
+import tarfile
+
+import pytest
+import requests
+
+from wpe.agent_client import AgentClient, AgentError, _extract_safely
+
+
+def test_retry():
+    client = AgentClient('localhost:5000', retries=3)
+    retry = client._session.get_adapter(f'{client.url}/status').max_retries
+    assert (retry.total, retry.connect, retry.read) == (3, 3, 3)
+    # gateway errors are retried, but submitting a job is not retried once sent
+    assert retry.is_retry('GET', 502) and retry.is_retry('GET', 504)
+    assert not retry.is_retry('GET', 500)
+    assert not retry.is_retry('POST', 502)
+
+
+class FakeLogResponse:
+    def __init__(self, chunks: list[bytes], error: Exception = None):
+        self.chunks = chunks
+        self.error = error
+
+    def iter_content(self, chunk_size=None):
+        yield from self.chunks
+        if self.error:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class FakeStateResponse:
+    def __init__(self, state: str):
+        self.state = state
+
+    def json(self):
+        return {'state': self.state}
+
+
+def test_stream_log_resumes_from_offset(capsys):
+    client = AgentClient('localhost:5000', poll_seconds=0)
+    log = 'building\nlinking libTestPlugin.a ✓\ndone'.encode('utf-8')
+    # the connection drops inside a multi-byte character, then the job is still running
+    cut = log.index('✓'.encode('utf-8')) + 1
+    log_responses = [FakeLogResponse([log[:5], log[5:cut]], requests.exceptions.ChunkedEncodingError('dropped')),
+                     FakeLogResponse([log[cut:]])]
+    states = ['running', 'succeeded']
+    offsets = []
+
+    def _request(method, path, accepted=(200, 202), **kwargs):
+        if path.endswith('/log'):
+            offsets.append(kwargs['params']['offset'])
+            return log_responses.pop(0)
+        return FakeStateResponse(states.pop(0))
+
+    client.request = _request
+    client._stream_log('1', 'iOS Release')
+    assert offsets == [0, cut]
+    assert capsys.readouterr().out.splitlines() == ['[iOS Release] building',
+                                                    '[iOS Release] linking libTestPlugin.a ✓',
+                                                    '[iOS Release] done']
+
+
+def artifacts_tar(members: list[tarfile.TarInfo]) -> tarfile.TarFile:
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode='w:gz') as tar:
+        for member in members:
+            content = b'lib' if member.isreg() else None
+            if content is not None:
+                member.size = len(content)
+            tar.addfile(member, io.BytesIO(content) if content is not None else None)
+    data.seek(0)
+    return tarfile.open(fileobj=data, mode='r|gz')
+
+
+def tar_member(name: str, kind=tarfile.REGTYPE, linkname='') -> tarfile.TarInfo:
+    member = tarfile.TarInfo(name)
+    member.type = kind
+    member.linkname = linkname
+    return member
+
+
+@pytest.mark.parametrize('has_data_filter', [True, False])
+def test_extract_safely(tmp_path, monkeypatch, has_data_filter):
+    if not has_data_filter:
+        # as before Python 3.11.4
+        monkeypatch.delattr(tarfile, 'data_filter')
+    errors = (AgentError, tarfile.TarError)
+    sdk_root = osp.join(tmp_path, 'SDK')
+    with artifacts_tar([tar_member('iOS_Xcode1500/Release/lib/libTestPlugin.a')]) as tar:
+        for member in tar:
+            _extract_safely(tar, member, sdk_root)
+    with open(osp.join(sdk_root, 'iOS_Xcode1500', 'Release', 'lib', 'libTestPlugin.a'), 'rb') as f:
+        assert f.read() == b'lib'
+
+    for member in (tar_member('../outside.a'),
+                   tar_member('iOS_Xcode1500/link', tarfile.SYMTYPE, '/etc/passwd')):
+        with artifacts_tar([member]) as tar:
+            with pytest.raises(errors):
+                for received in tar:
+                    _extract_safely(tar, received, sdk_root)
+    assert not osp.exists(osp.join(tmp_path, 'outside.a'))
+    assert not osp.lexists(osp.join(sdk_root, 'iOS_Xcode1500', 'link'))
@@ -0,0 +1,80 @@
+import pytest
+
+from wpe.agent_pool import AgentPool, AgentError, AgentJobFailed
+from wpe.build_agent import BuildAgent
+
+agents = ['localhost:5001', 'localhost:5002', 'localhost:5003']
+
+
+def make_pool(statuses: dict) -> AgentPool:
+    """
+    statuses: agent -> `/status` answer, None when unreachable
+    """
+    pool = AgentPool(agents)
+    answers = {url: statuses.get(agent) for agent, url in zip(agents, pool.agents)}
+    pool.status = lambda agent: answers[agent]
+    return pool
+
+
+def status(queued=0, running=0, workers=1, draining=False):
+    return {'draining': draining, 'workers': workers, 'queued': queued, 'running': running, 'cpuCount': 4,
+            'loadAverage': 0}
+
+
+def test_least_loaded_agent():
+    pool = make_pool({agents[0]: status(queued=2, running=1),
+                      agents[1]: status(queued=2, running=1, workers=4),
+                      agents[2]: None})
+    assert pool.run(lambda agent: agent) == f'http://{agents[1]}'
+
+
+def test_draining_agent_is_skipped():
+    pool = make_pool({agents[0]: status(draining=True),
+                      agents[1]: status(queued=2, running=1),
+                      agents[2]: status(draining=True)})
+    assert pool.run(lambda agent: agent) == f'http://{agents[1]}'
+    pool = make_pool({agent: status(draining=True) for agent in agents})
+    with pytest.raises(AgentError, match='No build agent available'):
+        pool.run(lambda agent: agent)
+
+
+def test_failover():
+    pool = make_pool({agents[0]: status(), agents[1]: status(running=1), agents[2]: None})
+    tried = []
+
+    def _work(agent):
+        tried.append(agent)
+        if len(tried) == 1:
+            raise AgentError('agent restarted')
+        return 'built'
+
+    assert pool.run(_work) == 'built'
+    assert tried == [f'http://{agents[0]}', f'http://{agents[1]}']
+
+    def _unreachable(agent):
+        tried.append(agent)
+        raise AgentError('unreachable')
+
+    tried.clear()
+    with pytest.raises(AgentError, match='No build agent available'):
+        pool.run(_unreachable)
+    assert sorted(tried) == [f'http://{agents[0]}', f'http://{agents[1]}']
+
+
+def test_build_failure_is_not_retried():
+    pool = make_pool({agent: status() for agent in agents})
+    tried = []
+
+    def _work(agent):
+        tried.append(agent)
+        raise AgentJobFailed('build failed')
+
+    with pytest.raises(AgentJobFailed):
+        pool.run(_work)
+    assert len(tried) == 1
+
+
+def test_agents_of_one_host_do_not_share_directories():
+    first, second = BuildAgent(5001), BuildAgent(5002)
+    assert first.logDir != second.logDir
+    assert first.cacheDir != second.cacheDir
@@ -0,0 +1,137 @@
+import io
+import os
+import os.path as osp
+import re
+import sys
+import tarfile
+import zipfile
+
+import pytest
+
+import wpe.archive as archive
+from wpe.archive import BundleWriter, PackageWriter, ParallelXzWriter
+from conftest import write_file
+
+bundle_name = 'TestPlugin_v2023.1.0_Build1'
+
+# xz stream header magic
+XZ_MAGIC = b'\xfd7zXZ\x00'
+
+
+def test_bundle_writer(tmp_path):
+    package = osp.join(tmp_path, 'TestPlugin_v2023.1.0_Build1_SDK.Common.tar.xz')
+    bundle_json = osp.join(tmp_path, 'bundle.json')
+    write_file(package, 'compressed')
+    write_file(bundle_json, '{}')
+    writer = BundleWriter(osp.join(tmp_path, 'dist', f'{bundle_name}.zip'), bundle_name)
+    writer.add(package)
+    # packages of a platform are listed again when the next one finishes
+    writer.add(package)
+    writer.add(bundle_json)
+    writer.close()
+
+    with zipfile.ZipFile(writer.zipPath) as bundle:
+        infos = {info.filename: info for info in bundle.infolist()}
+        assert list(infos) == [f'{bundle_name}/', f'{bundle_name}/{osp.basename(package)}', f'{bundle_name}/bundle.json']
+        # already compressed packages are stored as is
+        assert infos[f'{bundle_name}/{osp.basename(package)}'].compress_type == zipfile.ZIP_STORED
+        assert infos[f'{bundle_name}/bundle.json'].compress_type == zipfile.ZIP_DEFLATED
+        assert bundle.read(f'{bundle_name}/{osp.basename(package)}') == b'compressed'
+
+
+def test_bundle_writer_discard(tmp_path):
+    writer = BundleWriter(osp.join(tmp_path, 'dist', f'{bundle_name}.zip'), bundle_name)
+    writer.discard()
+    assert not osp.exists(writer.zipPath)
+
+
+def test_parallel_xz_round_trip(tmp_path):
+    path = osp.join(tmp_path, 'TestPlugin_SDK.Common.tar.xz')
+    files = {'SDK/include/TestPlugin.h': os.urandom(1 << 20), 'SDK/bin/TestPlugin.dll': bytes(2 << 20)}
+    with ParallelXzWriter(path, preset=0, threads=2) as xz:
+        with tarfile.open(fileobj=xz, mode='w|', format=tarfile.GNU_FORMAT) as tar:
+            for name, content in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+    with open(path, 'rb') as f:
+        # one stream per block
+        assert f.read().count(XZ_MAGIC) >= 3 * (1 << 20) // ParallelXzWriter.block_size(0)
+
+    with tarfile.open(path, 'r:xz') as tar:
+        assert tar.getnames() == list(files)
+        for name, content in files.items():
+            assert tar.extractfile(name).read() == content
+
+
+def test_parallel_xz_without_lzma(tmp_path, monkeypatch):
+    # as raised by tarfile, so that packaging falls back to the xz executable
+    monkeypatch.setitem(sys.modules, 'lzma', None)
+    with pytest.raises(tarfile.CompressionError):
+        ParallelXzWriter(osp.join(tmp_path, 'TestPlugin_SDK.Common.tar.xz'), threads=2)
+
+
+@pytest.fixture
+def authoring_artifacts(tmp_path):
+    root = osp.join(tmp_path, 'Wwise')
+    for configuration in ('Debug', 'Release'):
+        plugins = osp.join(root, 'Authoring', 'x64', configuration, 'bin', 'Plugins')
+        write_file(osp.join(plugins, 'TestPlugin.dll'), f'{configuration} dll')
+        write_file(osp.join(plugins, 'TestPlugin', 'Resources.dat'), f'{configuration} resources')
+    write_file(osp.join(root, 'Authoring', 'Data', 'Plugins', 'TestPlugin.xml'), '<PluginModule/>')
+    artifacts = [osp.join(root, 'Authoring', 'x64', configuration, 'bin', 'Plugins', name)
+                 for configuration in ('Debug', 'Release') for name in ('TestPlugin.dll', 'TestPlugin')]
+    artifacts.append(osp.join(root, 'Authoring', 'Data', 'Plugins', 'TestPlugin.xml'))
+    return [(artifact, osp.relpath(artifact, root)) for artifact in artifacts]
+
+
+def is_debug(artifact) -> bool:
+    return bool(re.search(r'([/\\])Debug\1', artifact))
+
+
+def test_package_writer(tmp_path, authoring_artifacts, monkeypatch):
+    outputs = {name: osp.join(tmp_path, f'TestPlugin_v2023.1.0_Build1_{name}.tar.xz')
+               for name in ('Authoring.Windows.Debug', 'Authoring.Windows.Release', 'Authoring.Windows')}
+    # as selected by the patched package.py: Debug binaries, then Release binaries and data
+    selectors = {outputs['Authoring.Windows.Debug']: lambda _a: is_debug(_a) and 'Data' not in _a,
+                 outputs['Authoring.Windows.Release']: lambda _a: not is_debug(_a),
+                 outputs['Authoring.Windows']: lambda _a: True}
+    opened = []
+
+    def _open(path, *args, **kwargs):
+        opened.append(path)
+        return open(path, *args, **kwargs)
+
+    monkeypatch.setattr(archive, 'open', _open, raising=False)
+    assert PackageWriter(threads=1).write(authoring_artifacts, selectors) == list(outputs.values())
+    # single pass: every file is read once, whatever the number of archives selecting it
+    files = [osp.join(parent, f) for parent, _, filenames in os.walk(osp.join(tmp_path, 'Wwise')) for f in filenames]
+    assert sorted(opened) == sorted(files)
+
+    for output, select in selectors.items():
+        # same members and order as adding the selected artifacts with tarfile
+        expected = osp.join(tmp_path, 'expected.tar')
+        with tarfile.open(expected, 'w', format=tarfile.GNU_FORMAT) as tar:
+            for artifact, dest in authoring_artifacts:
+                if select(artifact):
+                    tar.add(artifact, dest)
+        with tarfile.open(expected) as expected_tar, tarfile.open(output, 'r:xz') as tar:
+            assert tar.getnames() == expected_tar.getnames()
+            for member in tar.getmembers():
+                if member.isreg():
+                    assert tar.extractfile(member).read() == expected_tar.extractfile(member.name).read()
+    with tarfile.open(outputs['Authoring.Windows.Debug']) as tar:
+        assert tar.getnames() == ['Authoring/x64/Debug/bin/Plugins/TestPlugin.dll',
+                                  'Authoring/x64/Debug/bin/Plugins/TestPlugin',
+                                  'Authoring/x64/Debug/bin/Plugins/TestPlugin/Resources.dat']
+    with tarfile.open(outputs['Authoring.Windows.Release']) as tar:
+        assert tar.getnames() == ['Authoring/x64/Release/bin/Plugins/TestPlugin.dll',
+                                  'Authoring/x64/Release/bin/Plugins/TestPlugin',
+                                  'Authoring/x64/Release/bin/Plugins/TestPlugin/Resources.dat',
+                                  'Authoring/Data/Plugins/TestPlugin.xml']
+
+
+def test_package_writer_skips_empty_archives(tmp_path, authoring_artifacts):
+    output = osp.join(tmp_path, 'TestPlugin_v2023.1.0_Build1_Authoring.Windows.Profile.tar.xz')
+    assert PackageWriter().write(authoring_artifacts, {output: lambda _a: False}) == []
+    assert not osp.exists(output)
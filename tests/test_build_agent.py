@@ -0,0 +1,335 @@
+import gzip
+import hashlib
+import io
+import json
+import os.path as osp
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+
+import pytest
+
+import wpe.util as wpe_util
+from wpe.build_agent import BuildAgent, _AgentJob, _ROOT_LOCK_DIR
+from conftest import write_file
+
+
+def start_agent(tmp_path, max_workers: int) -> BuildAgent:
+    build_agent = BuildAgent(5000, max_workers=max_workers)
+    build_agent.logDir = osp.join(tmp_path, 'logs')
+    build_agent._init_app()
+    return build_agent
+
+
+@pytest.fixture
+def agent(tmp_path):
+    return start_agent(tmp_path, 1)
+
+
+def submit(agent, root, code: str) -> _AgentJob:
+    job = _AgentJob('test', {'root': str(root)}, [('run', [sys.executable, '-c', code])], agent.logDir)
+    with agent._app.test_request_context():
+        agent.submit(job)
+    return job
+
+
+def wait_until(predicate, timeout=30.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.05)
+
+
+def test_job_result_and_log(agent, tmp_path):
+    client = agent._app.test_client()
+    job = submit(agent, tmp_path, 'print("hello")')
+    wait_until(job.is_finished)
+
+    response = client.get(f'/jobs/{job.id}/result')
+    assert response.status_code == 200
+    assert response.json['succeeded'] and response.json['state'] == 'succeeded'
+    assert response.json['stdout'] == 'hello'
+    log = client.get(f'/jobs/{job.id}/log').get_data(as_text=True)
+    assert log.startswith('$ ') and 'hello' in log
+    assert client.get(f'/jobs/{job.id}/log', query_string={'offset': len(log) - len('hello\n')}).get_data(as_text=True) == 'hello\n'
+
+    failed = submit(agent, tmp_path, 'import sys; sys.exit(3)')
+    wait_until(failed.is_finished)
+    response = client.get(f'/jobs/{failed.id}/result')
+    assert response.status_code == 500
+    assert response.json['state'] == 'failed'
+    assert client.get('/jobs/unknown').status_code == 404
+
+
+def test_cancel(agent, tmp_path):
+    client = agent._app.test_client()
+    running = submit(agent, tmp_path, 'import time; time.sleep(60)')
+    queued = submit(agent, tmp_path, 'print("never")')
+    wait_until(lambda: running.state == _AgentJob.RUNNING and running._proc is not None)
+    status = client.get(f'/jobs/{queued.id}').json
+    assert status['state'] == 'queued' and status['queuePosition'] == 0
+
+    response = client.post(f'/jobs/{queued.id}/cancel')
+    assert response.status_code == 200 and response.json['state'] == 'cancelled'
+    start = time.time()
+    assert client.post(f'/jobs/{running.id}/cancel').status_code == 200
+    wait_until(running.is_finished)
+    assert time.time() - start < 30
+    assert running.state == _AgentJob.CANCELLED
+    assert client.post(f'/jobs/{running.id}/cancel').status_code == 409
+    assert 'run' not in queued.results
+
+
+def test_jobs_on_one_root_run_one_at_a_time(tmp_path):
+    agent = start_agent(tmp_path, 2)
+    root_a, root_b = tmp_path / 'a', tmp_path / 'b'
+    first = submit(agent, root_a, 'import time; time.sleep(1)')
+    second = submit(agent, root_a, 'print("second")')
+    other = submit(agent, root_b, 'print("other")')
+    wait_until(lambda: all(job.is_finished() for job in (first, second, other)))
+    assert all(job.state == _AgentJob.SUCCEEDED for job in (first, second, other))
+    assert second.startedAt >= first.finishedAt
+    # overtakes the job waiting for its root
+    assert other.startedAt < first.finishedAt
+
+
+def test_job_waits_for_root_held_by_another_process(agent, tmp_path):
+    root = osp.normcase(osp.abspath(tmp_path / 'shared'))
+    # as held by another agent of this host
+    root_lock = wpe_util.InterProcessLock(osp.join(_ROOT_LOCK_DIR, f'{hashlib.sha1(root.encode("utf-8")).hexdigest()}.lock'))
+    assert root_lock.try_acquire()
+    try:
+        job = submit(agent, root, 'print("synced")')
+        wait_until(lambda: osp.isfile(job.logPath))
+        time.sleep(0.2)
+        assert not job.is_finished() and 'run' not in job.results
+        with open(job.logPath, encoding='utf-8') as f:
+            assert f.read().startswith('Waiting for another process working on')
+    finally:
+        root_lock.release()
+    wait_until(job.is_finished)
+    assert job.state == _AgentJob.SUCCEEDED
+
+
+def test_log_streams_while_running(agent, tmp_path):
+    client = agent._app.test_client()
+    go = tmp_path / 'go'
+    job = submit(agent, tmp_path, f'import os, time\nprint("first", flush=True)\n'
+                                  f'while not os.path.exists({str(go)!r}): time.sleep(0.05)\nprint("second")')
+    response = client.get(f'/jobs/{job.id}/log', buffered=False)
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    chunks = iter(response.response)
+    log = b''
+    while b'first\n' not in log:
+        log += next(chunks)
+    # output is sent as it is written, before the job finishes
+    assert not job.is_finished() and log.endswith(b'first\n')
+    go.touch()
+    log += b''.join(chunks)
+    response.close()
+    assert job.state == _AgentJob.SUCCEEDED
+    assert log.decode('utf-8').endswith('first\nsecond\n')
+
+
+@pytest.fixture
+def wwise_sdk(tmp_path, monkeypatch):
+    sdk_root = osp.join(tmp_path, 'SDK')
+    for configuration in ('Debug', 'Release'):
+        write_file(osp.join(sdk_root, 'iOS', f'{configuration}-iphoneos', 'lib', 'libTestPluginFX.a'), f'iOS {configuration}')
+        write_file(osp.join(sdk_root, 'Android_arm64-v8a', configuration, 'lib', 'libTestPluginFX.a'), f'Android {configuration}')
+    # debug symbols and other plugins are not artifacts
+    write_file(osp.join(sdk_root, 'iOS', 'Release-iphoneos', 'lib', 'libTestPluginFX.a.dSYM', 'Contents', 'libTestPluginFX'), 'dwarf')
+    write_file(osp.join(sdk_root, 'iOS', 'Release-iphoneos', 'lib', 'libOtherFX.a'), 'other')
+    monkeypatch.setenv('WWISESDK', sdk_root)
+    return sdk_root
+
+
+def test_artifact_manifest(agent, wwise_sdk):
+    client = agent._app.test_client()
+    response = client.get('/artifacts/manifest', query_string={'plugin': 'TestPlugin'})
+    assert response.status_code == 200
+    assert list(response.json['files']) == ['Android_arm64-v8a/Debug/lib/libTestPluginFX.a',
+                                            'Android_arm64-v8a/Release/lib/libTestPluginFX.a',
+                                            'iOS/Debug-iphoneos/lib/libTestPluginFX.a',
+                                            'iOS/Release-iphoneos/lib/libTestPluginFX.a']
+    response = client.get('/artifacts/manifest', query_string={'plugin': 'TestPlugin', 'platform': 'iOS',
+                                                               'configuration': 'Release'})
+    assert response.json['files'] == {'iOS/Release-iphoneos/lib/libTestPluginFX.a': {
+        'size': len('iOS Release'), 'sha256': hashlib.sha256(b'iOS Release').hexdigest()}}
+    assert client.get('/artifacts/manifest').status_code == 400
+
+
+def test_download_artifacts(agent, wwise_sdk):
+    client = agent._app.test_client()
+    response = client.post('/artifacts', json={'plugin': 'TestPlugin', 'platform': 'iOS'})
+    assert response.status_code == 200 and response.mimetype == 'application/gzip'
+    with tarfile.open(fileobj=io.BytesIO(response.data), mode='r|gz') as tar:
+        assert {member.name: tar.extractfile(member).read() for member in tar} == {
+            'iOS/Debug-iphoneos/lib/libTestPluginFX.a': b'iOS Debug',
+            'iOS/Release-iphoneos/lib/libTestPluginFX.a': b'iOS Release'}
+
+    # only the files changed since the manifest the client holds
+    response = client.post('/artifacts', json={'plugin': 'TestPlugin',
+                                               'files': ['Android_arm64-v8a/Release/lib/libTestPluginFX.a']})
+    with tarfile.open(fileobj=io.BytesIO(response.data), mode='r:gz') as tar:
+        assert tar.getnames() == ['Android_arm64-v8a/Release/lib/libTestPluginFX.a']
+    response = client.post('/artifacts', json={'plugin': 'TestPlugin', 'files': ['iOS/Release-iphoneos/lib/libOtherFX.a']})
+    assert response.status_code == 400
+    assert client.post('/artifacts', json={}).status_code == 400
+
+
+def test_artifacts_without_wwise_sdk(agent, tmp_path, monkeypatch):
+    monkeypatch.setenv('WWISESDK', osp.join(tmp_path, 'missing'))
+    client = agent._app.test_client()
+    assert client.get('/artifacts/manifest', query_string={'plugin': 'TestPlugin'}).status_code == 500
+    assert client.post('/artifacts', json={'plugin': 'TestPlugin'}).status_code == 500
+
+
+def git(root, *args) -> str:
+    return subprocess.run(['git', '-C', str(root), '-c', 'user.name=wpe', '-c', 'user.email=wpe@example.com', *args],
+                          check=True, capture_output=True, text=True).stdout.strip()
+
+
+def sync(agent, data: dict) -> _AgentJob:
+    response = agent._app.test_client().post('/git_sync', json=data)
+    assert response.status_code == 202
+    job = agent._find_job(response.json['id'])
+    wait_until(job.is_finished)
+    return job
+
+
+def test_git_sync(agent, tmp_path):
+    origin, root = tmp_path / 'origin', tmp_path / 'project'
+    write_file(osp.join(origin, 'PremakePlugin.lua'), 'return {}\n')
+    git(origin, 'init', '-q', '-b', 'main')
+    git(origin, 'add', '-A')
+    git(origin, 'commit', '-q', '-m', 'init')
+    git(tmp_path, 'clone', '-q', str(origin), str(root))
+    first = git(root, 'rev-parse', 'HEAD')
+    write_file(osp.join(origin, 'PremakePlugin.lua'), 'return { name = "TestPlugin" }\n')
+    git(origin, 'commit', '-q', '-am', 'name')
+    second = git(origin, 'rev-parse', 'HEAD')
+
+    # the commit is already there: no fetch
+    job = sync(agent, {'root': str(root), 'branch': 'main', 'commit': first[:12]})
+    assert job.state == _AgentJob.SUCCEEDED
+    assert job.results['git fetch'].stdout == f'Skipped: {first[:12]} is already present.'
+    assert job.cacheLookups == [('git_commit', True)]
+    with open(job.logPath, encoding='utf-8') as f:
+        assert 'git sync phases: git fetch 0.0s, git reset ' in f.read()
+
+    job = sync(agent, {'root': str(root), 'branch': 'main', 'commit': second, 'depth': 1})
+    assert job.state == _AgentJob.SUCCEEDED
+    assert job.cacheLookups == [('git_commit', False)]
+    assert job.results['git fetch'].command[3:6] == ['fetch', '--depth', '1']
+    assert git(root, 'rev-parse', 'HEAD') == second
+
+    git(root, 'reset', '-q', '--hard', first)
+    # no commit: the branch head
+    job = sync(agent, {'root': str(root), 'branch': 'main'})
+    assert job.state == _AgentJob.SUCCEEDED and job.cacheLookups == []
+    assert git(root, 'rev-parse', 'HEAD') == second
+
+
+def test_git_sync_rejects_invalid_commit(agent, tmp_path):
+    response = agent._app.test_client().post('/git_sync', json={'root': str(tmp_path), 'branch': 'main',
+                                                                 'commit': '--upload-pack=touch pwned'})
+    assert response.status_code == 400
+    assert agent._app.test_client().get('/jobs').json['jobs'] == []
+
+
+def test_metrics(agent, tmp_path):
+    client = agent._app.test_client()
+    for code in ('print("ok")', 'import sys; sys.exit(1)'):
+        submit(agent, tmp_path, code)
+    wait_until(lambda: 'wpe_agent_jobs_total{kind="test",state="failed"} 1' in client.get('/metrics').get_data(as_text=True))
+
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    lines = response.get_data(as_text=True).splitlines()
+    assert '# TYPE wpe_agent_jobs_total counter' in lines
+    assert 'wpe_agent_jobs_total{kind="test",state="succeeded"} 1' in lines
+    assert 'wpe_agent_workers 1' in lines and 'wpe_agent_queue_depth 0' in lines
+    assert 'wpe_agent_jobs{state="succeeded"} 1' in lines
+    assert 'wpe_agent_command_duration_seconds_bucket{kind="test",step="run",le="+Inf"} 2' in lines
+    assert 'wpe_agent_command_duration_seconds_count{kind="test",step="run"} 2' in lines
+    assert any(line.startswith(f'wpe_agent_disk_free_bytes{{kind="root",path="{osp.normcase(osp.abspath(tmp_path))}"}} ')
+               for line in lines)
+    # the build cache is opt-in
+    assert not any(line.startswith('wpe_agent_build_cache') for line in lines)
+
+
+def test_health(agent, tmp_path, monkeypatch):
+    client = agent._app.test_client()
+    monkeypatch.setenv('WWISESDK', str(tmp_path))
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.json['status'] == 'ok' and all(response.json['checks'].values())
+
+    monkeypatch.setenv('WWISESDK', osp.join(tmp_path, 'missing'))
+    response = client.get('/health')
+    assert response.status_code == 503
+    assert response.json['status'] == 'unhealthy' and not response.json['checks']['wwiseSdk']
+
+
+class FakeServer:
+    def __init__(self):
+        self.stopped = threading.Event()
+
+    def shutdown(self):
+        self.stopped.set()
+
+
+def drain(agent, timeout: float) -> FakeServer:
+    # as on SIGTERM
+    agent._server = FakeServer()
+    agent._draining = True
+    threading.Thread(target=agent._drain_and_stop, args=(timeout,), daemon=True).start()
+    return agent._server
+
+
+def test_drain_lets_accepted_jobs_finish(agent, tmp_path):
+    client = agent._app.test_client()
+    first = submit(agent, tmp_path / 'a', 'import time; time.sleep(0.5)')
+    second = submit(agent, tmp_path / 'b', 'print("second")')
+    server = drain(agent, 60)
+
+    assert client.get('/status').json['draining']
+    assert client.get('/health').status_code == 503
+    response = client.post('/premake', json={'root': str(tmp_path / 'c'), 'platform': 'iOS'})
+    assert response.status_code == 503
+    assert server.stopped.wait(30)
+    assert first.state == second.state == _AgentJob.SUCCEEDED
+    assert len(client.get('/jobs').json['jobs']) == 2
+
+
+def test_drain_timeout_cancels_remaining_jobs(agent, tmp_path):
+    running = submit(agent, tmp_path, 'import time; time.sleep(60)')
+    queued = submit(agent, tmp_path, 'print("never")')
+    wait_until(lambda: running.state == _AgentJob.RUNNING and running._proc is not None)
+    server = drain(agent, 0.5)
+    assert server.stopped.wait(30)
+    assert running.state == queued.state == _AgentJob.CANCELLED
+    assert 'run' not in queued.results
+
+
+def test_gzip_request_and_response(agent):
+    client = agent._app.test_client()
+    headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+    body = gzip.compress(json.dumps({'root': 'project', 'branch': 'main', 'commit': 'not-a-commit'}).encode('utf-8'))
+    # decoded before the view reads the JSON
+    response = client.post('/git_sync', data=body, headers=headers)
+    assert response.status_code == 400 and response.json['error'] == 'Invalid commit: not-a-commit'
+    response = client.post('/git_sync', data=b'not gzip', headers=headers)
+    assert response.status_code == 400 and b'Invalid gzip body.' in response.data
+    # bounded once decoded
+    response = client.post('/git_sync', data=gzip.compress(bytes(BuildAgent._MAX_REQUEST_BYTES + 1)), headers=headers)
+    assert response.status_code == 413
+
+    response = client.get('/metrics', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).decode('utf-8').startswith('# HELP wpe_agent_uptime_seconds ')
+    # small responses are sent as is
+    assert 'Content-Encoding' not in client.get('/status', headers={'Accept-Encoding': 'gzip'}).headers
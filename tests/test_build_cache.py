@@ -0,0 +1,98 @@
+import os
+import os.path as osp
+from types import SimpleNamespace
+
+import pytest
+
+import wpe.wp_patch.resolver as wp_patch
+from wpe.build_cache import BuildCache
+from wpe.build_scheduler import BuildJob
+from conftest import write_file
+
+test_plugin_name = 'TestPlugin'
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = osp.join(tmp_path, test_plugin_name)
+    write_file(osp.join(root, 'PremakePlugin.lua'), 'return {}\n')
+    write_file(osp.join(root, 'SoundEnginePlugin', 'TestPluginFX.cpp'), 'int x = 0;\n')
+    # build intermediates are not inputs
+    write_file(osp.join(root, 'SoundEnginePlugin', 'TestPluginFX.obj'), 'binary')
+    return SimpleNamespace(root=root,
+                           premakePluginLua=osp.join(root, 'PremakePlugin.lua'),
+                           cacheDir=osp.join(root, 'Output', 'wpe', 'cache'),
+                           pluginName=test_plugin_name)
+
+
+@pytest.fixture
+def wwise_root(tmp_path):
+    root = osp.join(tmp_path, 'Wwise')
+    for folder in ('x64_vc160', 'x64_vc170'):
+        for configuration in ('Debug', 'Release'):
+            write_file(osp.join(root, 'SDK', folder, configuration, 'bin', f'{test_plugin_name}.dll'),
+                       f'{folder} {configuration}')
+    for configuration in ('Debug', 'Release'):
+        write_file(osp.join(root, 'Authoring', 'x64', configuration, 'bin', 'Plugins', f'{test_plugin_name}.dll'),
+                   f'Authoring {configuration}')
+    return root
+
+
+@pytest.fixture
+def package_registry(monkeypatch):
+    platform_info = SimpleNamespace(package=SimpleNamespace(artifacts=['SDK/x64_*/*/bin/{plugin_name}.dll']))
+    authoring_info = SimpleNamespace(package=SimpleNamespace(artifacts=['Authoring/x64/*/bin/Plugins/{plugin_name}.dll']))
+    package = SimpleNamespace(platform_registry={'Windows_vc170': platform_info,
+                                                 'Authoring_Windows': authoring_info,
+                                                 'Authoring_Mac': authoring_info,
+                                                 'Authoring_Linux': authoring_info})
+    monkeypatch.setattr(wp_patch, 'patch_module', lambda name: package)
+
+
+def test_key(project, wwise_root):
+    cache = BuildCache(project, wwise_root, '2023.1.0')
+    job = BuildJob('Windows_vc170', 'Release', 'x64', 'vc170')
+    key = cache.key(job)
+    assert cache.key(BuildJob('Windows_vc170', 'Release', 'x64', 'vc170')) == key
+    assert cache.key(BuildJob('Windows_vc170', 'Debug', 'x64', 'vc170')) != key
+    assert cache.key(BuildJob('Windows_vc170', 'Release', 'x64', 'vc160')) != key
+    assert BuildCache(project, wwise_root, '2024.1.0').key(job) != key
+    assert BuildCache(project, osp.join(wwise_root, 'SDK'), '2023.1.0').key(job) != key
+
+    write_file(osp.join(project.root, 'SoundEnginePlugin', 'TestPluginFX.obj'), 'rebuilt')
+    assert BuildCache(project, wwise_root, '2023.1.0').key(job) == key
+    write_file(osp.join(project.root, 'SoundEnginePlugin', 'TestPluginFX.cpp'), 'int x = 1;\n')
+    assert BuildCache(project, wwise_root, '2023.1.0').key(job) != key
+
+
+def test_store_and_restore(project, wwise_root, package_registry):
+    cache = BuildCache(project, wwise_root, '2023.1.0')
+    job = BuildJob('Windows_vc170', 'Release', 'x64', 'vc170')
+    assert not cache.restore(job)
+    cache.store(job)
+
+    artifact = osp.join(wwise_root, 'SDK', 'x64_vc170', 'Release', 'bin', f'{test_plugin_name}.dll')
+    other_toolset = osp.join(wwise_root, 'SDK', 'x64_vc160', 'Release', 'bin', f'{test_plugin_name}.dll')
+    os.remove(artifact)
+    os.remove(other_toolset)
+    assert cache.restore(job)
+    with open(artifact, encoding='utf-8') as f:
+        assert f.read() == 'x64_vc170 Release'
+    # outputs of another toolset or configuration are neither cached nor restored
+    assert not osp.exists(other_toolset)
+
+    write_file(osp.join(project.root, 'SoundEnginePlugin', 'TestPluginFX.cpp'), 'int x = 1;\n')
+    assert not BuildCache(project, wwise_root, '2023.1.0').restore(job)
+
+
+def test_authoring_artifacts_ignore_toolset(project, wwise_root, package_registry):
+    # Authoring jobs carry the toolset of the project config, their outputs have no `<arch>_<toolset>` folder
+    cache = BuildCache(project, wwise_root, '2023.1.0')
+    job = BuildJob('Authoring', 'Release', 'x64', 'vc170')
+    cache.store(job)
+
+    artifact = osp.join(wwise_root, 'Authoring', 'x64', 'Release', 'bin', 'Plugins', f'{test_plugin_name}.dll')
+    os.remove(artifact)
+    assert cache.restore(job)
+    with open(artifact, encoding='utf-8') as f:
+        assert f.read() == 'Authoring Release'
@@ -0,0 +1,65 @@
+import pytest
+
+from wpe.build_scheduler import BuildScheduler
+
+
+class FakeJob:
+    """
+    Picklable job, run in the worker processes of the scheduler.
+    """
+    def __init__(self, name: str, fails=False):
+        self._name = name
+        self.fails = fails
+        self.ran = False
+
+    def name(self) -> str:
+        return self._name
+
+    def run(self):
+        self.ran = True
+        print(f'run {self._name}')
+        if self.fails:
+            raise RuntimeError(f'{self._name} failed')
+
+
+class RecordingCache:
+    def __init__(self):
+        self.stored = []
+
+    def restore(self, job) -> bool:
+        return False
+
+    def store(self, job):
+        self.stored.append(job)
+
+
+def test_concurrent_jobs(tmp_path):
+    cache = RecordingCache()
+    jobs = [FakeJob('first'), FakeJob('second')]
+    results = BuildScheduler(str(tmp_path), max_jobs=2, cache=cache).run(jobs)
+    # results come back in matrix order, with the submitted jobs rather than their pickled copies
+    assert [res.job for res in results] == jobs
+    assert all(res.job is job for res, job in zip(results, jobs))
+    assert [res.status() for res in results] == ['passed', 'passed']
+    assert sorted(cache.stored, key=jobs.index) == jobs
+    for job, res in zip(jobs, results):
+        with open(res.logPath, encoding='utf-8') as f:
+            assert f.read() == f'run {job.name()}\n'
+
+
+def test_sequential_jobs_stop_at_first_failure(tmp_path):
+    jobs = [FakeJob('first'), FakeJob('second', fails=True), FakeJob('third')]
+    scheduler = BuildScheduler(str(tmp_path))
+    with pytest.raises(RuntimeError, match='Jobs failed: second$'):
+        scheduler.run(jobs)
+    assert [res.status() for res in scheduler.results] == ['passed', 'FAILED', 'skipped']
+    assert scheduler.results[1].error == 'RuntimeError: second failed'
+    assert not jobs[2].ran
+
+
+def test_concurrent_jobs_all_run(tmp_path):
+    jobs = [FakeJob('first', fails=True), FakeJob('second'), FakeJob('third')]
+    scheduler = BuildScheduler(str(tmp_path), max_jobs=2)
+    with pytest.raises(RuntimeError, match='Jobs failed: first$'):
+        scheduler.run(jobs)
+    assert [res.status() for res in scheduler.results] == ['FAILED', 'passed', 'passed']
@@ -0,0 +1,126 @@
+import io
+import json
+import os
+import os.path as osp
+import tarfile
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from wpe.deployment import AuthoringDeployment, Deployment
+
+test_plugin_name = 'TestPlugin'
+plugins_dir = 'Authoring/x64/Release/bin/Plugins'
+
+
+def write_archive(path, files: dict[str, str]):
+    """
+    Bundle zip as written by `wpe pack`, with one Authoring package made of files, and a Launcher display name that
+    differs from the plugin name.
+    """
+    write_bundle(path, {('Authoring', 'Windows_vc160'): files})
+
+
+def write_bundle(path, packages: dict[tuple[str, str], dict[str, str]]):
+    """
+    packages: (package group, deployment platform) -> files of the package
+    """
+    bundle = {'id': f'tgalpha.{test_plugin_name}.2023_1_0_1', 'name': 'Test Plugin (display name)', 'files': []}
+    bundle_dir = osp.splitext(osp.basename(path))[0]
+    with zipfile.ZipFile(path, 'w') as zip_file:
+        for (group, platform), files in packages.items():
+            package_name = f'{test_plugin_name}_{group}_{platform}.tar.xz'
+            package = io.BytesIO()
+            with tarfile.open(fileobj=package, mode='w:xz') as tar:
+                for name, content in files.items():
+                    data = content.encode('utf-8')
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    info.mtime = 1700000000
+                    tar.addfile(info, io.BytesIO(data))
+            bundle['files'].append({'sourceName': package_name,
+                                    'groups': [{'groupId': 'Packages', 'groupValueId': group},
+                                               {'groupId': 'DeploymentPlatforms', 'groupValueId': platform}]})
+            zip_file.writestr(f'{bundle_dir}/{package_name}', package.getvalue())
+        zip_file.writestr(f'{bundle_dir}/bundle.json', json.dumps(bundle))
+
+
+@pytest.fixture
+def deploy_args(tmp_path):
+    dest = osp.join(tmp_path, 'Wwise')
+    os.makedirs(osp.join(dest, plugins_dir))
+    return SimpleNamespace(destProject=dest,
+                           archive=osp.join(tmp_path, f'{test_plugin_name}_v2023.1.0_Build1.zip'),
+                           incremental=True,
+                           name=test_plugin_name)
+
+
+def test_plugin_name_from_archive():
+    assert Deployment._get_plugin_name_from_archive('/dist/TestPlugin_v2023.1.0_Build12.zip') == 'TestPlugin'
+    assert Deployment._get_plugin_name_from_archive('My_Plugin_v2024.1.2_Build3.zip') == 'My_Plugin'
+
+
+def test_deploy_packages_concurrently(deploy_args, capsys):
+    deploy_args.incremental = False
+    packages = {}
+    for platform, arch in (('Windows_vc160', 'x64'), ('Windows_vc170', 'x64_vc170'), ('Linux', 'Linux_x64')):
+        packages[('Authoring', platform)] = {f'Authoring/{arch}/{config}/bin/Plugins/{test_plugin_name}.dll': f'{arch} {config}'
+                                             for config in ('Debug', 'Release')}
+    # extracted concurrently into the same parent folders
+    packages[('Authoring', 'Common')] = {f'Authoring/Data/Plugins/{test_plugin_name}.xml': 'xml',
+                                         f'Authoring/Help/{test_plugin_name}/index.html': 'help'}
+    packages[('SDK', 'Windows_vc160')] = {f'SDK/x64_vc160/Release/lib/{test_plugin_name}.lib': 'lib'}
+    write_bundle(deploy_args.archive, packages)
+    AuthoringDeployment(deploy_args).deploy()
+    assert '8 written, 0 skipped, 0 removed.' in capsys.readouterr().out
+
+    for (group, _), files in packages.items():
+        for rel, content in files.items():
+            path = osp.join(deploy_args.destProject, rel)
+            # SDK packages are not deployed to Authoring
+            assert osp.isfile(path) == (group == 'Authoring')
+            if group == 'Authoring':
+                with open(path, encoding='utf-8') as f:
+                    assert f.read() == content
+    with open(osp.join(deploy_args.destProject, '.wpe_deploy', f'{test_plugin_name}.json'), encoding='utf-8') as f:
+        assert len(json.load(f)['files']) == 8
+
+
+def test_incremental_deploy(deploy_args, capsys):
+    files = {f'{plugins_dir}/{test_plugin_name}.dll': 'dll', f'{plugins_dir}/{test_plugin_name}.xml': 'xml'}
+    write_archive(deploy_args.archive, files)
+    AuthoringDeployment(deploy_args).deploy()
+    assert '2 written, 0 skipped, 0 removed.' in capsys.readouterr().out
+    manifest_path = osp.join(deploy_args.destProject, '.wpe_deploy', f'{test_plugin_name}.json')
+    with open(manifest_path, encoding='utf-8') as f:
+        assert sorted(json.load(f)['files']) == sorted(files)
+
+    AuthoringDeployment(deploy_args).deploy()
+    assert '0 written, 2 skipped, 0 removed.' in capsys.readouterr().out
+
+    # changed files are written, files no longer packaged are removed
+    write_archive(deploy_args.archive, {f'{plugins_dir}/{test_plugin_name}.dll': 'new dll'})
+    AuthoringDeployment(deploy_args).deploy()
+    assert '1 written, 0 skipped, 1 removed.' in capsys.readouterr().out
+    assert not osp.exists(osp.join(deploy_args.destProject, plugins_dir, f'{test_plugin_name}.xml'))
+    with open(osp.join(deploy_args.destProject, plugins_dir, f'{test_plugin_name}.dll'), encoding='utf-8') as f:
+        assert f.read() == 'new dll'
+
+
+def test_clean_from_manifest(deploy_args, capsys):
+    files = {f'{plugins_dir}/{test_plugin_name}/{test_plugin_name}.dll': 'dll',
+             f'{plugins_dir}/{test_plugin_name}.xml': 'xml'}
+    write_archive(deploy_args.archive, files)
+    AuthoringDeployment(deploy_args).deploy()
+    # not deployed by wpe, though named after the plugin
+    unrelated = osp.join(deploy_args.destProject, plugins_dir, f'{test_plugin_name}Notes.txt')
+    with open(unrelated, 'w', encoding='utf-8') as f:
+        f.write('keep')
+    capsys.readouterr()
+
+    AuthoringDeployment(deploy_args).clean()
+    assert 'No deploy manifest found' not in capsys.readouterr().out
+    plugins = osp.join(deploy_args.destProject, plugins_dir)
+    assert sorted(os.listdir(plugins)) == [f'{test_plugin_name}Notes.txt']
+    assert not osp.exists(osp.join(deploy_args.destProject, '.wpe_deploy', f'{test_plugin_name}.json'))
@@ -0,0 +1,74 @@
+import lzma
+import os
+import os.path as osp
+import tarfile
+
+import pytest
+
+from wpe.archive import PackageWriter
+from wpe.package_cache import PackageCache
+from conftest import write_file
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    src = osp.join(tmp_path, 'src')
+    write_file(osp.join(src, 'bin', 'TestPlugin.dll'), 'dll' * 1000)
+    write_file(osp.join(src, 'include', 'TestPlugin.h'), '#pragma once\n')
+    return [(osp.join(src, 'bin'), 'SDK/bin'), (osp.join(src, 'include'), 'SDK/include')]
+
+
+def pack(artifacts, output, cache, preset=6, threads=1):
+    return PackageWriter(preset, threads, cache).write(artifacts, {output: lambda _artifact: True},
+                                                       {output: 'TestPlugin_SDK'})
+
+
+def test_fingerprint(artifacts):
+    writer = PackageWriter(6, 1)
+    entries = []
+    for artifact, dest in artifacts:
+        writer._scan_tree(artifact, dest, entries)
+    fingerprint = PackageCache.fingerprint(entries, writer.settings())
+    assert PackageCache.fingerprint(entries, PackageWriter(6, 1).settings()) == fingerprint
+    assert PackageCache.fingerprint(entries, PackageWriter(9, 1).settings()) != fingerprint
+    assert PackageCache.fingerprint(entries, PackageWriter(6, 4).settings()) != fingerprint
+    # the thread count does not change the multi-threaded output
+    assert PackageWriter(6, 4).settings() == PackageWriter(6, 8).settings()
+    assert PackageCache.fingerprint(entries[:-1], writer.settings()) != fingerprint
+
+
+def test_reuse_and_invalidation(artifacts, tmp_path, capsys):
+    cache = PackageCache(osp.join(tmp_path, 'cache'))
+    output = osp.join(tmp_path, 'TestPlugin_v1_SDK.tar.xz')
+    pack(artifacts, output, cache)
+    assert 'Reused cached' not in capsys.readouterr().out
+
+    # a new version reuses the compressed package as is
+    reused = osp.join(tmp_path, 'TestPlugin_v2_SDK.tar.xz')
+    pack(artifacts, reused, cache)
+    assert 'Reused cached TestPlugin_SDK' in capsys.readouterr().out
+    with open(output, 'rb') as f, open(reused, 'rb') as g:
+        assert f.read() == g.read()
+    with tarfile.open(reused) as tar:
+        assert sorted(tar.getnames()) == ['SDK/bin', 'SDK/bin/TestPlugin.dll', 'SDK/include', 'SDK/include/TestPlugin.h']
+
+    # other compression settings are compressed again
+    pack(artifacts, osp.join(tmp_path, 'TestPlugin_v3_SDK.tar.xz'), cache, preset=1)
+    assert 'Reused cached' not in capsys.readouterr().out
+    pack(artifacts, osp.join(tmp_path, 'TestPlugin_v4_SDK.tar.xz'), cache, threads=2)
+    assert 'Reused cached' not in capsys.readouterr().out
+    with lzma.open(osp.join(tmp_path, 'TestPlugin_v4_SDK.tar.xz')) as xz:
+        assert xz.read()
+
+    # so are changed artifacts
+    write_file(osp.join(artifacts[0][0], 'TestPlugin.dll'), 'changed')
+    pack(artifacts, osp.join(tmp_path, 'TestPlugin_v5_SDK.tar.xz'), cache)
+    assert 'Reused cached' not in capsys.readouterr().out
+
+
+def test_prune(artifacts, tmp_path):
+    cache = PackageCache(osp.join(tmp_path, 'cache'))
+    for i in range(PackageCache._MAX_ENTRIES_PER_LABEL + 2):
+        write_file(osp.join(artifacts[1][0], 'TestPlugin.h'), f'// {i}\n')
+        pack(artifacts, osp.join(tmp_path, f'TestPlugin_v{i}_SDK.tar.xz'), cache)
+    assert len(os.listdir(osp.join(cache.cacheDir, 'TestPlugin_SDK'))) == PackageCache._MAX_ENTRIES_PER_LABEL
@@ -0,0 +1,106 @@
+import os.path as osp
+import shutil
+
+import kkpyutil as util
+import pytest
+
+from wpe.parameter import ParameterGenerator, StructLayout
+from wpe.pathman import PathMan
+
+test_dir = osp.dirname(__file__)
+org_dir = osp.join(test_dir, 'org')
+test_plugin_name = 'TestPlugin'
+
+
+@pytest.fixture
+def pathman(tmp_path, monkeypatch):
+    root = osp.join(tmp_path, test_plugin_name)
+    shutil.copytree(osp.join(org_dir, 'wpe_integrated', test_plugin_name), root)
+    # PathMan changes the working directory to the project root
+    monkeypatch.chdir(tmp_path)
+    return PathMan(root)
+
+
+def generate(pathman) -> ParameterGenerator:
+    generator = ParameterGenerator(pathman, generate_gui_resource=True)
+    generator.main()
+    generator.save_manifest()
+    return generator
+
+
+def written(generator) -> list[str]:
+    return sorted(osp.relpath(path, generator.pathMan.root).replace('\\', '/')
+                  for path, is_written in generator.outputs.items() if is_written)
+
+
+def test_incremental_generation(pathman):
+    assert not ParameterGenerator(pathman, generate_gui_resource=True).is_up_to_date()
+    generator = generate(pathman)
+    assert generator.docsChanged
+    assert 'WwisePlugin/TestPlugin.xml' in written(generator)
+    assert ParameterGenerator(pathman, generate_gui_resource=True).is_up_to_date()
+
+    # a generated region edited by hand is generated again, alone
+    plugin_cpp = osp.join(pathman.root, 'WwisePlugin', f'{test_plugin_name}Plugin.cpp')
+    generated = util.load_text(plugin_cpp)
+    util.save_text(plugin_cpp, generated.replace('// [/PropertyNames]', 'const char* const szEdited = "Edited";\n// [/PropertyNames]'))
+    assert not ParameterGenerator(pathman, generate_gui_resource=True).is_up_to_date()
+    generator = generate(pathman)
+    assert written(generator) == ['WwisePlugin/TestPluginPlugin.cpp']
+    assert not generator.docsChanged
+    assert util.load_text(plugin_cpp) == generated
+
+    # so are the outputs of a changed parameter
+    config = util.load_text(pathman.projConfig)
+    util.save_text(pathman.projConfig, config.replace("data_meaning = 'Decibels'\ndefault_value = 0", "data_meaning = 'Decibels'\ndefault_value = 6"))
+    assert not ParameterGenerator(pathman, generate_gui_resource=True).is_up_to_date()
+    generator = generate(pathman)
+    assert 'WwisePlugin/TestPlugin.xml' in written(generator)
+    assert 'WwisePlugin/TestPluginPlugin.cpp' not in written(generator)
+    assert ParameterGenerator(pathman, generate_gui_resource=True).is_up_to_date()
+
+
+def test_struct_layout():
+    # bool, float, bool
+    layout = StructLayout('Band', [(1, 1), (4, 4), (1, 1)])
+    assert (layout.size, layout.alignment, layout.padding) == (12, 4, 6)
+    optimized = layout.optimized()
+    assert optimized.members == [(4, 4), (1, 1), (1, 1)]
+    assert (optimized.size, optimized.padding) == (8, 2)
+    assert optimized.generate_static_assert() == \
+        'static_assert(sizeof(Band) == 8, "Unexpected Band layout, regenerate parameters");'
+    empty = StructLayout('Empty', [])
+    assert (empty.size, empty.padding) == (1, 0)
+    # members of the same size keep their definition order
+    members = [('bEnabled', 1), ('fGain', 4), ('bMuted', 1), ('iMode', 4)]
+    assert [name for name, _ in StructLayout.order_members(members, lambda _m: (_m[1], _m[1]))] == \
+           ['fGain', 'iMode', 'bEnabled', 'bMuted']
+
+
+@pytest.mark.parametrize('optimize_layout', [False, True])
+def test_optimize_layout(pathman, optimize_layout):
+    config = util.load_text(pathman.projConfig)
+    config = config.replace('[parameters.defines.bool_param_as_checkbox]',
+                            f'[parameters]\noptimize_layout = {str(optimize_layout).lower()}\n\n[parameters.defines.bool_param_as_checkbox]', 1)
+    config += """
+[parameters.defines.second_flag]
+type = 'bool'
+default_value = false
+
+[parameters.defines.non_rtpc_gain]
+type = 'float'
+default_value = 0
+"""
+    util.save_text(pathman.projConfig, config)
+    ParameterGenerator(pathman, is_forced=True).main()
+
+    header = util.load_text(osp.join(pathman.root, 'SoundEnginePlugin', f'{test_plugin_name}FXParams.h'))
+    non_rtpc = header[header.index('// [NonRTPCDeclaration]'):header.index('// [/NonRTPCDeclaration]')]
+    members = [line.strip() for line in non_rtpc.splitlines()[1:] if line.strip()]
+    assertion = f'static_assert(sizeof({test_plugin_name}NonRTPCParams) == 8,'
+    if optimize_layout:
+        assert members == ['AkReal32 fNonRtpcGain;', 'bool bBoolParamAsCheckbox;', 'bool bSecondFlag;']
+        assert assertion in header
+    else:
+        assert members == ['bool bBoolParamAsCheckbox;', 'bool bSecondFlag;', 'AkReal32 fNonRtpcGain;']
+        assert 'static_assert' not in header
@@ -0,0 +1,80 @@
+import os
+import os.path as osp
+import shutil
+
+import kkpyutil as util
+import pytest
+
+import wpe.premake_metadata as premake_metadata
+from wpe.pathman import PathMan
+from wpe.premake_metadata import PremakeMetadata
+
+test_dir = osp.dirname(__file__)
+org_dir = osp.join(test_dir, 'org')
+test_plugin_name = 'TestPlugin'
+
+
+@pytest.fixture
+def premake_plugin_lua(tmp_path):
+    root = osp.join(tmp_path, test_plugin_name)
+    shutil.copytree(osp.join(org_dir, 'wpe_integrated', test_plugin_name), root)
+    return osp.join(root, 'PremakePlugin.lua')
+
+
+@pytest.fixture
+def evaluations(monkeypatch):
+    """
+    Evaluated Lua texts, as if each load ran in a new process.
+    """
+    evaluated = []
+    evaluate = PremakeMetadata._evaluate
+
+    def _evaluate(lua_text):
+        evaluated.append(lua_text)
+        return evaluate(lua_text)
+
+    monkeypatch.setattr(PremakeMetadata, '_evaluate', staticmethod(_evaluate))
+    monkeypatch.setattr(premake_metadata, '_loaded', {})
+    return evaluated
+
+
+def load(path) -> PremakeMetadata:
+    premake_metadata._loaded.clear()
+    return PremakeMetadata.load(path)
+
+
+def test_load_and_cache(premake_plugin_lua, evaluations):
+    metadata = load(premake_plugin_lua)
+    assert metadata.name == test_plugin_name
+    assert len(evaluations) == 1
+    assert osp.isfile(PremakeMetadata.cache_path(premake_plugin_lua))
+    # memoized in the process, then cached on disk
+    assert PremakeMetadata.load(premake_plugin_lua) is metadata
+    assert load(premake_plugin_lua) == metadata
+    assert len(evaluations) == 1
+
+    # same content, e.g. after a checkout: the content hash matches
+    stat = os.stat(premake_plugin_lua)
+    os.utime(premake_plugin_lua, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load(premake_plugin_lua) == metadata
+    assert len(evaluations) == 1
+
+
+def test_invalidation(premake_plugin_lua, evaluations):
+    load(premake_plugin_lua)
+    lua = util.load_text(premake_plugin_lua)
+    util.save_text(premake_plugin_lua, lua.replace(f'"{test_plugin_name}"', '"RenamedPlugin"', 1))
+    assert load(premake_plugin_lua).name == 'RenamedPlugin'
+    assert len(evaluations) == 2
+
+    util.save_text(PremakeMetadata.cache_path(premake_plugin_lua), '{ corrupted')
+    assert load(premake_plugin_lua).name == 'RenamedPlugin'
+    assert len(evaluations) == 3
+
+
+def test_plugin_name_does_not_evaluate(premake_plugin_lua, evaluations, monkeypatch):
+    # PathMan changes the working directory to the project root
+    monkeypatch.chdir(osp.dirname(premake_plugin_lua))
+    assert PathMan(osp.dirname(premake_plugin_lua)).pluginName == test_plugin_name
+    assert not evaluations
+    assert not osp.exists(PremakeMetadata.cache_path(premake_plugin_lua))
@@ -0,0 +1,62 @@
+import os.path as osp
+
+import kkpyutil as util
+import pytest
+
+import wpe.util as wpe_util
+
+header_lines = [
+    '#pragma once\n',
+    'struct Params\n',
+    '{\n',
+    '    // [Members]\n',
+    '    float old;\n',
+    '    // [/Members]\n',
+    '};\n',
+    '\t// [Ids]\n',
+    '\t// [/Ids]\n',
+    '// [Unused]\n',
+]
+
+
+def test_inter_process_lock(tmp_path):
+    path = osp.join(tmp_path, 'locks', 'root.lock')
+    holder, waiter = wpe_util.InterProcessLock(path), wpe_util.InterProcessLock(path)
+    assert holder.try_acquire()
+    assert not waiter.try_acquire()
+    holder.release()
+    assert waiter.try_acquire()
+    waiter.release()
+    # released twice is a no-op
+    waiter.release()
+
+
+@pytest.mark.parametrize('removecues', [False, True])
+@pytest.mark.parametrize('withindent', [False, True])
+def test_region_substituter_matches_kkpyutil(tmp_path, removecues, withindent):
+    regions = [(['float gain;\n', 'bool enabled;\n'], '// [Members]', '// [/Members]'),
+               (['static const AkPluginParamID PARAM_GAIN_ID = 1;\n'], '// [Ids]', '// [/Ids]'),
+               (['never\n'], '// [Missing]', '// [/Missing]')]
+    expected_file = osp.join(tmp_path, 'expected.h')
+    util.save_lines(expected_file, header_lines, addlineend=False)
+    for inserts, startcue, endcue in regions:
+        util.substitute_lines_in_file(inserts, expected_file, startcue, endcue, removecues=removecues, withindent=withindent)
+
+    file = osp.join(tmp_path, 'Params.h')
+    util.save_lines(file, header_lines, addlineend=False)
+    substituter = wpe_util.RegionSubstituter()
+    for inserts, startcue, endcue in regions:
+        substituter.add(inserts, startcue, endcue, removecues=removecues, withindent=withindent)
+    assert substituter.substitute_in_file(file)
+    assert util.load_text(file) == util.load_text(expected_file)
+    if not removecues:
+        # filled regions are left as is, the file is not written again
+        assert not substituter.substitute_in_file(file)
+
+
+def test_region_substituter_rejects_overlapping_regions():
+    substituter = wpe_util.RegionSubstituter()
+    substituter.add(['x;\n'], 'struct Params', '};')
+    substituter.add(['y;\n'], '// [Members]', '// [/Members]')
+    with pytest.raises(ValueError, match='Overlapping regions'):
+        substituter.substitute(header_lines)